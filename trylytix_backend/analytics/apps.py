@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
+
+    def ready(self):
+        from analytics import signals  # noqa: F401
+        from analytics.frames import check_event_schema
+        checks.register(check_event_schema, checks.Tags.models)
@@ -0,0 +1,221 @@
+"""
+Versioned store for trained model artifacts.
+
+Layout::
+
+    artifacts/<group>/<version>/<files...>
+    artifacts/<group>/<version>/manifest.json   # schema, data range, metrics, checksums
+    artifacts/<group>/CURRENT                   # version served by the API
+
+Each training run writes a new version directory (built in a temp dir and renamed
+into place) and moves CURRENT to it. CURRENT is replaced atomically, so serving code
+either sees the old or the new version, never a partial one. Groups that have no
+versions yet are served from the legacy ``*.pkl`` files in the project root.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+import joblib
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.abspath(os.path.join(BASE_DIR, '..'))
+ARTIFACTS_DIR = os.environ.get('TRYLYTIX_ARTIFACTS_DIR', os.path.join(PROJECT_DIR, 'artifacts'))
+# Memory-map model arrays by default so workers on one host share pages; set to '' to load into memory
+DEFAULT_MMAP_MODE = os.environ.get('TRYLYTIX_MODEL_MMAP_MODE', 'r') or None
+
+# Files written by training runs before the store existed, served until a group gets its first version
+LEGACY_FILES = {
+    'match_outcome': {
+        'outcome_model': 'outcome_model.pkl',
+        'home_score_model': 'home_score_model.pkl',
+        'away_score_model': 'away_score_model.pkl',
+        'feature_columns': 'feature_columns.pkl',
+    },
+    'player_profile': {
+        'rf_model': 'rugby_rf_model.pkl',
+        'gb_model': 'rugby_gb_model.pkl',
+        'archetype_model': 'rugby_archetype_rf_model.pkl',
+        'scaler': 'rugby_scaler.pkl',
+        'label_encoder': 'rugby_label_encoder.pkl',
+        'kmeans': 'rugby_kmeans_archetypes.pkl',
+    },
+    'try_pattern': {
+        'classifier': 'try_pattern_model.pkl',
+        'lstm': 'try_lstm_model.h5',
+    },
+    # Trained only into the store (train_expected_try)
+    'expected_try': {},
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+class ArtifactError(Exception):
+    pass
+
+
+def _group_dir(group):
+    return os.path.join(ARTIFACTS_DIR, group)
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_atomic(path, text):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def list_versions(group):
+    root = _group_dir(group)
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        v for v in os.listdir(root)
+        if os.path.exists(os.path.join(root, v, 'manifest.json'))
+    )
+
+
+def current_version(group):
+    """Version CURRENT points at, or None when the group is still served from legacy files."""
+    try:
+        with open(os.path.join(_group_dir(group), 'CURRENT')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def manifest(group, version=None):
+    version = version or current_version(group)
+    if version is None:
+        return None
+    with open(os.path.join(_group_dir(group), version, 'manifest.json')) as f:
+        return json.load(f)
+
+
+def save_version(group, objects=None, files=None, metadata=None, activate=True):
+    """
+    Store one training run and return its version id.
+
+    ``objects`` maps artifact names to Python objects (written with joblib, uncompressed
+    so large arrays can be memory-mapped on load); ``files`` maps names to files that
+    already exist on disk (e.g. a Keras ``.h5`` model) and are copied in. ``metadata``
+    is merged into the manifest; use it for ``feature_schema``, ``data_range`` and
+    ``metrics``.
+    """
+    objects, files = objects or {}, files or {}
+    root = _group_dir(group)
+    os.makedirs(root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=root)
+
+    entries = {}
+    for name, obj in objects.items():
+        filename = f"{name}.joblib"
+        joblib.dump(obj, os.path.join(staging, filename))
+        entries[name] = filename
+    for name, src in files.items():
+        filename = f"{name}{os.path.splitext(src)[1]}"
+        shutil.copyfile(src, os.path.join(staging, filename))
+        entries[name] = filename
+
+    sha = hashlib.sha256()
+    artifacts = {}
+    for name, filename in sorted(entries.items()):
+        path = os.path.join(staging, filename)
+        digest = _sha256(path)
+        sha.update(digest.encode())
+        artifacts[name] = {'file': filename, 'sha256': digest, 'bytes': os.path.getsize(path)}
+
+    created = datetime.now(timezone.utc)
+    version = f"{created:%Y%m%dT%H%M%SZ}-{sha.hexdigest()[:8]}"
+    doc = dict(metadata or {})
+    doc.update({'group': group, 'version': version, 'created_at': created.isoformat(), 'artifacts': artifacts})
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump(doc, f, indent=2, default=str)
+
+    os.chmod(staging, 0o755)
+    os.rename(staging, os.path.join(root, version))
+    if activate:
+        pin(group, version)
+    return version
+
+
+def pin(group, version):
+    """Atomically point CURRENT at ``version``."""
+    if version not in list_versions(group):
+        raise ArtifactError(f"Unknown version {version!r} for {group}")
+    _write_atomic(os.path.join(_group_dir(group), 'CURRENT'), version + '\n')
+    return version
+
+
+def rollback(group):
+    """Point CURRENT at the version before the current one."""
+    versions = list_versions(group)
+    current = current_version(group)
+    if current not in versions or versions.index(current) == 0:
+        raise ArtifactError(f"No earlier version of {group} to roll back to")
+    return pin(group, versions[versions.index(current) - 1])
+
+
+def verify(group, version=None):
+    """Return the names of artifacts whose checksum no longer matches the manifest."""
+    version = version or current_version(group)
+    doc = manifest(group, version)
+    if doc is None:
+        raise ArtifactError(f"{group} has no stored versions")
+    root = os.path.join(_group_dir(group), version)
+    return [
+        name for name, entry in doc['artifacts'].items()
+        if _sha256(os.path.join(root, entry['file'])) != entry['sha256']
+    ]
+
+
+def artifact_path(group, name, version=None):
+    """Filesystem path of an artifact in the given (default: current) version."""
+    version = version or current_version(group)
+    if version is None:
+        try:
+            return os.path.join(PROJECT_DIR, LEGACY_FILES[group][name])
+        except KeyError:
+            raise ArtifactError(f"No stored versions of {group} and no legacy file for {name}")
+    doc = manifest(group, version)
+    if name not in doc['artifacts']:
+        raise ArtifactError(f"{group}@{version} has no artifact {name!r}")
+    return os.path.join(_group_dir(group), version, doc['artifacts'][name]['file'])
+
+
+def load(group, name, version=None, mmap_mode=DEFAULT_MMAP_MODE):
+    """
+    Load a joblib artifact, caching it per process until CURRENT moves.
+
+    ``mmap_mode='r'`` memory-maps the numpy arrays inside the artifact, so gunicorn
+    workers on one host share the pages instead of each holding a private copy.
+    """
+    version = version or current_version(group)
+    key = (group, version, name, mmap_mode)
+    obj = _loaded.get(key)
+    if obj is None:
+        path = artifact_path(group, name, version)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model file not found at {path}")
+        with _lock:
+            obj = _loaded.get(key)
+            if obj is None:
+                obj = joblib.load(path, mmap_mode=mmap_mode)
+                for stale in [k for k in _loaded if k[0] == group and k[1] != version]:
+                    del _loaded[stale]
+                _loaded[key] = obj
+    return obj
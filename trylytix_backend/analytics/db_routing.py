@@ -0,0 +1,234 @@
+"""
+Read-replica routing for analytics.
+
+Views wrapped in ``replica_reads`` send their reads of match data (``APPS``) to the
+``ANALYTICS_REPLICA['ALIAS']`` database when one is configured (``DB_REPLICA_*``, see
+settings). Writes, reads inside a transaction and everything outside those views stay
+on the primary. Reads also fall back to the primary when
+
+- the replica lags more than ``MAX_LAG_SECONDS`` or can't be reached (checked at most
+  every ``LAG_CHECK_INTERVAL`` seconds per process),
+- the client wrote something in the last ``STICKY_SECONDS`` (``PrimaryAfterWriteMiddleware``),
+  so people see their own uploads and edits straight away,
+- the data changed after the replica's last known position (``fresh_since``), so cached
+  analytics are never rebuilt from rows the replica hasn't replayed yet.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ALIAS': 'replica',
+    'APPS': ['events', 'matches', 'teams', 'projects'],  # models whose reads may be served by the replica
+    'MAX_LAG_SECONDS': 30,
+    'LAG_CHECK_INTERVAL': 5,
+    'STICKY_SECONDS': 10,  # reads stay on the primary this long after a client's write
+}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# 0 on a primary (e.g. a local stand-in) or a replica that has replayed everything it received
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_use_replica = ContextVar('use_replica', default=False)
+_pinned = ContextVar('pinned_to_primary', default=False)
+
+_lag = {'checked_at': None, 'measured_at': None, 'seconds': None}
+_lag_lock = threading.Lock()
+_reads = Counter()
+
+
+def config(name):
+    return getattr(settings, 'ANALYTICS_REPLICA', {}).get(name, DEFAULTS[name])
+
+
+def replica_alias():
+    alias = config('ALIAS')
+    return alias if alias in settings.DATABASES else None
+
+
+def _measure_lag(alias):
+    conn = connections[alias]
+    if conn.vendor != 'postgresql':
+        return 0.0
+    with conn.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def replica_lag():
+    """Seconds the replica is behind the primary, or None if it isn't configured or can't be reached."""
+    alias = replica_alias()
+    if alias is None:
+        return None
+    checked_at = _lag['checked_at']
+    due = checked_at is None or time.monotonic() - checked_at >= config('LAG_CHECK_INTERVAL')
+    # One thread measures; the others keep using the last value meanwhile
+    if due and _lag_lock.acquire(blocking=False):
+        try:
+            measured_at = time.time()
+            try:
+                seconds = _measure_lag(alias)
+            except DatabaseError as exc:
+                logger.warning("Replica %s unavailable, reading from the primary: %s", alias, exc)
+                connections[alias].close()
+                seconds = None
+            _lag.update(checked_at=time.monotonic(), measured_at=measured_at, seconds=seconds)
+        finally:
+            _lag_lock.release()
+    return _lag['seconds']
+
+
+def replica_available():
+    lag = replica_lag()
+    return lag is not None and lag <= config('MAX_LAG_SECONDS')
+
+
+def replica_position():
+    """Unix time up to which the replica is known to have replayed the primary's commits."""
+    lag = replica_lag()
+    return None if lag is None else _lag['measured_at'] - lag
+
+
+def replica_status():
+    return {
+        'alias': replica_alias(),
+        'lag_seconds': replica_lag(),
+        'available': replica_available(),
+        'reads': _reads['replica'],
+        'fallbacks': _reads['fallback'],
+    }
+
+
+@contextmanager
+def replica_reads_scope():
+    use_token, pin_token = _use_replica.set(True), _pinned.set(_pinned.get())
+    try:
+        yield
+    finally:
+        _use_replica.reset(use_token)
+        _pinned.reset(pin_token)
+
+
+def replica_reads(view):
+    """Let the (sync or async) view's reads of match data go to the replica."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            with replica_reads_scope():
+                return await view(*args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with replica_reads_scope():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def fresh_since(timestamp):
+    """Reads inside stay on the primary unless the replica has replayed commits up to ``timestamp``."""
+    if not _use_replica.get() or _pinned.get():
+        yield
+        return
+    position = replica_position()
+    token = _pinned.set(position is None or position < timestamp)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class AnalyticsReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or _pinned.get() or model._meta.app_label not in config('APPS'):
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if not replica_available():
+            _reads['fallback'] += 1
+            return None
+        _reads['replica'] += 1
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        if _use_replica.get():
+            # Read-after-write in the same view stays on the primary
+            _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return False if db == replica_alias() else None
+
+
+def _sticky_key(request):
+    client = request.META.get('HTTP_AUTHORIZATION') or request.META.get('REMOTE_ADDR', '')
+    return f"db:primary:{hashlib.sha1(client.encode()).hexdigest()}"
+
+
+class PrimaryAfterWriteMiddleware:
+    """Keep a client's reads on the primary for ``STICKY_SECONDS`` after it changed something."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if replica_alias() is None:
+            return self.get_response(request)
+        key = _sticky_key(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if response.status_code < 400:
+                cache.set(key, True, timeout=config('STICKY_SECONDS'))
+            return response
+        token = _pinned.set(bool(cache.get(key)))
+        try:
+            return self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+    async def __acall__(self, request):
+        if replica_alias() is None:
+            return await self.get_response(request)
+        key = _sticky_key(request)
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            if response.status_code < 400:
+                await cache.aset(key, True, timeout=config('STICKY_SECONDS'))
+            return response
+        token = _pinned.set(bool(await cache.aget(key)))
+        try:
+            return await self.get_response(request)
+        finally:
+            _pinned.reset(token)
@@ -0,0 +1,201 @@
+"""
+Expected-try pitch values.
+
+The model is a grid over the pitch cells of ``events.spatial`` holding the probability
+that a possession which reaches the cell ends in a try, learned from the stored
+possessions (``analytics.possessions``) and their teams' events. ``train`` fits it
+(``manage.py train_expected_try`` stores it as an ``expected_try`` artifact version);
+serving loads the grid once per process.
+
+Carries, passes and kicks are scored by the value they add: the grid value where the
+team's next event in the same possession happens (1 after the try that ends it, 0 when
+the possession ends any other way) minus the value where they happened. Every score is
+a lookup in the grid, done for all of a match's or a player's events at once.
+"""
+import numpy as np
+from django.db.models import F
+
+from analytics import artifacts
+from analytics.models import Possession
+from events import event_types, spatial
+from events.models import Event, event_type_codes
+
+ARTIFACT_GROUP = 'expected_try'
+SCORED = ['carry', 'run', 'pass', 'offload', 'kick', 'box_kick', 'grubber_kick']
+_SCORED = event_types.encode(SCORED)
+BATCH_MATCHES = 200
+DEFAULT_PRIOR = 20  # possessions' worth of the average try rate that every cell starts from
+
+
+def _events(match_ids):
+    """Events of the matches as column arrays, by match in possession order."""
+    rows = list(
+        Event.objects.filter(match_id__in=match_ids)
+        .order_by('match_id', F('timestamp').asc(nulls_last=True), 'id')
+        .values_list('id', 'match_id', 'team_id', 'player_id', 'grid_cell', event_type_codes())
+    )
+    columns = np.array(rows, dtype=object).reshape(-1, 6).T
+    as_int = lambda values: np.array([-1 if v is None else v for v in values], dtype=np.int64)
+    return {name: as_int(values) for name, values in
+            zip(('id', 'match_id', 'team_id', 'player_id', 'grid_cell', 'code'), columns)}
+
+
+def _possessions(match_ids):
+    rows = list(
+        Possession.objects.filter(match_id__in=match_ids).order_by('match_id', 'sequence')
+        .values_list('first_event_id', 'last_event_id', 'team_id', 'outcome')
+    )
+    return {
+        'first': np.array([r[0] for r in rows], dtype=np.int64),
+        'last': np.array([r[1] for r in rows], dtype=np.int64),
+        'team_id': np.array([-1 if r[2] is None else r[2] for r in rows], dtype=np.int64),
+        'outcome': np.array([r[3] for r in rows], dtype=object),
+    }
+
+
+def label(events, possessions):
+    """
+    Index of the possession each event is part of, or -1, for events and possessions
+    in the same (match, time) order: a possession covers its first to its last event.
+    """
+    n = len(events['id'])
+    labels = np.full(n, -1, dtype=np.int64)
+    if not n or not len(possessions['first']):
+        return labels
+    order = np.argsort(events['id'])
+    sorted_ids = events['id'][order]
+    known = np.isin(possessions['first'], sorted_ids) & np.isin(possessions['last'], sorted_ids)
+    first = order[np.searchsorted(sorted_ids, possessions['first'][known])]
+    last = order[np.searchsorted(sorted_ids, possessions['last'][known])]
+    inside = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(inside, first, 1)
+    np.add.at(inside, last + 1, -1)
+    owner = np.searchsorted(first, np.arange(n), side='right') - 1
+    covered = (np.cumsum(inside)[:n] > 0) & (owner >= 0)
+    labels[covered] = np.flatnonzero(known)[owner[covered]]
+    return labels
+
+
+def batches(match_ids, size=BATCH_MATCHES):
+    """(events, possessions, labels) for the matches, a batch of matches at a time."""
+    match_ids = list(match_ids)
+    for start in range(0, len(match_ids), size):
+        chunk = match_ids[start:start + size]
+        events, possessions = _events(chunk), _possessions(chunk)
+        yield events, possessions, label(events, possessions)
+
+
+def _own(events, possessions, labels):
+    """Events made by the team in possession, with a pitch cell."""
+    if not len(possessions['team_id']):
+        return np.zeros(len(labels), dtype=bool)
+    team = np.where(labels >= 0, possessions['team_id'][np.maximum(labels, 0)], -2)
+    return (labels >= 0) & (events['team_id'] == team) & (events['grid_cell'] >= 0)
+
+
+def train(match_ids, prior=DEFAULT_PRIOR):
+    """The try-probability grid (X_CELLS x Y_CELLS) and training counts."""
+    n_cells = spatial.X_CELLS * spatial.Y_CELLS
+    visits, tries = np.zeros(n_cells), np.zeros(n_cells)
+    n_possessions = n_tries = 0
+    for events, possessions, labels in batches(match_ids):
+        if not len(possessions['first']):
+            continue
+        finished = possessions['outcome'] != Possession.OPEN
+        scored = possessions['outcome'] == Possession.TRY
+        own = _own(events, possessions, labels)
+        own &= finished[np.maximum(labels, 0)]
+        # Each possession counts once for every cell it reached
+        pairs = np.unique(np.stack([labels[own], events['grid_cell'][own]]), axis=1)
+        np.add.at(visits, pairs[1], 1)
+        np.add.at(tries, pairs[1], scored[pairs[0]])
+        n_possessions += int(finished.sum())
+        n_tries += int(scored.sum())
+    base_rate = n_tries / n_possessions if n_possessions else 0.0
+    grid = (tries + prior * base_rate) / (visits + prior)
+    return grid.reshape(spatial.X_CELLS, spatial.Y_CELLS), {
+        'possessions': n_possessions, 'tries': n_tries, 'base_rate': round(base_rate, 4),
+        'cells_visited': int((visits > 0).sum()), 'prior': prior,
+    }
+
+
+def load_grid():
+    return artifacts.load(ARTIFACT_GROUP, 'grid')
+
+
+def value_added(events, possessions, labels, grid):
+    """Value added by each event (NaN for events that aren't scored), from grid lookups."""
+    values = np.asarray(grid, dtype=float).ravel()
+    added = np.full(len(events['id']), np.nan)
+    own = np.flatnonzero(_own(events, possessions, labels))
+    if not len(own):
+        return added
+    poss = labels[own]
+    start = values[events['grid_cell'][own]]
+    # Where the possession goes next: the team's next event in it, or how it ended
+    outcome = possessions['outcome'][poss]
+    end = np.where(outcome == Possession.TRY, 1.0, np.where(outcome == Possession.OPEN, np.nan, 0.0))
+    has_next = np.append(poss[1:] == poss[:-1], False)
+    end[has_next] = start[1:][has_next[:-1]]
+    scored = np.isin(events['code'][own], _SCORED)
+    added[own[scored]] = (end - start)[scored]
+    return added
+
+
+def _summary(keys, added, codes):
+    """Totals of ``added`` per key (e.g. player) and per event type."""
+    valid = ~np.isnan(added)
+    rows = {}
+    for key, value, code in zip(keys[valid].tolist(), added[valid].tolist(), codes[valid].tolist()):
+        row = rows.setdefault(key, {'actions': 0, 'value_added': 0.0, 'by_type': {}})
+        row['actions'] += 1
+        row['value_added'] += value
+        kind = row['by_type'].setdefault(event_types.name(code), {'actions': 0, 'value_added': 0.0})
+        kind['actions'] += 1
+        kind['value_added'] += value
+    for row in rows.values():
+        row['value_added'] = round(row['value_added'], 4)
+        for kind in row['by_type'].values():
+            kind['value_added'] = round(kind['value_added'], 4)
+    return rows
+
+
+def match_value_data(match_id):
+    grid = load_grid()
+    (events, possessions, labels), = batches([match_id])
+    added = value_added(events, possessions, labels, grid)
+    players = _summary(events['player_id'], added, events['code'])
+    teams = _summary(events['team_id'], added, events['code'])
+    return {
+        'match_id': match_id,
+        'model_version': artifacts.current_version(ARTIFACT_GROUP),
+        'possessions': len(possessions['first']),
+        'teams': [{'team_id': key, **row} for key, row in teams.items() if key >= 0],
+        'players': sorted(({'player_id': key, **row} for key, row in players.items() if key >= 0),
+                          key=lambda row: -row['value_added']),
+    }
+
+
+def player_value_data(player_id, season=None):
+    played = Event.objects.filter(player_id=player_id)
+    if season:
+        played = played.in_season(season)
+    match_ids = list(played.order_by('match_id').values_list('match_id', flat=True).distinct())
+    grid = load_grid()
+    per_match, player_added, player_codes = [], [], []
+    for events, possessions, labels in batches(match_ids):
+        added = value_added(events, possessions, labels, grid)
+        mine = events['player_id'] == player_id
+        for match_id, row in _summary(events['match_id'][mine], added[mine], events['code'][mine]).items():
+            per_match.append({'match_id': match_id, 'actions': row['actions'], 'value_added': row['value_added']})
+        player_added.append(added[mine])
+        player_codes.append(events['code'][mine])
+    added, codes = np.concatenate([np.empty(0), *player_added]), np.concatenate([np.empty(0, dtype=np.int64), *player_codes])
+    total = _summary(np.zeros(len(added), dtype=np.int64), added, codes).get(0, {'actions': 0, 'value_added': 0.0, 'by_type': {}})
+    return {
+        'player_id': player_id,
+        'season': season,
+        'model_version': artifacts.current_version(ARTIFACT_GROUP),
+        **total,
+        'matches': per_match,
+    }
@@ -0,0 +1,178 @@
+"""
+Match-level model inputs derived from our own events.
+
+``MatchFeatures`` holds, per match, each side's counts of the stats the outcome models
+take as ``home_<stat>``/``away_<stat>`` (``ml_model_prediction.EVENT_FEATURES``: tries,
+tackles, rucks, lineouts, scrums, penalties, cards, offloads, ...). ``refresh`` computes
+them for many matches from one aggregated query per batch, recomputing only matches whose
+events changed since (a different event count or highest id); ``update_match`` adds a
+match's new events on top of its stored counts.
+
+The stored rows feed the models three ways:
+
+- ``training_frame``: one row per match in the ``match_data.csv`` layout, for ``train_model.py --from-db``,
+- ``team_rolling_features``: a team's average over its last ``WINDOW`` matches before a date,
+- ``fixture_rows``: pre-match inputs for fixtures from both teams' rolling averages, as
+  used by the match prediction endpoint and the season simulator.
+"""
+import pandas as pd
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from analytics import frames
+from analytics.ml_model_prediction import EVENT_FEATURES
+from analytics.models import MatchFeatures
+from events.models import Event
+from matches.models import Match
+
+WINDOW = 5
+BATCH_MATCHES = 500
+STAT_OF = {event_type: stat for stat, types in EVENT_FEATURES.items() for event_type in types}
+# The points of the stats, as train_model.py scores match_data.csv
+SCORE = {'tries': 5, 'conversion_goals': 2, 'penalty_goals': 3}
+# Dtypes of training_frame (see analytics/frames.py): per-match counts fit in int16
+TRAINING_SCHEMA = {
+    'home_team': 'category',
+    'away_team': 'category',
+    **{f'{side}_{stat}': 'int16' for side in ('home', 'away') for stat in EVENT_FEATURES},
+}
+
+
+def _empty():
+    return dict.fromkeys(EVENT_FEATURES, 0)
+
+
+def _add(features, teams, rows):
+    """Add grouped (team_id, event_type, count) rows to the home and away counts in ``features``."""
+    for row in rows:
+        stat = STAT_OF.get(row['event_type'])
+        side = teams.get(row['team_id'])
+        if stat and side:
+            features[side][stat] = features[side].get(stat, 0) + row['count']
+
+
+def refresh(match_ids, rebuild=False):
+    """Bring the features of the matches up to date; returns how many were (re)computed."""
+    match_ids = list(match_ids)
+    computed = 0
+    for start in range(0, len(match_ids), BATCH_MATCHES):
+        chunk = match_ids[start:start + BATCH_MATCHES]
+        totals = {row['match_id']: (row['count'], row['max_id']) for row in
+                  Event.objects.filter(match_id__in=chunk).order_by().values('match_id')
+                  .annotate(count=Count('id'), max_id=Max('id'))}
+        stored = {} if rebuild else {
+            row['match_id']: (row['event_count'], row['max_event_id']) for row in
+            MatchFeatures.objects.filter(match_id__in=chunk).values('match_id', 'event_count', 'max_event_id')}
+        stale = [m for m in chunk if m not in stored or stored[m] != totals.get(m, (0, 0))]
+        if stale:
+            _compute(stale, totals)
+            computed += len(stale)
+    return computed
+
+
+def _compute(match_ids, totals):
+    """Recompute the features of the matches from one aggregated query over their events."""
+    matches = {m['id']: m for m in Match.objects.filter(pk__in=match_ids).values('id', 'home_team_id', 'away_team_id')}
+    features = {match_id: {'home': _empty(), 'away': _empty()} for match_id in matches}
+    rows = (Event.objects.filter(match_id__in=list(matches), event_type__in=list(STAT_OF)).order_by()
+            .values('match_id', 'team_id', 'event_type').annotate(count=Count('id')))
+    by_match = {}
+    for row in rows:
+        by_match.setdefault(row['match_id'], []).append(row)
+    for match_id, m in matches.items():
+        _add(features[match_id], {m['home_team_id']: 'home', m['away_team_id']: 'away'}, by_match.get(match_id, []))
+    with transaction.atomic():
+        MatchFeatures.objects.bulk_create(
+            [MatchFeatures(match_id=match_id, home=f['home'], away=f['away'],
+                           event_count=totals.get(match_id, (0, 0))[0], max_event_id=totals.get(match_id, (0, 0))[1] or 0)
+             for match_id, f in features.items()],
+            update_conflicts=True, unique_fields=['match'],
+            update_fields=['home', 'away', 'event_count', 'max_event_id', 'updated_at'],
+        )
+
+
+def update_match(match_id, rebuild=False):
+    """Add the match's events since its last update to its features (all of them with ``rebuild``)."""
+    if rebuild:
+        return refresh([match_id], rebuild=True)
+    match = Match.objects.filter(pk=match_id).values('home_team_id', 'away_team_id').first()
+    if match is None:
+        return 0
+    with transaction.atomic():
+        MatchFeatures.objects.get_or_create(match_id=match_id, defaults={'home': _empty(), 'away': _empty()})
+        features = MatchFeatures.objects.select_for_update().get(match_id=match_id)
+        new = Event.objects.filter(match_id=match_id, id__gt=features.max_event_id)
+        totals = new.aggregate(count=Count('id'), max_id=Max('id'))
+        if not totals['count']:
+            return 0
+        counts = {'home': features.home, 'away': features.away}
+        _add(counts, {match['home_team_id']: 'home', match['away_team_id']: 'away'},
+             new.filter(event_type__in=list(STAT_OF)).order_by().values('team_id', 'event_type').annotate(count=Count('id')))
+        features.event_count += totals['count']
+        features.max_event_id = totals['max_id']
+        features.save()
+    return totals['count']
+
+
+def score(stats):
+    return sum(stats.get(stat, 0) * points for stat, points in SCORE.items())
+
+
+def training_frame(matches=None):
+    """The stored features as a ``match_data.csv``-style frame: date, teams, winner and home_/away_ stats."""
+    features = MatchFeatures.objects.filter(event_count__gt=0)
+    if matches is not None:
+        features = features.filter(match__in=matches)
+    rows = []
+    for f in (features.order_by('match__date', 'match_id')
+              .values('match__date', 'match__home_team__name', 'match__away_team__name', 'home', 'away')):
+        home, away = f['match__home_team__name'], f['match__away_team__name']
+        home_score, away_score = score(f['home']), score(f['away'])
+        rows.append({
+            'date': f['match__date'],
+            'home_team': home,
+            'away_team': away,
+            'winner': home if home_score > away_score else away if away_score > home_score else 'draw',
+            **{f'home_{stat}': f['home'].get(stat, 0) for stat in EVENT_FEATURES},
+            **{f'away_{stat}': f['away'].get(stat, 0) for stat in EVENT_FEATURES},
+        })
+    return frames.apply_schema(pd.DataFrame(rows), TRAINING_SCHEMA)
+
+
+def team_rolling_features(team_ids, before=None, window=WINDOW):
+    """Each team's mean stats over its last ``window`` matches before the date ``before`` (all when None)."""
+    team_ids = set(team_ids)
+    features = MatchFeatures.objects.filter(
+        Q(match__home_team_id__in=team_ids) | Q(match__away_team_id__in=team_ids), event_count__gt=0)
+    if before is not None:
+        features = features.filter(match__date__lt=before)
+    recent = {team_id: [] for team_id in team_ids}
+    for f in (features.order_by('-match__date', '-match_id')
+              .values('match__home_team_id', 'match__away_team_id', 'home', 'away').iterator()):
+        for team_id, stats in ((f['match__home_team_id'], f['home']), (f['match__away_team_id'], f['away'])):
+            if team_id in recent and len(recent[team_id]) < window:
+                recent[team_id].append(stats)
+        if all(len(stats) >= window for stats in recent.values()):
+            break
+    return {team_id: {stat: round(sum(s.get(stat, 0) for s in stats) / len(stats), 4) for stat in EVENT_FEATURES}
+            for team_id, stats in recent.items() if stats}
+
+
+def fixture_rows(fixtures, before=None, window=WINDOW):
+    """
+    ``(features, home_team, away_team)`` rows for ``ml_model_prediction.predict_fixtures``
+    from dicts with ``home_team_id``/``away_team_id``, ``home_team``/``away_team`` names and
+    (unless ``before`` is given) the fixture's ``date``.
+    """
+    rows = []
+    teams = {f[side] for f in fixtures for side in ('home_team_id', 'away_team_id')}
+    shared = team_rolling_features(teams, before, window) if before is not None else None
+    for f in fixtures:
+        form = shared if shared is not None else team_rolling_features(
+            [f['home_team_id'], f['away_team_id']], f['date'], window)
+        features = {
+            **{f'home_{stat}': value for stat, value in form.get(f['home_team_id'], {}).items()},
+            **{f'away_{stat}': value for stat, value in form.get(f['away_team_id'], {}).items()},
+        }
+        rows.append((features, f['home_team'], f['away_team']))
+    return rows
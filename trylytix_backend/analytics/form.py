@@ -0,0 +1,152 @@
+"""
+Rolling-window and form metrics per team, maintained incrementally.
+
+Each team has a ``TeamFormState``: the last ``WINDOW`` values of every metric, their
+exponentially weighted means and current streaks, plus the position (date, match id) of
+the last match folded in. ``update_team`` folds in only the matches after that position,
+appending a ``TeamFormPoint`` for each, so a new match costs one query for its counts
+whatever the team's history. A change to a match already folded in (edited events, a
+rescheduled match) rewinds to the point before it, restoring the state from the
+stored points, and folds forward again from there.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Q
+
+from analytics.match_analytics import ROLLUP_EVENTS, team_match_rollups
+from analytics.models import TeamFormPoint, TeamFormState
+from matches.models import Match
+
+WINDOW = 5
+EWM_SPAN = 5
+ALPHA = 2 / (EWM_SPAN + 1)
+METRICS = [*ROLLUP_EVENTS, 'tackle_success']
+
+
+def match_values(rollup):
+    """The metrics of one match rollup; None where a rate has no attempts."""
+    values = {name: float(rollup[name]) for name in ROLLUP_EVENTS}
+    attempts = rollup['tackles'] + rollup['missed_tackles']
+    values['tackle_success'] = round(rollup['tackles'] / attempts, 4) if attempts else None
+    return values
+
+
+def fold(state, values):
+    """Add one match's ``values`` to ``state`` (window, ewm and streaks dicts), in place."""
+    for metric in METRICS:
+        value = values[metric]
+        window = state['window'].setdefault(metric, [])
+        window.append(value)
+        del window[:-WINDOW]
+        if value is None:
+            continue
+        previous = state['ewm'].get(metric)
+        # Streaks compare each match with the form going into it
+        streak = state['streaks'].get(metric, 0)
+        if previous is None or value == previous:
+            streak = 0
+        elif value > previous:
+            streak = max(streak, 0) + 1
+        else:
+            streak = min(streak, 0) - 1
+        state['streaks'][metric] = streak
+        state['ewm'][metric] = value if previous is None else round(previous + ALPHA * (value - previous), 4)
+
+
+def rolling(state):
+    """Mean of each metric over the window, ignoring matches where it was undefined."""
+    means = {}
+    for metric, window in state['window'].items():
+        values = [v for v in window if v is not None]
+        means[metric] = round(sum(values) / len(values), 4) if values else None
+    return means
+
+
+def _after(position):
+    date, match_id = position
+    return Q(date__gt=date) | Q(date=date, match_id__gte=match_id)
+
+
+def _rewind(form, position):
+    """Drop the form points from ``position`` on and restore the state from the points before it."""
+    points = TeamFormPoint.objects.filter(team_id=form.team_id)
+    points.filter(_after(position)).delete()
+    previous = list(points.order_by('-date', '-match_id').values('match_id', 'date', 'values', 'ewm', 'streaks')[:WINDOW])
+    form.matches = points.count()
+    form.last_match_date, form.last_match_id = (previous[0]['date'], previous[0]['match_id']) if previous else (None, None)
+    form.window = {metric: [p['values'].get(metric) for p in reversed(previous)] for metric in METRICS} if previous else {}
+    form.ewm = previous[0]['ewm'] if previous else {}
+    form.streaks = previous[0]['streaks'] if previous else {}
+
+
+def update_team(team_id, since=None):
+    """
+    Fold the team's matches since its last update into its form, redoing those from
+    ``since`` (a ``(date, match_id)``) on if given; returns the number of matches folded in.
+    """
+    with transaction.atomic():
+        TeamFormState.objects.get_or_create(team_id=team_id)
+        form = TeamFormState.objects.select_for_update().get(team_id=team_id)
+        last = (form.last_match_date, form.last_match_id) if form.last_match_id is not None else None
+        rewound = since is not None and last is not None and since <= last
+        if rewound:
+            _rewind(form, since)
+            last = (form.last_match_date, form.last_match_id) if form.last_match_id is not None else None
+        rollups = team_match_rollups(team_id, after=last)
+
+        state = {'window': form.window, 'ewm': form.ewm, 'streaks': form.streaks}
+        points = []
+        for rollup in rollups:
+            values = match_values(rollup)
+            fold(state, values)
+            points.append(TeamFormPoint(
+                team_id=team_id, match_id=rollup['match_id'], date=rollup['date'], values=values,
+                rolling=rolling(state), ewm=dict(state['ewm']), streaks=dict(state['streaks']),
+            ))
+        TeamFormPoint.objects.bulk_create(points)
+        if rollups or rewound:
+            form.matches += len(rollups)
+            if rollups:
+                form.last_match_date, form.last_match_id = rollups[-1]['date'], rollups[-1]['match_id']
+            form.save()
+    return len(rollups)
+
+
+def rebuild_team(team_id):
+    return update_team(team_id, since=(datetime.date.min, 0))
+
+
+def match_changed(team_id, match_id):
+    """Bring the team's form up to date after a change to ``match_id``'s events, date or existence."""
+    positions = [
+        (date, match_id) for date in
+        [*TeamFormPoint.objects.filter(team_id=team_id, match_id=match_id).values_list('date', flat=True),
+         *Match.objects.filter(pk=match_id).values_list('date', flat=True)]
+    ]
+    if not positions:
+        # A deleted match takes its form point with it, so where it was is unknown
+        return rebuild_team(team_id)
+    # Redone from wherever the match is or was, so editing the latest match only redoes that one
+    return update_team(team_id, since=min(positions))
+
+
+def team_form_data(team_id):
+    form = TeamFormState.objects.filter(team_id=team_id).first()
+    if form is None:
+        update_team(team_id)
+        form = TeamFormState.objects.get(team_id=team_id)
+    points = TeamFormPoint.objects.filter(team_id=team_id).order_by('date', 'match_id').values(
+        'match_id', 'date', 'values', 'rolling', 'ewm', 'streaks')
+    return {
+        'team_id': team_id,
+        'window': WINDOW,
+        'ewm_span': EWM_SPAN,
+        'matches': form.matches,
+        'current': {
+            'rolling': rolling({'window': form.window}),
+            'ewm': form.ewm,
+            'streaks': form.streaks,
+        },
+        'form': list(points),
+    }
@@ -0,0 +1,134 @@
+"""
+Compact dtypes for the analytics DataFrames.
+
+Frames built from ORM rows or stat dicts default to int64/float64 numbers and object
+strings: one Python string per row for a team name that repeats a million times. The
+schemas here give each column the narrowest dtype that holds it: categoricals for
+repeated labels (team names, event types, zones), int8-int32 for ids, codes and counts
+(pandas' nullable ``Int*`` where the model field is nullable), float32 for coordinates
+and stats, and Arrow-backed strings for free text. ``apply_schema`` casts a frame
+column by column, refusing values that don't fit rather than wrapping them.
+
+``EVENT_SCHEMA`` follows the ``Event`` model; ``check_event_schema`` (a system check,
+run by ``manage.py check``) keeps the two in step. ``manage.py benchmark_frames``
+compares memory and groupby/sort times against the default dtypes.
+"""
+import numpy as np
+import pandas as pd
+
+from events import event_types
+
+# Categories in code order, so ``cat.codes`` are the stored ``event_types`` codes
+EVENT_TYPE_DTYPE = pd.CategoricalDtype([event_types.UNKNOWN_NAME, *event_types.NAMES])
+UTC_DATETIME = 'datetime64[ns, UTC]'
+
+# Event columns by model attname; ``EVENT_DERIVED`` are annotations the pipelines add
+EVENT_SCHEMA = {
+    'id': 'int64',
+    'match_id': 'int32',
+    'player_id': 'Int32',
+    'team_id': 'Int32',
+    'event_type': EVENT_TYPE_DTYPE,
+    'is_opponent_event': 'bool',
+    'timestamp': UTC_DATETIME,
+    'x_coord': 'float32',
+    'y_coord': 'float32',
+    'location_zone': 'category',
+    'phase': 'Int16',
+    'description': 'string[pyarrow]',
+    'match_date': 'datetime64[ns]',
+    'grid_cell': 'Int8',
+    'zone': 'Int8',
+    'updated_at': UTC_DATETIME,
+}
+EVENT_DERIVED = {
+    'team_name': 'category',
+    'event_code': 'int16',
+}
+
+# Dtype kinds (numpy ``kind`` letters, or 'category'/'string') each model field type may use
+FIELD_KINDS = {
+    **dict.fromkeys(['AutoField', 'BigAutoField', 'ForeignKey', 'IntegerField', 'BigIntegerField',
+                     'SmallIntegerField', 'PositiveIntegerField', 'PositiveSmallIntegerField'], {'i'}),
+    'FloatField': {'f'},
+    'BooleanField': {'b'},
+    'DateTimeField': {'M'},
+    'DateField': {'M'},
+    'CharField': {'category', 'string'},
+    'TextField': {'category', 'string'},
+    'EventTypeField': {'category'},
+}
+
+
+def _kind(dtype):
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if isinstance(dtype, pd.CategoricalDtype):
+        return 'category'
+    if isinstance(dtype, pd.StringDtype):
+        return 'string'
+    return dtype.kind
+
+
+def _nullable(dtype):
+    """Whether a dtype can hold missing values."""
+    dtype = pd.api.types.pandas_dtype(dtype)
+    return not isinstance(dtype, np.dtype) or dtype.kind in 'fM'
+
+
+def check_event_schema(app_configs=None, **kwargs):
+    """System check: every EVENT_SCHEMA column is an Event field, of a matching kind and nullability."""
+    from django.core.checks import Error
+    from events.models import Event
+
+    fields = {field.attname: field for field in Event._meta.concrete_fields}
+    errors = []
+    for column, dtype in EVENT_SCHEMA.items():
+        field = fields.get(column)
+        if field is None:
+            errors.append(Error(f"EVENT_SCHEMA column {column!r} is not a field of Event", id='analytics.E001'))
+            continue
+        if _kind(dtype) not in FIELD_KINDS.get(type(field).__name__, set()):
+            errors.append(Error(f"EVENT_SCHEMA gives {column!r} dtype {dtype}, which doesn't fit a {type(field).__name__}",
+                                id='analytics.E002'))
+        elif field.null and not _nullable(dtype):
+            errors.append(Error(f"Event.{column} is nullable but EVENT_SCHEMA gives it dtype {dtype}",
+                                id='analytics.E003'))
+    for column in set(fields) - set(EVENT_SCHEMA):
+        errors.append(Error(f"Event.{column} has no dtype in EVENT_SCHEMA", id='analytics.E004'))
+    return errors
+
+
+def _cast(series, dtype):
+    target = pd.api.types.pandas_dtype(dtype)
+    if isinstance(target, pd.DatetimeTZDtype):
+        return pd.to_datetime(series, utc=True).astype(target)
+    if isinstance(target, np.dtype) and target.kind == 'M':
+        return pd.to_datetime(series).astype(target)
+    if _kind(target) in 'iu':
+        values = pd.to_numeric(series)
+        if isinstance(target, np.dtype) and values.isna().any():
+            raise ValueError(f"Column {series.name!r} has missing values, which {target} can't hold")
+        info = np.iinfo(target.numpy_dtype if not isinstance(target, np.dtype) else target)
+        if len(values.dropna()) and (values.min() < info.min or values.max() > info.max):
+            raise ValueError(f"Column {series.name!r} has values outside the range of {target}")
+        return values.astype(target)
+    return series.astype(target)
+
+
+def apply_schema(df, schema=None):
+    """Cast the frame's columns that ``schema`` (default: events) knows, in place and column by column; returns it."""
+    schema = schema or {**EVENT_SCHEMA, **EVENT_DERIVED}
+    for column in df.columns:
+        if column in schema and df[column].dtype != pd.api.types.pandas_dtype(schema[column]):
+            df[column] = _cast(df[column], schema[column])
+    return df
+
+
+def event_frame(rows, columns):
+    """A frame of event rows (dicts or tuples from ``values()``/``values_list()``) in the compact dtypes."""
+    return apply_schema(pd.DataFrame.from_records(rows, columns=columns))
+
+
+def memory_usage(df):
+    """Bytes held by the frame, counting the Python objects in object columns."""
+    return int(df.memory_usage(deep=True).sum())
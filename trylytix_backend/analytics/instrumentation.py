@@ -0,0 +1,295 @@
+"""
+Per-request performance instrumentation.
+
+``RequestMetricsMiddleware`` records wall time, DB query count, total SQL time,
+response rendering (serialization) time and model inference time for every request,
+tagged by URL pattern (e.g. ``api/matches/<int:match_id>/heatmap/``). Samples are kept
+in a rolling window per route and exposed by ``metrics_view`` as Prometheus text
+(or JSON with ``?format=json``), together with database connection counts, psycopg
+pool statistics and read-replica lag. Metrics are per process; scrape each worker or
+run with a single worker when profiling.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+
+from analytics.db_routing import replica_alias, replica_status
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WINDOW': 1000,  # samples kept per route for percentiles
+    'N_PLUS_ONE_THRESHOLD': 20,  # same SQL statement repeated more often than this in one request
+    'SLOW_REQUEST_MS': 1000,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+}
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+FIELDS = {
+    'duration_seconds': 'Request wall time',
+    'db_queries': 'Database queries per request',
+    'db_seconds': 'Time spent in SQL per request',
+    'serialization_seconds': 'Response rendering time per request',
+    'inference_seconds': 'Model inference time per request',
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def config(name):
+    return getattr(settings, 'ANALYTICS_METRICS', {}).get(name, DEFAULTS[name])
+
+
+class RequestRecord:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+        self.timers = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries += 1
+            self.statements[sql] += 1
+
+
+@contextmanager
+def timed(kind):
+    """Add the block's duration to the current request's ``kind`` timer (e.g. 'inference')."""
+    record = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record is not None:
+            record.timers[kind] += time.perf_counter() - start
+
+
+class MetricsStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=config('WINDOW')))
+        self.counts = Counter()
+        self.sums = defaultdict(float)
+        self.flagged = Counter()
+
+    def add(self, route, sample, n_plus_one):
+        with self.lock:
+            self.samples[route].append(sample)
+            self.counts[route] += 1
+            for field in FIELDS:
+                self.sums[(route, field)] += sample[field]
+            if n_plus_one:
+                self.flagged[route] += 1
+
+    def snapshot(self):
+        with self.lock:
+            routes = {route: list(samples) for route, samples in self.samples.items()}
+            counts, sums, flagged = dict(self.counts), dict(self.sums), dict(self.flagged)
+        result = {}
+        for route, samples in routes.items():
+            stats = {'count': counts[route], 'n_plus_one_flagged': flagged.get(route, 0)}
+            for field in FIELDS:
+                values = sorted(s[field] for s in samples)
+                stats[field] = {
+                    'sum': sums[(route, field)],
+                    'quantiles': {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES},
+                }
+            result[route] = stats
+        return result
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.counts.clear()
+            self.sums.clear()
+            self.flagged.clear()
+
+
+metrics = MetricsStore()
+
+
+def _record_query(execute, sql, params, many, context):
+    # Installed on every connection; the current request (if any) comes from the context
+    # variable, which async views' ORM calls inherit in their sync_to_async threads
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    return record(execute, sql, params, many, context)
+
+
+def _install_query_recorder(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_query_recorder)
+
+_connects = Counter()
+_connects_lock = threading.Lock()
+
+
+def _count_connect(connection, **kwargs):
+    with _connects_lock:
+        _connects[connection.alias] += 1
+
+
+connection_created.connect(_count_connect)
+
+
+def db_stats():
+    """Per database alias: connections opened (or checked out of the pool), pool and replica stats."""
+    stats = {}
+    for alias in connections:
+        conn = connections[alias]
+        with _connects_lock:
+            entry = {'connects': _connects[alias], 'conn_max_age': conn.settings_dict.get('CONN_MAX_AGE')}
+        if conn.vendor == 'postgresql' and conn.settings_dict.get('OPTIONS', {}).get('pool'):
+            entry['pool'] = conn.pool.get_stats()
+        if alias == replica_alias():
+            entry['replica'] = replica_status()
+        stats[alias] = entry
+    return stats
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    # Async-capable so ASGI deployments don't pay a thread hop per request around async views
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        for conn in connections.all(initialized_only=True):
+            _install_query_recorder(conn)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        record = RequestRecord()
+        token = _current.set(record)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, record)
+        return response
+
+    async def __acall__(self, request):
+        record = RequestRecord()
+        token = _current.set(record)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, record)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook; time it via a post-render callback
+        record = _current.get()
+        if record is not None:
+            start = time.perf_counter()
+
+            def rendered(resp):
+                record.timers['serialization'] += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, record):
+        route = _route(request)
+        duration = time.perf_counter() - record.start
+        repeated = max(record.statements.values(), default=0)
+        n_plus_one = repeated > config('N_PLUS_ONE_THRESHOLD')
+        sample = {
+            'duration_seconds': duration,
+            'db_queries': record.queries,
+            'db_seconds': record.db_seconds,
+            'serialization_seconds': record.timers['serialization'],
+            'inference_seconds': record.timers['inference'],
+        }
+        metrics.add(route, sample, n_plus_one)
+
+        response['X-Query-Count'] = str(record.queries)
+        response['Server-Timing'] = ', '.join([
+            f"total;dur={duration * 1000:.1f}",
+            f"db;dur={record.db_seconds * 1000:.1f}",
+            f"ser;dur={record.timers['serialization'] * 1000:.1f}",
+            f"inf;dur={record.timers['inference'] * 1000:.1f}",
+        ])
+        if n_plus_one:
+            sql, count = record.statements.most_common(1)[0]
+            logger.warning("Possible N+1 on %s: %d queries, one statement ran %d times: %s",
+                           route, record.queries, count, sql[:200])
+        elif duration * 1000 > config('SLOW_REQUEST_MS'):
+            logger.warning("Slow request on %s: %.0f ms, %d queries (%.0f ms SQL)",
+                           route, duration * 1000, record.queries, record.db_seconds * 1000)
+
+
+def _prometheus(snapshot, db):
+    lines = []
+    for field, help_text in FIELDS.items():
+        name = f"trylytix_request_{field}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+        for route, stats in sorted(snapshot.items()):
+            label = route.replace('\\', '\\\\').replace('"', '\\"')
+            for q, value in stats[field]['quantiles'].items():
+                lines.append(f'{name}{{route="{label}",quantile="{q}"}} {value}')
+            lines.append(f'{name}_sum{{route="{label}"}} {stats[field]["sum"]}')
+            lines.append(f'{name}_count{{route="{label}"}} {stats["count"]}')
+    name = 'trylytix_request_n_plus_one_total'
+    lines += [f"# HELP {name} Requests flagged for repeated identical queries", f"# TYPE {name} counter"]
+    for route, stats in sorted(snapshot.items()):
+        label = route.replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(f'{name}{{route="{label}"}} {stats["n_plus_one_flagged"]}')
+    name = 'trylytix_db_connects_total'
+    lines += [f"# HELP {name} Database connections opened or checked out of the pool", f"# TYPE {name} counter"]
+    lines += [f'{name}{{alias="{alias}"}} {entry["connects"]}' for alias, entry in sorted(db.items())]
+    pool_stats = sorted({stat for entry in db.values() for stat in entry.get('pool', {})})
+    for stat in pool_stats:
+        name = f"trylytix_db_pool_{stat}"
+        lines += [f"# HELP {name} psycopg pool statistic {stat}", f"# TYPE {name} gauge"]
+        for alias, entry in sorted(db.items()):
+            if stat in entry.get('pool', {}):
+                lines.append(f'{name}{{alias="{alias}"}} {entry["pool"][stat]}')
+    replicas = sorted((alias, entry['replica']) for alias, entry in db.items() if 'replica' in entry)
+    for stat, kind, help_text in [('reads', 'counter', 'Analytics reads served by the replica'),
+                                  ('fallbacks', 'counter', 'Analytics reads sent to the primary while the replica was unavailable'),
+                                  ('lag_seconds', 'gauge', 'Replica lag behind the primary')]:
+        name = f"trylytix_db_replica_{stat}" + ('_total' if kind == 'counter' else '')
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{alias="{alias}"}} {replica[stat]}' for alias, replica in replicas
+                  if replica[stat] is not None]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Rolling request metrics for this process, Prometheus text by default."""
+    if not settings.DEBUG and request.META.get('REMOTE_ADDR') not in config('ALLOWED_IPS'):
+        return HttpResponseForbidden()
+    snapshot, db = metrics.snapshot(), db_stats()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'routes': snapshot, 'db': db})
+    return HttpResponse(_prometheus(snapshot, db), content_type='text/plain; version=0.0.4')
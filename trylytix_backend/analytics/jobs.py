@@ -0,0 +1,245 @@
+"""
+Database-backed queue for expensive analytics and predictions.
+
+Web workers call ``submit`` and return immediately. ``run_analytics_worker`` claims
+queued ``AnalyticsJob`` rows (``SELECT ... FOR UPDATE SKIP LOCKED`` on Postgres, so
+several workers can share the table) and runs their handlers in a process pool whose
+processes keep the models loaded between jobs.
+"""
+import importlib
+import json
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from analytics.models import AnalyticsJob
+from events import event_types
+
+DEFAULTS = {
+    'PROCESSES': 2,
+    'POLL_INTERVAL': 1.0,  # seconds between polls when the queue is empty
+    'MAX_ATTEMPTS': 3,  # times a job is retried after its worker died
+    'HEARTBEAT_SECONDS': 60,  # how often a worker marks its running jobs as still alive
+    'STALE_AFTER_SECONDS': 900,  # no heartbeat for this long means the worker died
+    'SIMULATION_PROCESSES': 2,  # processes a season simulation job starts for its chunks, on top of PROCESSES
+}
+
+# kind -> "module:function"; the function takes the job params and returns JSON-serializable data
+JOB_HANDLERS = {
+    'predict_outcome': 'analytics.jobs:predict_outcome_job',
+    'player_ml_profile': 'analytics.jobs:player_ml_profile_job',
+    'try_pattern_prediction': 'analytics.jobs:try_pattern_job',
+    'precompute_match': 'analytics.jobs:precompute_match_job',
+    'update_possessions': 'analytics.jobs:update_possessions_job',
+    'update_team_form': 'analytics.jobs:update_team_form_job',
+    'simulate_season': 'analytics.jobs:simulate_season_job',
+    'update_match_features': 'analytics.jobs:update_match_features_job',
+}
+
+
+OUTCOME_REQUIRED = ('tackles', 'missed_tackles', 'passes', 'tries', 'penalties')
+MAX_SEQUENCE = 100
+
+
+def config(name):
+    return getattr(settings, 'ANALYTICS_JOBS', {}).get(name, DEFAULTS[name])
+
+
+# Params checks: each takes the submitted params and returns them cleaned, or raises ValueError.
+# The synchronous views check their input with the same functions.
+
+def predict_outcome_params(data):
+    for field in OUTCOME_REQUIRED:
+        if field not in data:
+            raise ValueError(f"{field} is required")
+    return data.dict() if hasattr(data, 'dict') else dict(data)
+
+
+def player_ml_profile_params(data):
+    player_id = data.get('player_id')
+    if isinstance(player_id, bool) or not str(player_id).isdigit():
+        raise ValueError("player_id must be a player id")
+    return {'player_id': int(player_id)}
+
+
+def try_pattern_params(data):
+    sequence = data.get('sequence')
+    if not isinstance(sequence, list) or not 1 <= len(sequence) <= MAX_SEQUENCE:
+        raise ValueError(f"sequence must be a list of 1 to {MAX_SEQUENCE} event types")
+    unknown = [name for name in sequence if name not in event_types.CODES]
+    if unknown:
+        raise ValueError(f"Unknown event type {unknown[0]!r}")
+    return {'sequence': sequence}
+
+
+# Kinds clients may submit through POST /api/jobs/, with their params check; the app queues the others itself
+PUBLIC_JOB_KINDS = {
+    'predict_outcome': predict_outcome_params,
+    'player_ml_profile': player_ml_profile_params,
+    'try_pattern_prediction': try_pattern_params,
+}
+
+
+def predict_outcome_job(params):
+    from analytics.ml_model_prediction import predict_match_outcome
+    features = {k: v for k, v in params.items() if k not in ('home_team', 'away_team')}
+    return predict_match_outcome(features, params.get('home_team', ''), params.get('away_team', ''))
+
+
+def player_ml_profile_job(params):
+    from analytics.player_analysis import deep_rf_analysis
+    return deep_rf_analysis(params['player_id'])
+
+
+def try_pattern_job(params):
+    from analytics.try_patterns import predict_outcome
+    return predict_outcome(params['sequence'])
+
+
+def precompute_match_job(params):
+    from analytics import feature_store, form
+    from analytics.match_analytics import precompute_match
+    from analytics.possessions import update_match
+    from matches.models import Match
+    possessions = update_match(params['match_id'])
+    features = feature_store.update_match(params['match_id'])
+    result = precompute_match(params['match_id'])
+    teams = Match.objects.filter(pk=params['match_id']).values_list('home_team_id', 'away_team_id').first() or ()
+    for team_id in teams:
+        form.match_changed(team_id, params['match_id'])
+    return dict(result, possessions=possessions, feature_events=features)
+
+
+def update_possessions_job(params):
+    from analytics.possessions import update_match
+    return {'match_id': params['match_id'], 'possessions': update_match(params['match_id'], params.get('rebuild', False))}
+
+
+def update_team_form_job(params):
+    from analytics import form
+    if params.get('match_id') is None:
+        return {'team_id': params['team_id'], 'matches': form.update_team(params['team_id'])}
+    return {'team_id': params['team_id'], 'matches': form.match_changed(params['team_id'], params['match_id'])}
+
+
+def update_match_features_job(params):
+    from analytics import feature_store
+    events = feature_store.update_match(params['match_id'], params.get('rebuild', False))
+    return {'match_id': params['match_id'], 'events': events}
+
+
+def simulate_season_job(params):
+    import datetime
+    from analytics.season_simulator import simulate_season
+    params = dict(params)
+    if params.get('as_of'):
+        params['as_of'] = datetime.date.fromisoformat(params['as_of'])
+    # The job already runs in one of the worker's processes; a pool per core in each would oversubscribe the cores
+    return simulate_season(processes=config('SIMULATION_PROCESSES'), **params)
+
+
+def submit(kind, params=None, user=None):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}; choose from {', '.join(JOB_HANDLERS)}")
+    return AnalyticsJob.objects.create(
+        kind=kind, params=params or {}, created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def submit_once(kind, params=None, user=None):
+    """Like ``submit``, but reuse an identical job that is still waiting in the queue."""
+    queued = AnalyticsJob.objects.filter(kind=kind, params=params or {}, status=AnalyticsJob.QUEUED).first()
+    return queued or submit(kind, params, user)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(limit, worker=None):
+    """Mark up to ``limit`` of the oldest queued jobs as running and return them."""
+    with transaction.atomic():
+        jobs = list(
+            AnalyticsJob.objects.select_for_update(skip_locked=True)
+            .filter(status=AnalyticsJob.QUEUED)
+            .order_by('created_at')[:limit]
+        )
+        if jobs:
+            now = timezone.now()
+            AnalyticsJob.objects.filter(pk__in=[j.pk for j in jobs]).update(
+                status=AnalyticsJob.RUNNING, started_at=now, heartbeat_at=now, worker=worker or worker_name(),
+                attempts=F('attempts') + 1,
+            )
+            for job in jobs:
+                job.status, job.started_at = AnalyticsJob.RUNNING, now
+    return jobs
+
+
+def run_handler(kind, params):
+    """Runs in a pool process. Returns ``(result, error)``; handlers that report ``{'error': ...}`` fail the job."""
+    try:
+        module, func = JOB_HANDLERS[kind].split(':')
+        result = getattr(importlib.import_module(module), func)(params)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    if isinstance(result, dict) and 'error' in result:
+        return None, str(result['error'])
+    return json.loads(json.dumps(result, default=_json_default)), ''
+
+
+def _json_default(value):
+    # numpy scalars and arrays from the model outputs
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+def finish(job_id, result, error):
+    AnalyticsJob.objects.filter(pk=job_id).update(
+        status=AnalyticsJob.FAILED if error else AnalyticsJob.SUCCEEDED,
+        result=result, error=error, finished_at=timezone.now(),
+    )
+
+
+def heartbeat(job_ids):
+    """Mark the worker's running jobs as still alive, however long they take."""
+    return AnalyticsJob.objects.filter(pk__in=job_ids, status=AnalyticsJob.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def requeue_stale():
+    """Requeue jobs whose worker died mid-run (no heartbeat lately), or fail them once they are out of attempts."""
+    cutoff = timezone.now() - timedelta(seconds=config('STALE_AFTER_SECONDS'))
+    stale = AnalyticsJob.objects.filter(status=AnalyticsJob.RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff))
+    failed = stale.filter(attempts__gte=config('MAX_ATTEMPTS')).update(
+        status=AnalyticsJob.FAILED, error='Worker stopped before the job finished', finished_at=timezone.now())
+    requeued = stale.update(status=AnalyticsJob.QUEUED, started_at=None, heartbeat_at=None, worker='')
+    return requeued, failed
+
+
+def release(job_ids):
+    """Put jobs claimed by a worker that is shutting down back on the queue."""
+    return AnalyticsJob.objects.filter(pk__in=job_ids, status=AnalyticsJob.RUNNING).update(
+        status=AnalyticsJob.QUEUED, started_at=None, heartbeat_at=None, worker='')
+
+
+def job_payload(job):
+    payload = {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'status_url': f"/api/jobs/{job.pk}/",
+    }
+    if job.status == AnalyticsJob.SUCCEEDED:
+        payload['result'] = job.result
+    elif job.status == AnalyticsJob.FAILED:
+        payload['error'] = job.error
+    return payload
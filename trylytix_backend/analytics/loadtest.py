@@ -0,0 +1,263 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class Target:
+    """One route to exercise: ``path`` is already filled in with object ids."""
+
+    def __init__(self, name, path, method='GET', data=None, weight=1):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+        self.weight = weight
+
+
+def in_process_sender(token=None, host='127.0.0.1'):
+    """Send requests through Django's test client, one client per thread (no network, no server)."""
+    from django.test import Client
+
+    local = threading.local()
+    headers = {'HTTP_HOST': host}
+    if token:
+        headers['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+
+    def send(target):
+        if not hasattr(local, 'client'):
+            # Report server errors as 500s rather than re-raising them in whichever thread is listening
+            local.client = Client(raise_request_exception=False, **headers)
+        if target.method == 'GET':
+            return local.client.get(target.path).status_code
+        return local.client.generic(target.method, target.path, data=_json(target.data),
+                                    content_type='application/json').status_code
+    return send
+
+
+def http_sender(base_url, token=None, timeout=30):
+    """Send requests to a running server, one ``requests`` session per thread."""
+    import requests
+
+    local = threading.local()
+
+    def send(target):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+            if token:
+                local.session.headers['Authorization'] = f"Bearer {token}"
+        response = local.session.request(target.method, base_url.rstrip('/') + target.path,
+                                         json=target.data, timeout=timeout)
+        return response.status_code
+    return send
+
+
+def _json(data):
+    return json.dumps(data) if data is not None else ''
+
+
+def run_load(targets, send, concurrency=8, requests_per_target=50, warmup=1):
+    """
+    Drive every target ``requests_per_target`` times from ``concurrency`` threads.
+
+    Requests for all targets are interleaved so each route is measured under load from
+    the others. Returns ``{name: {'latencies': [...], 'statuses': {...}, 'errors': [...]}}``
+    plus the overall wall time.
+    """
+    for target in targets:
+        for _ in range(warmup):
+            _send_once(send, target)
+
+    schedule = [t for t in targets for _ in range(requests_per_target * t.weight)]
+    rng = np.random.default_rng(0)
+    schedule = [schedule[i] for i in rng.permutation(len(schedule))]
+
+    results = {t.name: {'latencies': [], 'statuses': {}, 'errors': []} for t in targets}
+    lock = threading.Lock()
+
+    def worker(target):
+        status, seconds, error = _send_once(send, target)
+        with lock:
+            result = results[target.name]
+            result['latencies'].append(seconds)
+            result['statuses'][status] = result['statuses'].get(status, 0) + 1
+            if error:
+                result['errors'].append(error)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, schedule))
+    return results, time.perf_counter() - start
+
+
+def _send_once(send, target):
+    start = time.perf_counter()
+    try:
+        status, error = send(target), None
+    except Exception as e:
+        status, error = 'error', f"{type(e).__name__}: {e}"
+    return status, time.perf_counter() - start, error
+
+
+def summarize(results, wall_seconds):
+    """Throughput and p50/p95/p99 latency (ms) per target and overall."""
+    summary = {'targets': {}, 'wall_seconds': wall_seconds}
+    everything = []
+    for name, result in results.items():
+        latencies = np.array(result['latencies']) * 1000
+        everything.append(latencies)
+        ok = sum(n for status, n in result['statuses'].items() if isinstance(status, int) and status < 400)
+        summary['targets'][name] = {
+            'requests': len(latencies),
+            'ok': ok,
+            'statuses': {str(k): v for k, v in result['statuses'].items()},
+            'errors': result['errors'][:5],
+            **_percentiles(latencies),
+        }
+    everything = np.concatenate(everything) if everything else np.empty(0)
+    summary['overall'] = {
+        'requests': len(everything),
+        'throughput_rps': len(everything) / wall_seconds if wall_seconds else 0.0,
+        **_percentiles(everything),
+    }
+    return summary
+
+
+def _percentiles(latencies_ms):
+    if not len(latencies_ms):
+        return {'mean_ms': None, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {'mean_ms': float(latencies_ms.mean()), 'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99)}
+
+
+def format_summary(summary):
+    lines = [f"{'route':<34} {'reqs':>6} {'ok':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for name, s in summary['targets'].items():
+        if s['p50_ms'] is None:
+            continue
+        lines.append(f"{name:<34} {s['requests']:>6} {s['ok']:>6} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+    o = summary['overall']
+    if o['p50_ms'] is not None:
+        lines.append(f"\n{o['requests']} requests in {summary['wall_seconds']:.1f}s: {o['throughput_rps']:.1f} req/s, "
+                     f"p50 {o['p50_ms']:.1f} ms, p95 {o['p95_ms']:.1f} ms, p99 {o['p99_ms']:.1f} ms")
+    return "\n".join(lines)
+
+
+def process_tree_rss_mb(pid):
+    """Resident memory of ``pid`` and all its descendants (Linux /proc), or None if unavailable."""
+    children = {}
+    try:
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+                children.setdefault(ppid, []).append(int(entry))
+    except OSError:
+        return None
+
+    total_kb, todo = 0, [pid]
+    while todo:
+        current = todo.pop()
+        todo.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+class RssSampler:
+    """Samples a process tree's RSS on a background thread; ``peak`` is the highest sample."""
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process_tree_rss_mb(self.pid) or 0.0)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout}s")
+
+
+@contextmanager
+def gunicorn_server(project_dir, env=None, workers=1):
+    """Start gunicorn with gunicorn.conf.py and ``env`` overrides on a free port; yields (base_url, pid)."""
+    port = free_port()
+    env = {**os.environ, **(env or {}), 'PORT': str(port), 'WEB_CONCURRENCY': str(workers)}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f"127.0.0.1:{port}"],
+        cwd=project_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_up(base_url + '/')
+        yield base_url, server.pid
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def measure_levels(targets, send, pid, levels, requests_per_target):
+    """Run the load at each concurrency level, sampling the server's RSS; yields (clients, result, summary)."""
+    # Load models, open connections and fill caches before measuring
+    run_load(targets, send, concurrency=1, requests_per_target=1, warmup=0)
+    idle = process_tree_rss_mb(pid)
+    for clients in levels:
+        with RssSampler(pid) as sampler:
+            raw, wall = run_load(targets, send, concurrency=clients, requests_per_target=requests_per_target, warmup=0)
+        summary = summarize(raw, wall)
+        yield clients, {
+            **summary['overall'],
+            'idle_rss_mb': idle,
+            'peak_rss_mb': sampler.peak,
+            'rss_per_connection_mb': (sampler.peak - idle) / clients if idle else None,
+            'errors': sum(s['requests'] - s['ok'] for s in summary['targets'].values()),
+        }, summary
+
+
+def format_level(clients, level):
+    return (f"{clients:>4} clients: {level['throughput_rps']:7.1f} req/s  p50 {level['p50_ms']:7.1f} ms  "
+            f"p95 {level['p95_ms']:7.1f} ms  p99 {level['p99_ms']:7.1f} ms  "
+            f"peak RSS {level['peak_rss_mb']:6.0f} MB  errors {level['errors']}")
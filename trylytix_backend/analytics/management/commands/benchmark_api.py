@@ -0,0 +1,124 @@
+import json
+import platform
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from analytics.loadtest import Target, format_summary, http_sender, in_process_sender, run_load, summarize
+from events.models import Event
+from matches.models import Match
+from projects.models import Project
+from teams.models import Player, Team
+
+BENCH_USER = 'benchmark'
+
+
+def build_targets(include_writes=False, include_event_list=False):
+    match = Match.objects.order_by('-id').first()
+    if match is None:
+        raise CommandError("No matches in the database; run seed_synthetic_data first")
+    team = match.home_team
+    player = Player.objects.filter(team=team).order_by('id').first()
+    event = Event.objects.filter(match=match).order_by('id').first()
+    project = match.project
+
+    targets = [
+        # analytics/urls.py
+        Target('player_stats', f"/api/players/{player.id}/stats/"),
+        Target('team_stats', f"/api/teams/{team.id}/stats/"),
+        Target('match_summary', f"/api/matches/{match.id}/summary/"),
+        Target('match_heatmap', f"/api/matches/{match.id}/heatmap/"),
+        Target('player_advanced_stats', f"/api/players/{player.id}/advanced-stats/"),
+        Target('team_trend', f"/api/teams/{team.id}/trend/"),
+        Target('team_tactical_suggestions', f"/api/teams/{team.id}/tactical-suggestions/"),
+        Target('match_events_export', f"/api/matches/{match.id}/events-export/"),
+        Target('project_team_comparison', f"/api/projects/{project.id}/team-comparison/"),
+        Target('predict_outcome', '/api/predict-outcome/', method='POST',
+               data={'tackles': 120, 'missed_tackles': 18, 'passes': 150, 'tries': 3, 'penalties': 9}),
+        Target('player_deep_analysis', f"/api/players/{player.id}/deep-analysis/"),
+        # events, teams, matches and projects viewsets
+        Target('event_detail', f"/api/events/{event.id}/"),
+        Target('team_list', '/api/teams/'),
+        Target('team_detail', f"/api/teams/{team.id}/"),
+        Target('player_list', '/api/players/'),
+        Target('player_detail', f"/api/players/{player.id}/"),
+        Target('match_list', '/api/matches/'),
+        Target('match_detail', f"/api/matches/{match.id}/"),
+        Target('project_detail', f"/api/projects/{project.id}/"),
+    ]
+    if include_event_list:
+        # Unpaginated: serializes every event in the table
+        targets.append(Target('event_list', '/api/events/'))
+    if include_writes:
+        targets.append(Target('event_create', '/api/events/', method='POST', data={
+            'match': match.id, 'team': team.id, 'player': player.id, 'event_type': 'tackle',
+            'x_coord': 40.0, 'y_coord': 55.0, 'location_zone': 'own half', 'phase': 3,
+        }))
+    return targets
+
+
+def benchmark_token():
+    user, created = get_user_model().objects.get_or_create(username=BENCH_USER)
+    if created:
+        user.set_unusable_password()
+        user.save()
+    return str(RefreshToken.for_user(user).access_token)
+
+
+class Command(BaseCommand):
+    help = "Drive every API route with concurrent clients and report throughput and p50/p95/p99 latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help='Benchmark a running server (e.g. http://127.0.0.1:8000) '
+                                               'instead of calling the app in-process')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per route')
+        parser.add_argument('--warmup', type=int, default=1, help='Unmeasured requests per route first')
+        parser.add_argument('--routes', help='Comma separated route names to run (default: all)')
+        parser.add_argument('--include-writes', action='store_true', help='Also POST events (adds rows)')
+        parser.add_argument('--include-event-list', action='store_true', help='Also GET the unpaginated event list')
+        parser.add_argument('--output', help='Write the JSON summary here')
+
+    def handle(self, *args, **options):
+        targets = build_targets(options['include_writes'], options['include_event_list'])
+        if options['routes']:
+            wanted = set(options['routes'].split(','))
+            unknown = wanted - {t.name for t in targets}
+            if unknown:
+                raise CommandError(f"Unknown routes: {', '.join(sorted(unknown))}")
+            targets = [t for t in targets if t.name in wanted]
+
+        token = benchmark_token()
+        if options['base_url']:
+            send = http_sender(options['base_url'], token)
+        else:
+            send = in_process_sender(token)
+
+        self.stdout.write(f"Running {len(targets)} routes x {options['requests']} requests "
+                          f"with {options['concurrency']} clients against "
+                          f"{options['base_url'] or 'the in-process app'} ({settings.DATABASES['default']['ENGINE']})")
+        results, wall = run_load(targets, send, concurrency=options['concurrency'],
+                                 requests_per_target=options['requests'], warmup=options['warmup'])
+        summary = summarize(results, wall)
+        summary['config'] = {
+            'base_url': options['base_url'],
+            'concurrency': options['concurrency'],
+            'requests_per_route': options['requests'],
+            'database': settings.DATABASES['default']['ENGINE'],
+            'events': Event.objects.count(),
+            'matches': Match.objects.count(),
+            'teams': Team.objects.count(),
+            'projects': Project.objects.count(),
+            'python': platform.python_version(),
+        }
+        self.stdout.write(format_summary(summary))
+
+        failing = [name for name, s in summary['targets'].items() if s['ok'] < s['requests']]
+        if failing:
+            self.stdout.write(self.style.WARNING(f"Routes with errors: {', '.join(failing)}"))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
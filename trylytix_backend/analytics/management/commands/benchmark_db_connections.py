@@ -0,0 +1,60 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.loadtest import format_level, gunicorn_server, http_sender, measure_levels
+from analytics.management.commands.benchmark_api import benchmark_token, build_targets
+
+# Cheap, database-bound routes where connection setup is a large share of the request
+DB_ROUTES = [
+    'player_stats', 'team_stats', 'player_advanced_stats', 'event_detail', 'team_detail', 'match_detail',
+    'project_detail',
+]
+CONNECTION_MODES = {
+    'none': {'DB_CONN_MAX_AGE': '0', 'DB_POOL': ''},  # a new connection per request
+    'persistent': {'DB_CONN_MAX_AGE': '600', 'DB_POOL': ''},
+    'pool': {'DB_CONN_MAX_AGE': '0', 'DB_POOL': '1'},
+}
+
+
+class Command(BaseCommand):
+    help = "Compare per-request latency with fresh, persistent and pooled database connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(CONNECTION_MODES))
+        parser.add_argument('--server-mode', default='wsgi', choices=['wsgi', 'asgi'])
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--concurrency', default='1,8')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per route per level')
+        parser.add_argument('--output', help='Write the JSON results here')
+
+    def handle(self, *args, **options):
+        modes = options['modes'].split(',')
+        unknown = set(modes) - set(CONNECTION_MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+        if 'pool' in modes and settings.DATABASES['default']['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError("The pool mode needs Postgres; point DB_* at a local Postgres or drop 'pool' from --modes")
+
+        targets = [t for t in build_targets() if t.name in DB_ROUTES]
+        token = benchmark_token()
+        levels = [int(n) for n in options['concurrency'].split(',')]
+        results = {'server_mode': options['server_mode'], 'workers': options['workers'], 'modes': {}}
+
+        for mode in modes:
+            env = {**CONNECTION_MODES[mode], 'SERVER_MODE': options['server_mode']}
+            with gunicorn_server(settings.BASE_DIR, env, options['workers']) as (base_url, pid):
+                self.stdout.write(f"\n== {mode} connections ({options['server_mode']}, {options['workers']} workers)")
+                mode_result = results['modes'][mode] = {}
+                for clients, level, summary in measure_levels(targets, http_sender(base_url, token), pid,
+                                                              levels, options['requests']):
+                    level['routes'] = {name: {k: s[k] for k in ('p50_ms', 'p95_ms', 'p99_ms')}
+                                       for name, s in summary['targets'].items()}
+                    mode_result[str(clients)] = level
+                    self.stdout.write(format_level(clients, level))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
@@ -0,0 +1,154 @@
+import json
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from events import event_types
+
+TABLES = {'plain': 'bench_events_plain', 'partitioned': 'bench_events_partitioned'}
+COLUMNS = """
+    id bigint NOT NULL,
+    match_id bigint NOT NULL,
+    match_date date NOT NULL,
+    team_id bigint,
+    player_id bigint,
+    event_type smallint NOT NULL,
+    is_opponent_event boolean NOT NULL,
+    "timestamp" timestamptz,
+    x_coord double precision,
+    y_coord double precision,
+    location_zone varchar(50) NOT NULL,
+    phase integer,
+    description text NOT NULL
+"""
+# Same shape as the queries behind the match and season analytics
+QUERIES = {
+    'match': "SELECT event_type, count(*) FROM {table} WHERE match_id = %(match)s GROUP BY event_type",
+    'match_with_date': ("SELECT event_type, count(*) FROM {table} WHERE match_id = %(match)s AND match_date = %(date)s "
+                        "GROUP BY event_type"),
+    'season': ("SELECT event_type, count(*) FROM {table} WHERE match_date >= %(start)s AND match_date < %(end)s "
+               "GROUP BY event_type"),
+    'season_team': ("SELECT match_id, count(*) FILTER (WHERE event_type = %(tackle)s) FROM {table} "
+                    "WHERE team_id = %(team)s AND match_date >= %(start)s AND match_date < %(end)s GROUP BY match_id"),
+}
+
+
+class Command(BaseCommand):
+    help = "Compare per-match and per-season event queries on a season-partitioned and a plain table (Postgres)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seasons', type=int, default=5)
+        parser.add_argument('--matches-per-season', type=int, default=380)
+        parser.add_argument('--events-per-match', type=int, default=1000)
+        parser.add_argument('--teams', type=int, default=20)
+        parser.add_argument('--repeats', type=int, default=20)
+        parser.add_argument('--first-season', type=int, default=2021)
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch tables afterwards')
+        parser.add_argument('--output', help='Write the JSON results here')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Partitioning needs Postgres; point DB_* at a Postgres database")
+        seasons = range(options['first_season'], options['first_season'] + options['seasons'])
+        n_matches = options['seasons'] * options['matches_per_season']
+        results = {'rows': n_matches * options['events_per_match'], 'seasons': len(seasons), 'tables': {}}
+
+        try:
+            for kind, table in TABLES.items():
+                elapsed = self.create_table(table, kind == 'partitioned', seasons, options)
+                results['tables'][kind] = {'load_seconds': round(elapsed, 2), 'size_mb': self.size_mb(table)}
+                self.stdout.write(f"{table}: {results['rows']} rows loaded in {elapsed:.1f}s, "
+                                  f"{results['tables'][kind]['size_mb']} MB with indexes")
+
+            rng = np.random.default_rng(0)
+            self.stdout.write(f"\n{'query':<16} {'plain p50':>10} {'part. p50':>10} {'plain p95':>10} {'part. p95':>10}  speedup")
+            for name, sql in QUERIES.items():
+                timings = {kind: [] for kind in TABLES}
+                for _ in range(options['repeats']):
+                    params = self.query_params(rng, seasons, options)
+                    for kind, table in TABLES.items():
+                        timings[kind].append(self.time_query(sql.format(table=table), params))
+                row = {}
+                for kind in TABLES:
+                    ordered = sorted(timings[kind])
+                    row[kind] = {'p50_ms': round(statistics.median(ordered), 2),
+                                 'p95_ms': round(ordered[int(0.95 * (len(ordered) - 1))], 2)}
+                row['speedup'] = round(row['plain']['p50_ms'] / max(row['partitioned']['p50_ms'], 1e-6), 2)
+                results.setdefault('queries', {})[name] = row
+                self.stdout.write(f"{name:<16} {row['plain']['p50_ms']:>8.2f}ms {row['partitioned']['p50_ms']:>8.2f}ms "
+                                  f"{row['plain']['p95_ms']:>8.2f}ms {row['partitioned']['p95_ms']:>8.2f}ms  "
+                                  f"{row['speedup']}x")
+        finally:
+            if not options['keep']:
+                with connection.cursor() as cursor:
+                    for table in TABLES.values():
+                        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def create_table(self, table, partitioned, seasons, options):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            if partitioned:
+                cursor.execute(f"CREATE TABLE {table} ({COLUMNS}, PRIMARY KEY (id, match_date)) "
+                               "PARTITION BY RANGE (match_date)")
+                for year in seasons:
+                    cursor.execute(f"CREATE TABLE {table}_y{year} PARTITION OF {table} "
+                                   f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')")
+            else:
+                cursor.execute(f"CREATE TABLE {table} ({COLUMNS}, PRIMARY KEY (id))")
+                # The plain table gets the date index a season query would otherwise need
+                cursor.execute(f"CREATE INDEX ON {table} (match_date)")
+            for column in ('match_id', 'team_id', 'player_id'):
+                cursor.execute(f"CREATE INDEX ON {table} ({column})")
+
+            start = time.perf_counter()
+            # Matches spread over February to November of each season; two teams per match
+            cursor.execute(f"""
+                INSERT INTO {table}
+                SELECT n, m, make_date((%(first)s + m / %(per_season)s)::int, 2, 1)
+                             + ((m %% %(per_season)s) * 270 / %(per_season)s)::int,
+                       (m + n %% 2) %% %(teams)s, n %% (%(teams)s * 23), 1 + (n * 7919) %% %(n_types)s,
+                       n %% 2 = 1, now(), random() * 100, random() * 70, '', n %% 12, ''
+                FROM (SELECT n, n / %(events)s AS m FROM generate_series(0::bigint, %(rows)s - 1) AS n) AS g
+            """, {
+                'first': seasons[0], 'per_season': options['matches_per_season'], 'teams': options['teams'],
+                'n_types': len(event_types.NAMES), 'events': options['events_per_match'],
+                'rows': len(seasons) * options['matches_per_season'] * options['events_per_match'],
+            })
+            elapsed = time.perf_counter() - start
+            cursor.execute(f"ANALYZE {table}")
+        return elapsed
+
+    def size_mb(self, table):
+        with connection.cursor() as cursor:
+            # Partitions included: the table and everything inheriting from it
+            cursor.execute("""
+                SELECT SUM(pg_total_relation_size(oid)) FROM pg_class
+                WHERE oid = %s::regclass OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+            """, [table, table])
+            return round(cursor.fetchone()[0] / 2 ** 20, 1)
+
+    def query_params(self, rng, seasons, options):
+        season = int(rng.integers(len(seasons)))
+        match = season * options['matches_per_season'] + int(rng.integers(options['matches_per_season']))
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT match_date FROM {TABLES['plain']} WHERE match_id = %s LIMIT 1", [match])
+            date = cursor.fetchone()[0]
+        return {
+            'match': match, 'date': date, 'team': int(rng.integers(options['teams'])), 'tackle': event_types.code('tackle'),
+            'start': f"{seasons[season]}-01-01", 'end': f"{seasons[season] + 1}-01-01",
+        }
+
+    def time_query(self, sql, params):
+        with connection.cursor() as cursor:
+            start = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            return (time.perf_counter() - start) * 1000
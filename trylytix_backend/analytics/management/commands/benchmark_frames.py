@@ -0,0 +1,104 @@
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from analytics import frames
+from events import event_types
+
+ZONES = ['own 22', 'own half', 'halfway', 'opposition half', 'opposition 22', 'left wing', 'right wing', '']
+DESCRIPTIONS = ['', 'Carry over the gain line', 'Box kick from the base of the ruck', 'Dominant tackle',
+                'Penalty for not releasing', 'Lineout won on the throw', 'Offload in the tackle']
+# The pipelines' hot paths over the extracted events
+OPERATIONS = {
+    'groupby_match_team': lambda df: df.groupby(['match_id', 'team_name'], sort=False, observed=True).size(),
+    'groupby_type_mean_xy': lambda df: df.groupby('event_code')[['x_coord', 'y_coord']].mean(),
+    'value_counts_zone': lambda df: df['location_zone'].value_counts(),
+    'sort_timestamp': lambda df: df.sort_values('timestamp', kind='stable'),
+    'sort_match_team': lambda df: df.sort_values(['match_id', 'team_name'], kind='stable'),
+    'filter_tries': lambda df: df[df['event_code'] == event_types.TRY],
+}
+
+
+class Command(BaseCommand):
+    help = "Compare memory and groupby/sort times of an event frame in default and analytics.frames dtypes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2_000_000)
+        parser.add_argument('--events-per-match', type=int, default=1000)
+        parser.add_argument('--teams', type=int, default=20)
+        parser.add_argument('--repeats', type=int, default=5)
+        parser.add_argument('--output', help='Write the JSON results here')
+
+    def handle(self, *args, **options):
+        default = self.default_frame(options)
+        start = time.perf_counter()
+        compact = frames.apply_schema(default.copy())
+        cast_seconds = time.perf_counter() - start
+        layouts = {'default': default, 'compact': compact}
+
+        results = {'rows': len(default), 'cast_seconds': round(cast_seconds, 2), 'memory_mb': {}, 'operations': {}}
+        for name, df in layouts.items():
+            results['memory_mb'][name] = round(frames.memory_usage(df) / 2**20, 1)
+        saving = 1 - results['memory_mb']['compact'] / results['memory_mb']['default']
+        self.stdout.write(f"{len(default)} events: {results['memory_mb']['default']} MB in default dtypes, "
+                          f"{results['memory_mb']['compact']} MB compact ({saving:.0%} less), cast in {cast_seconds:.2f}s")
+
+        self.stdout.write(f"\n{'operation':<22} {'default':>9} {'compact':>9}  speedup  {'peak default':>12} {'peak compact':>12}")
+        for op_name, op in OPERATIONS.items():
+            row = {}
+            for name, df in layouts.items():
+                timings = []
+                for _ in range(options['repeats']):
+                    start = time.perf_counter()
+                    op(df)
+                    timings.append((time.perf_counter() - start) * 1000)
+                row[name] = {'best_ms': round(min(timings), 1), 'peak_mb': self.peak_mb(op, df)}
+            row['speedup'] = round(row['default']['best_ms'] / max(row['compact']['best_ms'], 1e-6), 2)
+            results['operations'][op_name] = row
+            self.stdout.write(f"{op_name:<22} {row['default']['best_ms']:>7.1f}ms {row['compact']['best_ms']:>7.1f}ms  "
+                              f"{row['speedup']:>6.2f}x  {row['default']['peak_mb']:>9.1f} MB {row['compact']['peak_mb']:>9.1f} MB")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def default_frame(self, options):
+        """Synthetic events as ``DataFrame.from_records`` builds them from the extract query's rows."""
+        rng = np.random.default_rng(0)
+        n = options['rows']
+        match_id = np.arange(n) // options['events_per_match'] + 1
+        team = (match_id * 2 + rng.integers(0, 2, n)) % options['teams']
+        team_names = np.array([f'Team {i}' for i in range(options['teams'])], dtype=object)
+        player_id = (team * 23 + rng.integers(0, 23, n)).astype(float)
+        player_id[rng.random(n) < 0.05] = np.nan
+        seconds = (np.arange(n) % options['events_per_match']) * 4.8 + match_id * 86400
+        # The columns of full_try_analysis's extract stage
+        return pd.DataFrame({
+            'id': np.arange(1, n + 1),
+            'match_id': match_id,
+            'player_id': player_id,
+            'timestamp': pd.to_datetime(seconds, unit='s', utc=True),
+            'phase': rng.integers(1, 30, n).astype(float),
+            'x_coord': rng.random(n) * 100,
+            'y_coord': rng.random(n) * 70,
+            'location_zone': np.array(ZONES, dtype=object)[rng.integers(0, len(ZONES), n)],
+            'description': np.array(DESCRIPTIONS, dtype=object)[rng.integers(0, len(DESCRIPTIONS), n)],
+            'team_name': team_names[team],
+            'event_code': rng.integers(1, event_types.VOCAB_SIZE, n),
+        })
+
+    @staticmethod
+    def peak_mb(op, df):
+        """Peak memory allocated while the operation runs, over what was held before."""
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            op(df)
+            return round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        finally:
+            tracemalloc.stop()
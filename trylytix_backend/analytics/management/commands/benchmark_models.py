@@ -0,0 +1,70 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import model_benchmarks
+from analytics.model_benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Measure cold load, warm latency, batch throughput and peak RSS of the prediction paths"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', help=f"Comma separated subset of {', '.join(BENCHMARKS)}")
+        parser.add_argument('--repeats', type=int, default=100, help='Warm single calls per model')
+        parser.add_argument('--batch-sizes', default='1,32,256,1024', help='Comma separated batch sizes')
+        parser.add_argument('--skip-cold', action='store_true', help='Skip the fresh-interpreter cold start runs')
+        parser.add_argument('--output', help='Write the JSON results here')
+        parser.add_argument('--baseline', help='Earlier JSON results to compare against')
+
+    def handle(self, *args, **options):
+        names = options['models'].split(',') if options['models'] else list(BENCHMARKS)
+        unknown = set(names) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f"Unknown models: {', '.join(sorted(unknown))}")
+        sizes = [int(n) for n in options['batch_sizes'].split(',')]
+
+        results = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'models': {},
+        }
+        for name in names:
+            self.stdout.write(f"[{name}]")
+            result = results['models'][name] = {}
+            steps = [('warm', lambda: model_benchmarks.run_warm(name, options['repeats'])),
+                     ('batch', lambda: model_benchmarks.run_batch(name, sizes))]
+            if not options['skip_cold']:
+                steps.insert(0, ('cold', lambda: model_benchmarks.run_cold(name, settings.BASE_DIR)))
+            for step, run in steps:
+                try:
+                    result[step] = run()
+                except Exception as e:
+                    result[step] = {'error': f"{type(e).__name__}: {e}"}
+                self.stdout.write(f"  {step}: {self._format(step, result[step])}")
+        results['process_peak_rss_mb'] = model_benchmarks.peak_rss_mb()
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                results['vs_baseline'] = model_benchmarks.compare(results, json.load(f))
+            for name, changes in results['vs_baseline'].items():
+                self.stdout.write(f"[{name}] vs baseline: " +
+                                  ', '.join(f"{k} {v:+.1%}" for k, v in changes.items()))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def _format(self, step, result):
+        if 'error' in result:
+            return self.style.ERROR(result['error'])
+        if step == 'cold':
+            return (f"import {result['import_seconds']:.2f}s, load {result['load_seconds']:.2f}s, "
+                    f"first call {result['first_call_seconds'] * 1000:.1f} ms, peak RSS {result['peak_rss_mb']:.0f} MB")
+        if step == 'warm':
+            return f"p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms"
+        return ', '.join(f"{n}: {s['rows_per_second']:.0f} rows/s" for n, s in result.items())
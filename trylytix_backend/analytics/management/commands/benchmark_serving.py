@@ -0,0 +1,46 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from analytics.loadtest import format_level, format_summary, gunicorn_server, http_sender, measure_levels
+from analytics.management.commands.benchmark_api import benchmark_token, build_targets
+
+# The read-only analytics routes, served by async views
+READ_ROUTES = [
+    'player_stats', 'team_stats', 'match_summary', 'match_heatmap', 'player_advanced_stats',
+    'team_trend', 'team_tactical_suggestions', 'match_events_export',
+]
+
+
+class Command(BaseCommand):
+    help = "Compare throughput, latency and memory of the WSGI (sync workers) and ASGI (uvicorn) serving modes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='wsgi,asgi')
+        parser.add_argument('--workers', type=int, default=1, help='Gunicorn worker processes per mode')
+        parser.add_argument('--concurrency', default='1,16,64', help='Comma separated client counts')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per route per level')
+        parser.add_argument('--output', help='Write the JSON results here')
+
+    def handle(self, *args, **options):
+        targets = [t for t in build_targets() if t.name in READ_ROUTES]
+        token = benchmark_token()
+        levels = [int(n) for n in options['concurrency'].split(',')]
+        results = {'workers': options['workers'], 'modes': {}}
+
+        for mode in options['modes'].split(','):
+            with gunicorn_server(settings.BASE_DIR, {'SERVER_MODE': mode}, options['workers']) as (base_url, pid):
+                self.stdout.write(f"\n== {mode} ({options['workers']} workers)")
+                mode_result = results['modes'][mode] = {}
+                for clients, level, summary in measure_levels(targets, http_sender(base_url, token), pid,
+                                                              levels, options['requests']):
+                    mode_result[str(clients)] = level
+                    self.stdout.write(format_level(clients, level))
+                    if options['verbosity'] > 1:
+                        self.stdout.write(format_summary(summary))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
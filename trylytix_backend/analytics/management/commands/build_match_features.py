@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics import feature_store
+from matches.models import Match
+
+
+class Command(BaseCommand):
+    help = "Compute the per-match model features from events (only matches whose events changed, unless --rebuild)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--match', type=int, action='append', help='Only this match (repeatable)')
+        parser.add_argument('--project', type=int, help="Only this project's matches")
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every match')
+
+    def handle(self, *args, **options):
+        matches = Match.objects.order_by('id')
+        if options['project']:
+            matches = matches.filter(project_id=options['project'])
+        match_ids = options['match'] or list(matches.values_list('id', flat=True))
+        start = time.perf_counter()
+        computed = feature_store.refresh(match_ids, rebuild=options['rebuild'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{len(match_ids)} matches: {computed} computed, {len(match_ids) - computed} up to date "
+                          f"({elapsed:.2f}s)")
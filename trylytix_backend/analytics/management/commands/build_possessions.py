@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.models import Possession
+from analytics.possessions import update_matches
+from matches.models import Match
+
+
+class Command(BaseCommand):
+    help = "Reconstruct possessions from match events (only what changed since the last run, unless --rebuild)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--match', type=int, action='append', help='Only this match (repeatable)')
+        parser.add_argument('--rebuild', action='store_true', help='Re-segment every match from scratch')
+
+    def handle(self, *args, **options):
+        match_ids = options['match'] or list(Match.objects.order_by('id').values_list('id', flat=True))
+        start = time.perf_counter()
+        written = update_matches(match_ids, rebuild=options['rebuild'], log=self.stdout.write)
+        elapsed = time.perf_counter() - start
+        total = Possession.objects.filter(match_id__in=match_ids).count()
+        self.stdout.write(f"{len(match_ids)} matches: {written} possessions written, {total} stored "
+                          f"({elapsed:.1f}s, {len(match_ids) / max(elapsed, 1e-6):.0f} matches/s)")
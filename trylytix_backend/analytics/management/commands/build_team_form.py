@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics import form
+from teams.models import Team
+
+
+class Command(BaseCommand):
+    help = "Fold new matches into each team's rolling form (from scratch with --rebuild)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--team', type=int, action='append', help='Only this team (repeatable)')
+        parser.add_argument('--rebuild', action='store_true', help="Recompute every team's form from its first match")
+
+    def handle(self, *args, **options):
+        team_ids = options['team'] or list(Team.objects.order_by('id').values_list('id', flat=True))
+        update = form.rebuild_team if options['rebuild'] else form.update_team
+        start = time.perf_counter()
+        folded = sum(update(team_id) for team_id in team_ids)
+        self.stdout.write(f"{len(team_ids)} teams: {folded} matches folded in ({time.perf_counter() - start:.2f}s)")
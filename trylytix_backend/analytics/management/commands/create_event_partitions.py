@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from events import partitioning
+
+
+class Command(BaseCommand):
+    help = "Create events table partitions for upcoming seasons (run from cron ahead of each season)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=1, help='Seasons after the current one to create')
+        parser.add_argument('--year', type=int, action='append', help='Create this season (repeatable)')
+        parser.add_argument('--list', action='store_true', help='Only list the existing partitions')
+
+    def handle(self, *args, **options):
+        if not partitioning.is_partitioned(connection):
+            raise CommandError("events_event is not partitioned (needs Postgres and migration events.0008)")
+
+        if not options['list']:
+            current = timezone.now().year
+            years = options['year'] or range(current, current + options['ahead'] + 1)
+            for year in years:
+                with transaction.atomic():
+                    created = partitioning.create_partition(connection, year)
+                self.stdout.write(f"{partitioning.partition_name(year)}: {'created' if created else 'exists'}")
+
+        for name, rows in partitioning.partitions(connection):
+            self.stdout.write(f"  {name:<24} ~{max(rows, 0)} rows")
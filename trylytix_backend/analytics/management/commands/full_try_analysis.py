@@ -1,8 +1,13 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import datetime
 from collections import Counter
-from django.core.management.base import BaseCommand
-from events.models import Event
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, F, Max, Q
+from events import event_types
+from events.models import Event, event_type_codes
+from teams.models import Team
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
@@ -15,23 +20,227 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Embedding, LSTM, Dense, Masking
 from tensorflow.keras.preprocessing.sequence import pad_sequences
 from tensorflow.keras.utils import to_categorical
-import joblib
-
-EVENT_TYPE_LIST = [
-    "try", "kick", "penalty", "kickoff", "pass", "carry", "run", "tackle", "missed_tackle", "ruck",
-    "maul", "lineout", "lineout_win", "lineout_loss", "scrum", "scrum_win", "scrum_loss", "kick_return",
-    "box_kick", "grubber_kick", "free_kick", "drop_goal", "conversion", "conversion_missed",
-    "penalty_goal", "penalty_missed", "turnover", "knock_on", "forward_pass", "interception",
-    "high_tackle", "offside", "not_releasing", "holding_on", "in_touch", "restart", "injury",
-    "yellow_card", "red_card", "sin_bin", "substitution", "try_assist", "line_break",
-    "defensive_line_break", "advantage", "offload", "foul_play", "referee_call", "timeout",
-    "restart_22"
-]
-EVENT_TYPE2IDX = {e: i+1 for i, e in enumerate(EVENT_TYPE_LIST)}
-IDX2EVENT_TYPE = {v: k for k, v in EVENT_TYPE2IDX.items()}
+import os
+import tempfile
+from analytics import artifacts, frames
+from analytics.pipeline import Pipeline, Stage
+from analytics.try_sequences import SEQUENCE_DIR, SequenceStore, build_match_sequences
+
+PIPELINE_CACHE_DIR = os.path.join(os.path.dirname(SEQUENCE_DIR), 'try_pipeline')
+
+# Event types come out of the database as their stored codes (see events/event_types.py),
+# which are the sequence models' input ids
+EXTRACT_FIELDS = ('id', 'match_id', 'player_id', 'timestamp', 'phase', 'x_coord', 'y_coord', 'location_zone',
+                  'description')
+
+# --- STAGES ---
+# Each stage gets the run params and its upstream outputs, and returns a picklable result
+# that the pipeline persists, keyed by the fingerprint of its inputs.
+
+def extract_events(ctx):
+    """1. FETCH & PREP DATA"""
+    params = ctx['params']
+    qs = Event.objects.filter(id__lte=params['last_event_id'])
+    if params['team']:
+        qs = qs.filter(team__name=params['team'])
+    if params['incremental']:
+        # Re-encode every match that received or edited events since the last run
+        since = Q(id__gt=params['watermark']) | Q(updated_at__gt=params['updated_since'])
+        changed = list(qs.filter(since).order_by().values_list('match_id', flat=True).distinct())
+        print(f"Incremental run: {len(changed)} new or updated matches since event {params['watermark']}"
+              f" and {params['updated_since']:%Y-%m-%d %H:%M:%S}")
+        qs = qs.filter(match_id__in=changed)
+    rows = qs.values(*params['fields'], team_name=F('team__name'), event_code=event_type_codes())
+    # Categorical team names and zones, int16 codes, float32 coordinates (see analytics/frames.py)
+    df = frames.event_frame(rows, columns=[*params['fields'], 'team_name', 'event_code'])
+    # Stages run in worker threads; don't leave this thread's connection open
+    connection.close()
+    return df
+
+def describe_tries(ctx):
+    """2. DESCRIPTIVE ANALYTICS"""
+    df = ctx['inputs']['extract']
+    try_events = df[df['event_code'] == event_types.TRY]
+    # Categorical counts list every category; keep the ones that scored
+    by_team = try_events['team_name'].value_counts()[lambda counts: counts > 0]
+    by_zone = try_events['location_zone'].value_counts()[lambda counts: counts > 0]
+    print(f"\nTotal tries: {len(try_events)}")
+    print(f"Try breakdown by team:\n{by_team}")
+    print(f"Try breakdown by location_zone:\n{by_zone}")
+    return {'tries': len(try_events), 'by_team': by_team.to_dict(), 'by_zone': by_zone.to_dict()}
+
+def plot_heatmap(ctx):
+    """Try location heatmap (object-oriented matplotlib, safe to run off the main thread)"""
+    df = ctx['inputs']['extract']
+    try_locations = df.loc[df['event_code'] == event_types.TRY, ['x_coord', 'y_coord']].dropna()
+    if try_locations.empty:
+        return None
+    fig = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    hb = ax.hexbin(try_locations['x_coord'], try_locations['y_coord'], gridsize=20, cmap='Reds', bins='log')
+    ax.set_xlabel('Field Length (x, 0=own try line, 100=opposition try line)')
+    ax.set_ylabel('Field Width (y)')
+    ax.set_title('Try Locations Heatmap')
+    fig.colorbar(hb, label='log(N tries)')
+    fig.tight_layout()
+    path = ctx['params']['heatmap_path']
+    fig.savefig(path)
+    print(f"Try location heatmap saved as {path}")
+    return path
+
+def mine_patterns(ctx):
+    """3. PATTERN MINING: the n_events a team made before each of its tries"""
+    df = ctx['inputs']['extract']
+    n_events = ctx['params']['n_events']
+    patterns = []
+    for _, team_df in df.groupby(['match_id', 'team_name'], sort=False, observed=True):
+        team_df = team_df.sort_values('timestamp', kind='stable')
+        timestamps = team_df['timestamp'].to_numpy()
+        events = team_df['event_code'].to_numpy()
+        for pos in np.flatnonzero(events == event_types.TRY):
+            # Only events strictly before the try's timestamp
+            end = np.searchsorted(timestamps, timestamps[pos], side='left')
+            patterns.append(tuple(events[max(0, end - n_events):end]))
+
+    pattern_counts = Counter(tuple(event_types.decode(codes)) for codes in patterns)
+    print("\nMost common event patterns before a try:")
+    for seq, count in pattern_counts.most_common(10):
+        print(f"{seq}: {count} times")
+    return pattern_counts
+
+def encode_sequences(ctx):
+    """4a. Build sequences (X) and targets (y), stored per match so incremental runs only encode changed matches"""
+    df = ctx['inputs']['extract']
+    params = ctx['params']
+    maxlen = params['maxlen']
+    store = SequenceStore(params['sequence_dir'])
+    if not params['incremental']:
+        store.clear()
+    new_chunks = []
+    for match_id, match_df in df.groupby('match_id'):
+        X_match, y_match = build_match_sequences(match_df, maxlen)
+        store.write_match(match_id, X_match, y_match)
+        new_chunks.append((X_match, y_match))
+    X_new = np.concatenate([c[0] for c in new_chunks]) if new_chunks else np.empty((0, maxlen))
+    y_new = np.concatenate([c[1] for c in new_chunks]) if new_chunks else np.empty(0)
+    X, y = store.load()
+    print(f"\nSequence dataset: {len(X)} sequences ({len(X_new)} from this run)")
+    return {'X': X, 'y': y, 'X_new': X_new, 'y_new': y_new,
+            'new_match_ids': sorted(int(m) for m in df['match_id'].unique()), 'matches': len(store.match_ids())}
+
+def train_classifier(ctx):
+    """4b. CLASSIC MACHINE LEARNING: Predict if sequence leads to try"""
+    seqs = ctx['inputs']['sequences']
+    X, y = seqs['X'], seqs['y']
+    if len(X) == 0:
+        print("Not enough data for classic ML.")
+        return None
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    clf = RandomForestClassifier(n_estimators=100, random_state=42)
+    clf.fit(X_train, y_train)
+    y_pred = clf.predict(X_test)
+    rf_accuracy = accuracy_score(y_test, y_pred)
+    print("\nClassic ML (RandomForest):")
+    print("Accuracy:", rf_accuracy)
+    print(classification_report(y_test, y_pred))
+    return {'model': clf, 'accuracy': float(rf_accuracy)}
+
+def load_previous_lstm(maxlen):
+    doc = artifacts.manifest('try_pattern')
+    if not doc or doc.get('feature_schema', {}).get('maxlen') != maxlen:
+        print("No compatible stored LSTM to warm-start from, training from scratch.")
+        return None
+    return tf.keras.models.load_model(artifacts.artifact_path('try_pattern', 'lstm'))
 
-def encode_event_seq(seq):
-    return [EVENT_TYPE2IDX.get(ev, 0) for ev in seq]
+def train_lstm(ctx):
+    """5. DEEP LEARNING: LSTM Sequence Model"""
+    seqs = ctx['inputs']['sequences']
+    params = ctx['params']
+    maxlen = params['maxlen']
+    X, y, X_new, y_new = seqs['X'], seqs['y'], seqs['X_new'], seqs['y_new']
+    if len(X) == 0:
+        print("Not enough data for deep learning.")
+        return None
+
+    vocab_size = event_types.VOCAB_SIZE + 1
+    X_pad = pad_sequences(X, maxlen=maxlen)
+    y_cat = to_categorical(y, 2)
+
+    model = load_previous_lstm(maxlen) if params['incremental'] else None
+    if model is not None and len(X_new) > 0:
+        # Warm start: continue training on the new sequences plus a replayed sample of old ones
+        store = SequenceStore(params['sequence_dir'])
+        X_old, y_old = store.load([m for m in store.match_ids() if m not in set(seqs['new_match_ids'])])
+        n_replay = min(len(X_old), int(len(X_new) * params['replay_ratio']))
+        replay = np.random.default_rng(42).choice(len(X_old), size=n_replay, replace=False)
+        X_fit = np.concatenate([X_new, X_old[replay]]) if n_replay else X_new
+        y_fit = np.concatenate([y_new, y_old[replay]]) if n_replay else y_new
+        print(f"\nWarm-starting LSTM on {len(X_new)} new + {n_replay} replayed sequences...")
+        model.fit(pad_sequences(X_fit, maxlen=maxlen), to_categorical(y_fit, 2),
+                  batch_size=64, epochs=params['epochs'], verbose=2)
+    else:
+        model = Sequential()
+        model.add(Embedding(input_dim=vocab_size, output_dim=32, mask_zero=True, input_length=maxlen))
+        model.add(LSTM(32, return_sequences=False))
+        model.add(Dense(16, activation='relu'))
+        model.add(Dense(2, activation='softmax'))
+        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+        print("\nTraining LSTM deep learning model...")
+        model.fit(X_pad, y_cat, batch_size=64, epochs=params['epochs'], validation_split=0.2, verbose=2)
+    scores = model.evaluate(X_pad, y_cat, verbose=0)
+    print(f"LSTM model accuracy on all data: {scores[1]*100:.2f}%")
+
+    # Keras models don't pickle; keep the weights next to the stage cache and return the path
+    path = os.path.join(ctx['cache_dir'], f"lstm-{ctx['key']}.h5")
+    model.save(path)
+    return {'path': path, 'accuracy': float(scores[1])}
+
+def publish_models(ctx):
+    """Store both models as a new try_pattern artifact version and advance the watermark"""
+    params = ctx['params']
+    seqs, rf, lstm = ctx['inputs']['sequences'], ctx['inputs']['classifier'], ctx['inputs']['lstm']
+    if rf is None or lstm is None:
+        return None
+    version = artifacts.save_version(
+        'try_pattern',
+        objects={'classifier': rf['model']},
+        files={'lstm': lstm['path']},
+        metadata={
+            'feature_schema': {'maxlen': params['maxlen'], 'event_types': event_types.NAMES},
+            'data_range': {
+                'sequences': int(len(seqs['X'])),
+                'matches': seqs['matches'],
+                'last_event_id': int(params['last_event_id']),
+                'team': params['team'],
+                'incremental': params['incremental'],
+            },
+            'metrics': {'rf_accuracy': rf['accuracy'], 'lstm_accuracy': lstm['accuracy']},
+        },
+    )
+    print(f"Saved classifier and LSTM as try_pattern version {version}")
+    # Only advance the watermark once the models trained on these sequences are saved
+    SequenceStore(params['sequence_dir']).save_state(dict(
+        params['dataset_settings'], last_event_id=int(params['last_event_id']), last_update=params['last_update'].isoformat()))
+    return version
+
+# Stages that write outside the cache (the heatmap PNG, the SequenceStore, the artifact and its
+# watermark) always run: a cache hit would return the old output and leave those files as some
+# other run left them
+DATA_OPTIONS = ('team', 'incremental', 'watermark', 'updated_since', 'last_event_id', 'event_count', 'last_update', 'team_names', 'fields')
+STAGES = [
+    Stage('extract', extract_events, options=DATA_OPTIONS, description='Load events into a DataFrame'),
+    Stage('describe', describe_tries, deps=['extract'], description='Try counts by team and zone'),
+    Stage('heatmap', plot_heatmap, deps=['extract'], options=['heatmap_path'], cache=False,
+          description='Try location heatmap PNG'),
+    Stage('patterns', mine_patterns, deps=['extract'], options=['n_events'], description='Event patterns before tries'),
+    Stage('sequences', encode_sequences, deps=['extract'], options=['maxlen', 'sequence_dir'], cache=False,
+          description='Encoded sliding-window training set'),
+    Stage('classifier', train_classifier, deps=['sequences'], description='RandomForest try classifier'),
+    Stage('lstm', train_lstm, deps=['sequences'], options=['epochs', 'replay_ratio'], description='LSTM try model'),
+    Stage('publish', publish_models, deps=['sequences', 'classifier', 'lstm'], cache=False,
+          description='Save a new artifact version'),
+]
 
 class Command(BaseCommand):
     help = "Full rugby try analysis: descriptive, pattern mining, ML, deep learning"
@@ -41,134 +250,82 @@ class Command(BaseCommand):
         parser.add_argument('--opponent', type=str, default=None, help='Analyze tries scored against this team only')
         parser.add_argument('--n_events', type=int, default=5, help='Number of events before each try to analyze')
         parser.add_argument('--maxlen', type=int, default=10, help='Max sequence length for ML')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only encode matches with events added or edited since the last run and warm-start the LSTM')
+        parser.add_argument('--sequence-dir', type=str, default=SEQUENCE_DIR, help='Where the encoded sequence dataset is kept')
+        parser.add_argument('--epochs', type=int, default=3, help='LSTM epochs (per run, also when warm-starting)')
+        parser.add_argument('--replay-ratio', type=float, default=1.0,
+                            help='Incremental runs: old sequences replayed per new sequence when warm-starting the LSTM')
+        parser.add_argument('--stages', type=str, default=None,
+                            help='Comma separated stages to run (their dependencies are loaded from cache or run too)')
+        parser.add_argument('--force', type=str, default='',
+                            help="Comma separated stages to recompute even if cached, or 'all'")
+        parser.add_argument('--list-stages', action='store_true', help='List the stages and exit')
+        parser.add_argument('--workers', type=int, default=4, help='Stages run concurrently when independent')
+        parser.add_argument('--cache-dir', type=str, default=PIPELINE_CACHE_DIR, help='Where stage outputs are persisted')
+        parser.add_argument('--heatmap-path', type=str, default='try_locations_heatmap.png')
 
     def handle(self, *args, **options):
+        if options['list_stages']:
+            for stage in STAGES:
+                deps = f" (needs {', '.join(stage.deps)})" if stage.deps else ''
+                print(f"{stage.name:<12} {stage.description}{deps}")
+            return
+
         team_name = options['team']
-        opponent_name = options['opponent']
         n_events = options['n_events']
         maxlen = options['maxlen']
         print(f"Analyzing last {n_events} events before each try (max sequence length for ML: {maxlen})...")
 
-        # 1. FETCH & PREP DATA
-        qs = Event.objects.all().select_related("team", "player", "match")
+        store = SequenceStore(options['sequence_dir'])
+        dataset_settings = {'maxlen': maxlen, 'team': team_name, 'event_types': event_types.NAMES}
+        state = store.load_state()
+        # Datasets from before edits were tracked can't tell which of their events changed since
+        incremental = options['incremental'] and store.is_compatible(dataset_settings) and 'last_update' in state
+        if options['incremental'] and not incremental:
+            print("No compatible sequence dataset on disk yet, running a full rebuild.")
+        watermark = state.get('last_event_id', 0) if incremental else 0
+        updated_since = datetime.datetime.fromisoformat(state['last_update']) if incremental else None
+
+        # The event table's id watermark, size and last edit fingerprint the extract stage (and so
+        # everything downstream); the extracted rows carry team names, so renames count too
+        qs = Event.objects.all()
         if team_name:
             qs = qs.filter(team__name=team_name)
-        data = []
-        for e in qs:
-            data.append({
-                'id': e.id,
-                'match_id': e.match_id,
-                'team_name': e.team.name if e.team else None,
-                'player_id': e.player_id,
-                'event_type': e.event_type,
-                'timestamp': e.timestamp,
-                'phase': e.phase,
-                'x_coord': e.x_coord,
-                'y_coord': e.y_coord,
-                'location_zone': e.location_zone,
-                'description': e.description,
-            })
-        df = pd.DataFrame(data)
-        if df.empty:
+        table = qs.aggregate(last=Max('id'), count=Count('id'), updated=Max('updated_at'))
+        if not table['count']:
             print("No events found for the given filter.")
             return
+        if incremental and table['last'] <= watermark and table['updated'] <= updated_since:
+            print("No new or edited events since the last run.")
+            return
+
+        params = {
+            'team': team_name,
+            'n_events': n_events,
+            'maxlen': maxlen,
+            'incremental': incremental,
+            'watermark': watermark,
+            'updated_since': updated_since,
+            'last_event_id': table['last'],
+            'event_count': table['count'],
+            'last_update': table['updated'],
+            'team_names': list(Team.objects.order_by('id').values_list('id', 'name')),
+            'sequence_dir': options['sequence_dir'],
+            'dataset_settings': dataset_settings,
+            'epochs': options['epochs'],
+            'replay_ratio': options['replay_ratio'],
+            'heatmap_path': options['heatmap_path'],
+            'fields': EXTRACT_FIELDS,
+        }
+        names = [stage.name for stage in STAGES]
+        targets = options['stages'].split(',') if options['stages'] else names
+        force = names if options['force'] == 'all' else [f for f in options['force'].split(',') if f]
 
-        # 2. DESCRIPTIVE ANALYTICS
-        try_events = df[df['event_type'] == 'try']
-        print(f"\nTotal tries: {len(try_events)}")
-        print(f"Try breakdown by team:\n{try_events['team_name'].value_counts()}")
-        print(f"Try breakdown by location_zone:\n{try_events['location_zone'].value_counts()}")
-
-        # Try location heatmap
-        try_locations = try_events[['x_coord','y_coord']].dropna()
-        if not try_locations.empty:
-            plt.figure(figsize=(8, 6))
-            plt.hexbin(try_locations['x_coord'], try_locations['y_coord'], gridsize=20, cmap='Reds', bins='log')
-            plt.xlabel('Field Length (x, 0=own try line, 100=opposition try line)')
-            plt.ylabel('Field Width (y)')
-            plt.title('Try Locations Heatmap')
-            plt.colorbar(label='log(N tries)')
-            plt.tight_layout()
-            plt.savefig('try_locations_heatmap.png')
-            print("Try location heatmap saved as try_locations_heatmap.png")
-
-        # 3. PATTERN MINING
-        patterns = []
-        for idx, row in try_events.iterrows():
-            match_id = row['match_id']
-            team_name = row['team_name']
-            ts = row['timestamp']
-            prev_events = df[
-                (df['match_id'] == match_id) &
-                (df['team_name'] == team_name) &
-                (df['timestamp'] < ts)
-            ].sort_values('timestamp').tail(n_events)
-            patterns.append(tuple(prev_events['event_type']))
-
-        pattern_counts = Counter(patterns)
-        print("\nMost common event patterns before a try:")
-        for seq, count in pattern_counts.most_common(10):
-            print(f"{seq}: {count} times")
-
-        # 4. CLASSIC MACHINE LEARNING: Predict if sequence leads to try
-
-        # (a) Build sequences (X) and targets (y)
-        # For all sequences of maxlen events, label 1 if next event is try, else 0
-        sequences = []
-        labels = []
-        for match_id in df['match_id'].unique():
-            match_df = df[df['match_id'] == match_id].sort_values('timestamp')
-            team_names = match_df['team_name'].unique()
-            for team in team_names:
-                team_df = match_df[match_df['team_name'] == team]
-                evs = list(team_df['event_type'])
-                for i in range(len(evs) - maxlen):
-                    seq = evs[i:i+maxlen]
-                    label = 1 if (i+maxlen < len(evs) and evs[i+maxlen] == 'try') else 0
-                    sequences.append(seq)
-                    labels.append(label)
-        # Encode
-        X = [encode_event_seq(seq) for seq in sequences]
-        # Pad (shouldn't need, all maxlen)
-        X = np.array(X)
-        y = np.array(labels)
-
-        if len(X) > 0:
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            clf = RandomForestClassifier(n_estimators=100, random_state=42)
-            clf.fit(X_train, y_train)
-            y_pred = clf.predict(X_test)
-            joblib.dump(clf, 'try_pattern_model.pkl')
-            print("\nClassic ML (RandomForest):")
-            print("Accuracy:", accuracy_score(y_test, y_pred))
-            print(classification_report(y_test, y_pred))
-        else:
-            print("Not enough data for classic ML.")
-
-        # 5. DEEP LEARNING: LSTM Sequence Model
-        if len(X) > 0:
-            vocab_size = len(EVENT_TYPE2IDX) + 2
-            X_pad = pad_sequences(X, maxlen=maxlen)
-            y_cat = to_categorical(y, 2)
-
-            model = Sequential()
-            model.add(Embedding(input_dim=vocab_size, output_dim=32, mask_zero=True, input_length=maxlen))
-            model.add(LSTM(32, return_sequences=False))
-            model.add(Dense(16, activation='relu'))
-            model.add(Dense(2, activation='softmax'))
-            model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-            print("\nTraining LSTM deep learning model...")
-            model.fit(X_pad, y_cat, batch_size=64, epochs=3, validation_split=0.2, verbose=2)
-            scores = model.evaluate(X_pad, y_cat, verbose=0)
-            print(f"LSTM model accuracy on all data: {scores[1]*100:.2f}%")
-            model.save('try_lstm_model.h5')
-            print("Saved LSTM deep learning model as try_lstm_model.h5")
-        else:
-            print("Not enough data for deep learning.")
-
-        print("\nDone! You now have:")
-        print("- Descriptive stats")
-        print("- Pattern mining of events before tries")
-        print("- Classic ML classifier for try-prediction")
-        print("- LSTM deep learning model for sequence-based try prediction")
-        print("- Try location heatmap PNG")
+        pipeline = Pipeline(STAGES, options['cache_dir'], workers=options['workers'], force=force)
+        try:
+            pipeline.run(targets, params)
+        except KeyError as e:
+            raise CommandError(str(e))
+        finally:
+            print(pipeline.timing_report())
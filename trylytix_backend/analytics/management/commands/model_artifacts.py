@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import artifacts
+
+
+class Command(BaseCommand):
+    help = "List, verify, pin or roll back versions of the stored model artifacts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['list', 'show', 'verify', 'pin', 'rollback'])
+        parser.add_argument('group', nargs='?', help=f"Artifact group ({', '.join(artifacts.LEGACY_FILES)})")
+        parser.add_argument('version', nargs='?', help='Version id (pin/show/verify)')
+
+    def handle(self, *args, **options):
+        action, group, version = options['action'], options['group'], options['version']
+        groups = [group] if group else list(artifacts.LEGACY_FILES)
+
+        try:
+            if action == 'list':
+                for g in groups:
+                    current = artifacts.current_version(g)
+                    self.stdout.write(f"{g}: current={current or 'legacy files'}")
+                    for v in artifacts.list_versions(g):
+                        doc = artifacts.manifest(g, v)
+                        marker = '*' if v == current else ' '
+                        self.stdout.write(f"  {marker} {v}  metrics={doc.get('metrics', {})}")
+            elif action == 'show':
+                self.stdout.write(str(artifacts.manifest(self._require(group), version)))
+            elif action == 'verify':
+                for g in groups:
+                    if artifacts.current_version(g) is None and not version:
+                        continue
+                    bad = artifacts.verify(g, version)
+                    if bad:
+                        raise CommandError(f"{g}: checksum mismatch for {', '.join(bad)}")
+                    self.stdout.write(f"{g}: OK")
+            elif action == 'pin':
+                if not version:
+                    raise CommandError("pin needs a version")
+                artifacts.pin(self._require(group), version)
+                self.stdout.write(f"{group} now serving {version}")
+            elif action == 'rollback':
+                version = artifacts.rollback(self._require(group))
+                self.stdout.write(f"{group} rolled back to {version}")
+        except artifacts.ArtifactError as e:
+            raise CommandError(str(e))
+
+    def _require(self, group):
+        if not group:
+            raise CommandError("This action needs an artifact group")
+        return group
@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from analytics import jobs
+
+
+def _init_process():
+    # Pool processes run handlers that may touch the ORM; give them their own connections
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run queued analytics jobs (predictions, deep analysis) in a process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=jobs.config('PROCESSES'))
+        parser.add_argument('--poll-interval', type=float, default=jobs.config('POLL_INTERVAL'))
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        worker = jobs.worker_name()
+        running = {}
+        last_stale_check = 0.0
+        last_heartbeat = time.monotonic()  # claim() stamps the first one
+
+        # Don't share the parent's DB connection with forked pool processes
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_process)
+        self.stdout.write(f"Analytics worker {worker} running with {processes} processes")
+        try:
+            while True:
+                if time.monotonic() - last_stale_check > 60:
+                    requeued, failed = jobs.requeue_stale()
+                    if requeued or failed:
+                        self.stdout.write(f"Requeued {requeued} stale jobs, failed {failed}")
+                    last_stale_check = time.monotonic()
+
+                # Long jobs (a big season simulation) outlive STALE_AFTER_SECONDS; they aren't stale while we're up
+                if running and time.monotonic() - last_heartbeat > jobs.config('HEARTBEAT_SECONDS'):
+                    jobs.heartbeat([job.pk for job in running.values()])
+                    last_heartbeat = time.monotonic()
+
+                free = processes - len(running)
+                claimed = jobs.claim(free, worker) if free else []
+                for job in claimed:
+                    running[pool.submit(jobs.run_handler, job.kind, job.params)] = job
+                    self.stdout.write(f"Started {job}")
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job = running.pop(future)
+                    try:
+                        result, error = future.result()
+                    except BrokenProcessPool as e:
+                        # A pool process died (e.g. out of memory); every job it shared the pool with fails too
+                        result, error, broken = None, f"Worker process died: {e}", True
+                    jobs.finish(job.pk, result, error)
+                    self.stdout.write(f"Finished {job.kind} #{job.pk}: {'failed: ' + error if error else 'ok'}")
+                if broken:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_process)
+        except KeyboardInterrupt:
+            self.stdout.write("Shutting down")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            released = jobs.release([job.pk for job in running.values()])
+            if released:
+                self.stdout.write(f"Returned {released} unfinished jobs to the queue")
@@ -0,0 +1,99 @@
+import datetime
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from analytics.synthetic import event_type_distribution, match_event_columns
+from events import spatial
+from events.models import Event
+from matches.models import Match
+from projects.models import Project
+from teams.models import Player, Team
+
+POSITIONS = ['Prop', 'Hooker', 'Prop', 'Lock', 'Lock', 'Flanker', 'Flanker', 'Number 8',
+             'Scrum-half', 'Fly-half', 'Wing', 'Centre', 'Centre', 'Wing', 'Fullback']
+VENUES = ['Eden Park', 'Sky Stadium', 'Orangetheory Stadium', 'GIO Stadium', 'Suncorp Stadium', 'Allianz Stadium']
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic projects, teams, players, matches and events for benchmarking"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=1)
+        parser.add_argument('--teams', type=int, default=8, help='Teams per project')
+        parser.add_argument('--players', type=int, default=23, help='Players per team')
+        parser.add_argument('--matches', type=int, default=50, help='Matches per project')
+        parser.add_argument('--events-per-match', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        event_types = [t for t, _ in Event.EVENT_TYPES]
+        probabilities = event_type_distribution(event_types)
+        batch_size = options['batch_size']
+        start = time.perf_counter()
+        total_events = 0
+
+        for p in range(options['projects']):
+            with transaction.atomic():
+                project = Project.objects.create(name=f"Synthetic League {p + 1}",
+                                                 description='Generated by seed_synthetic_data')
+                teams = Team.objects.bulk_create([
+                    Team(name=f"Synthetic {p + 1}-{t + 1}", project=project, coach_name=f"Coach {t + 1}", main_team=t == 0)
+                    for t in range(options['teams'])
+                ])
+                Player.objects.bulk_create([
+                    Player(team=team, full_name=f"{team.name} Player {j + 1}", position=POSITIONS[j % len(POSITIONS)],
+                           jersey_number=j + 1, age=int(rng.integers(19, 36)))
+                    for team in teams for j in range(options['players'])
+                ], batch_size=batch_size)
+            players = {team.id: np.array(Player.objects.filter(team=team).values_list('id', flat=True)) for team in teams}
+
+            first_date = datetime.date(2025, 2, 14)
+            buffer = []
+            for m in range(options['matches']):
+                home, away = rng.choice(len(teams), size=2, replace=False)
+                home, away = teams[home], teams[away]
+                date = first_date + datetime.timedelta(days=7 * (m // max(1, len(teams) // 2)))
+                match = Match.objects.create(project=project, home_team=home, away_team=away, date=date,
+                                             venue=VENUES[m % len(VENUES)])
+                kickoff = timezone.make_aware(datetime.datetime.combine(date, datetime.time(15, 0)))
+
+                cols = match_event_columns(rng, options['events_per_match'], event_types, probabilities)
+                cells, zones = spatial.locate(cols['x'], cols['y'])
+                sides = (home, away)
+                for i in range(options['events_per_match']):
+                    team = sides[cols['side'][i]]
+                    squad = players[team.id]
+                    buffer.append(Event(
+                        match_id=match.id,
+                        match_date=date,
+                        team_id=team.id,
+                        player_id=int(squad[rng.integers(len(squad))]) if len(squad) else None,
+                        event_type=cols['event_type'][i],
+                        is_opponent_event=bool(cols['side'][i]),
+                        timestamp=kickoff + datetime.timedelta(seconds=float(cols['seconds'][i])),
+                        x_coord=float(cols['x'][i]),
+                        y_coord=float(cols['y'][i]),
+                        location_zone=cols['zone'][i],
+                        grid_cell=int(cells[i]),
+                        zone=int(zones[i]),
+                        phase=int(cols['phase'][i]),
+                    ))
+                if len(buffer) >= batch_size:
+                    Event.objects.bulk_create(buffer, batch_size=batch_size)
+                    total_events += len(buffer)
+                    buffer = []
+                    self.stdout.write(f"  {total_events} events ({total_events / (time.perf_counter() - start):.0f}/s)")
+            if buffer:
+                Event.objects.bulk_create(buffer, batch_size=batch_size)
+                total_events += len(buffer)
+            self.stdout.write(f"Project {project.id}: {len(teams)} teams, {options['matches']} matches")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {total_events} events in {elapsed:.1f}s ({total_events / max(elapsed, 1e-9):.0f} rows/s)"))
@@ -0,0 +1,43 @@
+import datetime
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import season_simulator
+
+
+class Command(BaseCommand):
+    help = "Simulate the rest of a project's season and print each team's ladder and playoff probabilities"
+
+    def add_arguments(self, parser):
+        parser.add_argument('project', type=int)
+        parser.add_argument('--season', type=int, help='Only fixtures of this season')
+        parser.add_argument('--as-of', type=datetime.date.fromisoformat,
+                            help='Treat matches after this date (YYYY-MM-DD) as still to play')
+        parser.add_argument('--simulations', type=int, default=season_simulator.DEFAULT_SIMULATIONS)
+        parser.add_argument('--score-sd', type=float, default=season_simulator.DEFAULT_SCORE_SD,
+                            help='Standard deviation of the sampled scores around the predicted ones')
+        parser.add_argument('--playoff-spots', type=int, default=season_simulator.DEFAULT_PLAYOFF_SPOTS)
+        parser.add_argument('--seed', type=int, help='Seed for reproducible runs')
+        parser.add_argument('--processes', type=int, default=None, help='Processes (default: one per core)')
+        parser.add_argument('--output', help='Write the JSON result here')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = season_simulator.simulate_season(
+            options['project'], simulations=options['simulations'], season=options['season'],
+            as_of=options['as_of'], score_sd=options['score_sd'], playoff_spots=options['playoff_spots'],
+            seed=options['seed'], processes=options['processes'],
+        )
+        if 'error' in result:
+            raise CommandError(result['error'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{result['simulations']} simulations of {len(result['fixtures'])} fixtures "
+                          f"({result['played']} played) in {elapsed:.2f}s")
+        for row in result['ladder']:
+            self.stdout.write(f"  {row['name'][:24]:<24} pts {row['points']:>5.0f}  exp {row['expected_points']:>6.1f}  "
+                              f"pos {row['mean_position']:>5.2f}  playoffs {row['playoff_probability']:>6.1%}")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
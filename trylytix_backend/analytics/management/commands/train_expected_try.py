@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import artifacts, expected_try, possessions
+from analytics.models import Possession
+from events import spatial
+from matches.models import Match
+
+
+class Command(BaseCommand):
+    help = "Train the expected-try pitch grid from stored possessions and store it as an expected_try artifact version"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only matches of this project')
+        parser.add_argument('--season', type=int, help='Only matches of this season')
+        parser.add_argument('--prior', type=float, default=expected_try.DEFAULT_PRIOR,
+                            help="Possessions' worth of the average try rate each cell starts from")
+        parser.add_argument('--build-possessions', action='store_true',
+                            help='Bring the possessions of the matches up to date first')
+
+    def handle(self, *args, **options):
+        matches = Match.objects.order_by('id')
+        if options['project']:
+            matches = matches.filter(project_id=options['project'])
+        if options['season']:
+            matches = matches.filter(date__year=options['season'])
+        match_ids = list(matches.values_list('id', flat=True))
+        if options['build_possessions']:
+            possessions.update_matches(match_ids, log=self.stdout.write)
+        match_ids = list(Possession.objects.filter(match_id__in=match_ids).order_by('match_id')
+                         .values_list('match_id', flat=True).distinct())
+        if not match_ids:
+            raise CommandError("No possessions to train on; run build_possessions (or pass --build-possessions)")
+
+        start = time.perf_counter()
+        grid, counts = expected_try.train(match_ids, prior=options['prior'])
+        version = artifacts.save_version(
+            expected_try.ARTIFACT_GROUP,
+            objects={'grid': grid},
+            metadata={
+                'feature_schema': {'x_cells': spatial.X_CELLS, 'y_cells': spatial.Y_CELLS,
+                                   'scored_event_types': expected_try.SCORED},
+                'data_range': {'matches': len(match_ids), 'first_match_id': match_ids[0],
+                               'last_match_id': match_ids[-1], 'project': options['project'],
+                               'season': options['season']},
+                'metrics': counts,
+            },
+        )
+        self.stdout.write(
+            f"expected_try {version}: {counts['possessions']} possessions, {counts['tries']} tries, "
+            f"{counts['cells_visited']} cells visited ({time.perf_counter() - start:.2f}s)")
@@ -0,0 +1,493 @@
+"""
+Match- and team-level analytics served by ``analytics/views.py``, with caching.
+
+Each ``*_data`` function computes a JSON-ready payload; team trend and tactical
+suggestions are derived from per-match rollups. ``cached`` stores payloads
+under keys that embed a per-match or per-team version number. Changing a match's
+events bumps the versions (``invalidate_match``), so stale entries are never read and
+simply expire. ``precompute_match`` warms every payload for a match and its two teams;
+``upload_csv`` queues it as a background job. The project team comparison is
+cached under the latest version of the project's teams. Tactical suggestions come from
+the project's rules (``analytics.tactical_rules``), evaluated over the cached rollups.
+"""
+import hashlib
+import time
+from collections import Counter
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from analytics import tactical_rules
+from analytics.db_routing import fresh_since
+from events import spatial
+from events.models import Event
+from matches.models import Match
+from teams.models import Team
+
+HEATMAP_BINS = 10
+PATTERN_LENGTH = 3
+# Per-match counts used by the team trend and tactical suggestions
+ROLLUP_EVENTS = {
+    'tackles': 'tackle',
+    'missed_tackles': 'missed_tackle',
+    'tries': 'try',
+    'passes': 'pass',
+    'carries': 'carry',
+    'penalties': 'penalty',
+}
+# Event counts behind the project team comparison
+COMPARISON_EVENTS = {
+    'tackles': 'tackle',
+    'missed_tackles': 'missed_tackle',
+    'passes': 'pass',
+    'carries': 'carry',
+    'penalties': 'penalty',
+    'tries': 'try',
+    'lineouts_won': 'lineout_win',
+    'lineouts_lost': 'lineout_loss',
+    'scrums_won': 'scrum_win',
+    'scrums_lost': 'scrum_loss',
+}
+# Compared rates: (numerator, denominator, higher is better); 'matches' is matches with events
+COMPARISON_RATES = {
+    'tackle_success': ('tackles', ('tackles', 'missed_tackles'), True),
+    'passes_per_carry': ('passes', ('carries',), True),
+    'penalties_per_match': ('penalties', ('matches',), False),
+    'tries_per_match': ('tries', ('matches',), True),
+    'lineout_win_rate': ('lineouts_won', ('lineouts_won', 'lineouts_lost'), True),
+    'scrum_win_rate': ('scrums_won', ('scrums_won', 'scrums_lost'), True),
+}
+
+
+def cache_timeout():
+    return getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 24 * 3600)
+
+
+def _fresh_version():
+    # Time based, so a version key evicted from the cache never comes back as an old number
+    return time.time_ns() // 1000
+
+
+def _version(scope, obj_id):
+    key = f"analytics:{scope}:{obj_id}:version"
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(scope, obj_id):
+    # Stays a timestamp of the last change, which replica routing compares with the replica's position
+    key = f"analytics:{scope}:{obj_id}:version"
+    cache.set(key, max(_fresh_version(), (cache.get(key) or 0) + 1), timeout=None)
+
+
+def _key(scope, obj_id, version, name, *args):
+    parts = [str(a) if a is not None else '' for a in args]
+    return ':'.join(['analytics', scope, str(obj_id), f"v{version}", name, *parts])
+
+
+def cache_key(scope, obj_id, name, *args):
+    return _key(scope, obj_id, _version(scope, obj_id), name, *args)
+
+
+def _latest_version(scope, obj_ids):
+    """Newest version among several objects, read in one round trip: changes whenever any of them does."""
+    keys = {f"analytics:{scope}:{obj_id}:version": obj_id for obj_id in obj_ids}
+    versions = cache.get_many(keys)
+    missing = [obj_id for key, obj_id in keys.items() if key not in versions]
+    return max([*versions.values(), *(_version(scope, obj_id) for obj_id in missing)], default=0)
+
+
+def cached(scope, obj_id, name, compute, *args, refresh=False, version=None):
+    if version is None:
+        version = _version(scope, obj_id)
+    key = _key(scope, obj_id, version, name, *args)
+    value = None if refresh else cache.get(key)
+    if value is None:
+        # A replica that hasn't replayed the last change would cache stale numbers under the new version
+        with fresh_since(version / 1e6):
+            value = compute()
+        if value is not None:
+            cache.set(key, value, timeout=cache_timeout())
+    return value
+
+
+async def acached(scope, obj_id, name, compute, *args, version=None):
+    """``cached`` for async views: cache hits never leave the event loop; misses compute in a thread."""
+    if version is None:
+        version = await sync_to_async(_version)(scope, obj_id)
+    key = _key(scope, obj_id, version, name, *args)
+    value = await cache.aget(key)
+    if value is None:
+        with fresh_since(version / 1e6):
+            value = await sync_to_async(compute)()
+        if value is not None:
+            await cache.aset(key, value, timeout=cache_timeout())
+    return value
+
+
+def invalidate_match(match_id, team_ids=()):
+    """Drop cached analytics for a match and the teams involved (their trends include it)."""
+    _bump('match', match_id)
+    for team_id in set(team_ids):
+        if team_id:
+            _bump('team', team_id)
+
+
+def success_rate(tackles, missed):
+    return f"{round((tackles / (tackles + missed) * 100), 1) if (tackles + missed) > 0 else 'N/A'}%"
+
+
+def match_summary_data(match_id):
+    match = Match.objects.select_related('home_team', 'away_team').filter(pk=match_id).first()
+    if match is None:
+        return None
+    events = Event.objects.for_match(match)
+
+    # Per team breakdown
+    team_stats = list(
+        events.order_by().values('team__name', 'event_type')
+        .annotate(count=Count('id'))
+    )
+
+    # Top players by involvement
+    top_players = list(
+        events.values('player__full_name')
+        .annotate(total=Count('id'))
+        .order_by('-total')[:5]
+    )
+
+    return {
+        'match_id': match_id,
+        'home_team': match.home_team.name,
+        'away_team': match.away_team.name,
+        'team_stats': team_stats,
+        'top_players': top_players,
+        'try_patterns': match_try_patterns(events),
+    }
+
+
+def match_try_patterns(events, n_events=PATTERN_LENGTH):
+    """Most common runs of ``n_events`` a team made before each of its tries in the match."""
+    rows = list(events.order_by('team_id', 'timestamp', 'id').values_list('team__name', 'event_type'))
+    patterns = Counter()
+    previous = {}
+    for team, event_type in rows:
+        history = previous.setdefault(team, [])
+        if event_type == 'try' and history:
+            patterns[(team, tuple(history[-n_events:]))] += 1
+        history.append(event_type)
+    return [
+        {'team': team, 'events': list(sequence), 'count': count}
+        for (team, sequence), count in patterns.most_common(10)
+    ]
+
+
+def match_heatmap_data(match_id, team_id=None, player_id=None, region=None):
+    filters = {}
+    if team_id:
+        filters['team_id'] = team_id
+    if player_id:
+        filters['player_id'] = player_id
+    # By match and date, so Postgres only scans the match's partition
+    match = Match.objects.filter(pk=match_id).only('date').first()
+    events = Event.objects.for_match(match).filter(**filters) if match else Event.objects.none()
+    if region:
+        events = events.in_region(region)
+
+    points = list(events.values(
+        'x_coord',
+        'y_coord',
+        'event_type',
+        'timestamp',
+        'location_zone',
+        'zone',
+        'description',
+        'player_id'
+    ))
+
+    # Event counts on a HEATMAP_BINS x HEATMAP_BINS grid over the 0-100 pitch coordinates
+    xy = np.array([(p['x_coord'], p['y_coord']) for p in points
+                   if p['x_coord'] is not None and p['y_coord'] is not None], dtype=float).reshape(-1, 2)
+    counts, _, _ = np.histogram2d(xy[:, 0], xy[:, 1], bins=HEATMAP_BINS, range=[[0, 100], [0, 100]])
+
+    return {
+        'match_id': match_id,
+        'points': points,
+        'bins': {'size': 100 / HEATMAP_BINS, 'counts': counts.astype(int).tolist()},
+    }
+
+
+def team_match_rollups(team_id, after=None):
+    """
+    One row per match the team played with its counts of ROLLUP_EVENTS, and of every event
+    type in ``event_counts`` (for the tactical rules), in a single query. ``after`` is a
+    ``(date, match_id)`` to start after, in match order.
+    """
+    matches = Match.objects.filter(Q(home_team_id=team_id) | Q(away_team_id=team_id))
+    if after is not None:
+        date, match_id = after
+        matches = matches.filter(Q(date__gt=date) | Q(date=date, id__gt=match_id))
+    matches = matches.select_related('home_team', 'away_team').order_by('date', 'id')
+    counts = {}
+    for row in (Event.objects.filter(team_id=team_id, match__in=matches).order_by()
+                .values('match_id', 'event_type').annotate(count=Count('id'))):
+        counts.setdefault(row['match_id'], {})[row['event_type']] = row['count']
+    rollups = []
+    for match in matches:
+        event_counts = counts.get(match.id, {})
+        opponent = match.away_team if match.home_team_id == team_id else match.home_team
+        rollups.append({
+            'match_id': match.id,
+            'date': match.date,
+            'opponent': opponent.name,
+            **{name: event_counts.get(event_type, 0) for name, event_type in ROLLUP_EVENTS.items()},
+            'event_counts': event_counts,
+        })
+    return rollups
+
+
+def team_rollups(team_id, refresh=False):
+    return cached('team', team_id, 'rollups', lambda: team_match_rollups(team_id), refresh=refresh)
+
+
+async def ateam_rollups(team_id):
+    return await acached('team', team_id, 'rollups', lambda: team_match_rollups(team_id))
+
+
+def team_trend_data(team_id, rollups=None):
+    trend = [{
+        "match_id": r['match_id'],
+        "date": r['date'],
+        "opponent": r['opponent'],
+        "tackles": r['tackles'],
+        "missed_tackles": r['missed_tackles'],
+        "success_rate": success_rate(r['tackles'], r['missed_tackles']),
+        "tries": r['tries'],
+        "passes": r['passes'],
+        "penalties": r['penalties'],
+    } for r in (team_rollups(team_id) if rollups is None else rollups)]
+    return {
+        "team_id": team_id,
+        "trend": trend
+    }
+
+
+def percentile_ranks(values, higher_is_better=True):
+    """0-100 rank of each value among the others (ties share the midpoint, best is 100); NaN stays NaN."""
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    ranked = values[valid] if higher_is_better else -values[valid]
+    ranks = np.full(values.shape, np.nan)
+    if ranked.size == 1:
+        ranks[valid] = 50.0
+    elif ranked.size:
+        below = (ranked[:, None] > ranked[None, :]).sum(axis=1)
+        ties = (ranked[:, None] == ranked[None, :]).sum(axis=1) - 1
+        ranks[valid] = 100 * (below + 0.5 * ties) / (ranked.size - 1)
+    return ranks
+
+
+def project_comparison_data(project_id, season=None):
+    """Rates and percentile ranks for every team of the project, from one grouped events query."""
+    teams = list(Team.objects.filter(project_id=project_id).order_by('name', 'id').values_list('id', 'name'))
+    if not teams:
+        return None
+    events = Event.objects.filter(team_id__in=[team_id for team_id, _ in teams], match__project_id=project_id)
+    if season:
+        events = events.in_season(season)
+    counts = {
+        row.pop('team_id'): row for row in
+        events.order_by().values('team_id').annotate(
+            matches=Count('match_id', distinct=True),
+            **{name: Count('id', filter=Q(event_type=event_type)) for name, event_type in COMPARISON_EVENTS.items()},
+        )
+    }
+
+    columns = ['matches', *COMPARISON_EVENTS]
+    table = np.array([[counts.get(team_id, {}).get(c, 0) for c in columns] for team_id, _ in teams], dtype=float)
+    column = {c: table[:, i] for i, c in enumerate(columns)}
+    rates, ranks = {}, {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, (numerator, denominator, higher_is_better) in COMPARISON_RATES.items():
+            total = sum(column[c] for c in denominator)
+            rates[name] = np.where(total > 0, column[numerator] / total, np.nan)
+            ranks[name] = percentile_ranks(rates[name], higher_is_better)
+
+    def clean(value, digits):
+        return None if np.isnan(value) else round(float(value), digits)
+
+    return {
+        'project_id': project_id,
+        'season': season,
+        'teams': [{
+            'team_id': team_id,
+            'name': name,
+            'matches': int(column['matches'][i]),
+            'rates': {rate: clean(values[i], 3) for rate, values in rates.items()},
+            'percentiles': {rate: clean(values[i], 1) for rate, values in ranks.items()},
+        } for i, (team_id, name) in enumerate(teams)],
+    }
+
+
+def team_suggestions_data(team_id, rollups=None, rules=None, season=None):
+    rollups = team_rollups(team_id) if rollups is None else rollups
+    if season:
+        rollups = [r for r in rollups if r['date'].year == season]
+    if rules is None:
+        project_id = Team.objects.filter(pk=team_id).values_list('project_id', flat=True).first()
+        rules = project_rules(project_id) if project_id else tactical_rules.DEFAULT_RULES
+    suggestions = [{
+        "match_id": r['match_id'],
+        "opponent": r['opponent'],
+        "date": r['date'],
+        "recommendations": recommendations
+    } for r, recommendations in zip(rollups, tactical_rules.match_suggestions(rules, rollups)) if recommendations]
+    return {
+        "team_id": team_id,
+        "tactical_suggestions": suggestions
+    }
+
+
+def project_rules(project_id, refresh=False):
+    return cached('project', project_id, 'rules', lambda: tactical_rules.project_rules_data(project_id),
+                  refresh=refresh)
+
+
+async def aproject_rules(project_id):
+    return await acached('project', project_id, 'rules', lambda: tactical_rules.project_rules_data(project_id))
+
+
+def invalidate_project_rules(project_id):
+    _bump('project', project_id)
+
+
+def project_tactical_report_data(project_id, season=None, rules=None):
+    """How often each rule fired for each team of the project, from one grouped events query."""
+    teams = list(Team.objects.filter(project_id=project_id).order_by('name', 'id').values_list('id', 'name'))
+    if not teams:
+        return None
+    rules = project_rules(project_id) if rules is None else rules
+    events = Event.objects.filter(team_id__in=[team_id for team_id, _ in teams], match__project_id=project_id)
+    if season:
+        events = events.in_season(season)
+    rows = {}
+    for row in events.order_by().values('team_id', 'match_id', 'event_type').annotate(count=Count('id')):
+        rows.setdefault((row['team_id'], row['match_id']), {})[row['event_type']] = row['count']
+
+    # Every team-match of the project (or season) at once
+    keys = list(rows)
+    fired = tactical_rules.evaluate(rules, tactical_rules.count_matrix([{'event_counts': c} for c in rows.values()]))
+    team_index = {team_id: i for i, (team_id, _) in enumerate(teams)}
+    owner = np.array([team_index[team_id] for team_id, _ in keys], dtype=int)
+    matches = np.bincount(owner, minlength=len(teams))
+    hits = np.zeros((len(teams), len(rules)), dtype=int)
+    np.add.at(hits, owner, fired.astype(int))
+
+    return {
+        'project_id': project_id,
+        'season': season,
+        'rules': [{'name': rule['name'], 'message': rule['message']} for rule in rules],
+        'teams': [{
+            'team_id': team_id,
+            'name': name,
+            'matches': int(matches[i]),
+            'flagged_matches': int(fired[owner == i].any(axis=1).sum()) if len(keys) else 0,
+            'rules': {rule['name']: {
+                'matches': int(hits[i, j]),
+                'rate': round(hits[i, j] / matches[i], 3) if matches[i] else None,
+            } for j, rule in enumerate(rules)},
+        } for i, (team_id, name) in enumerate(teams)],
+    }
+
+
+def match_summary(match_id, refresh=False):
+    return cached('match', match_id, 'summary', lambda: match_summary_data(match_id), refresh=refresh)
+
+
+def match_heatmap(match_id, team_id=None, player_id=None, region=None, refresh=False):
+    return cached('match', match_id, 'heatmap', lambda: match_heatmap_data(match_id, team_id, player_id, region),
+                  team_id, player_id, region, refresh=refresh)
+
+
+async def amatch_summary(match_id):
+    return await acached('match', match_id, 'summary', lambda: match_summary_data(match_id))
+
+
+async def amatch_heatmap(match_id, team_id=None, player_id=None, region=None):
+    return await acached('match', match_id, 'heatmap', lambda: match_heatmap_data(match_id, team_id, player_id, region),
+                         team_id, player_id, region)
+
+
+def project_region_counts_data(project_id, season=None, event_type=None, region=None):
+    """Events per team and pitch zone across the project, from one grouped query on the zone index."""
+    events = Event.objects.filter(match__project_id=project_id, zone__isnull=False)
+    if season:
+        events = events.in_season(season)
+    if event_type:
+        events = events.filter(event_type=event_type)
+    if region:
+        events = events.in_region(region)
+    counts = {}
+    for row in events.order_by().values('team_id', 'zone').annotate(count=Count('id')):
+        counts.setdefault(row['team_id'], {})[spatial.ZONES[row['zone']]] = row['count']
+    return {
+        'project_id': project_id,
+        'season': season,
+        'event_type': event_type,
+        'region': region,
+        'zones': spatial.ZONES,
+        'teams': [{'team_id': team_id, 'total': sum(zones.values()), 'zones': zones}
+                  for team_id, zones in sorted(counts.items(), key=lambda item: item[0] or 0)],
+    }
+
+
+def _project_teams_version(project_id):
+    """Newest version of the project's teams, and a digest of which teams those are."""
+    team_ids = list(Team.objects.filter(project_id=project_id).order_by('id').values_list('id', flat=True))
+    # The team list goes in the key as well, as adding or removing a team bumps no version
+    teams = hashlib.sha1(','.join(map(str, team_ids)).encode()).hexdigest()[:12]
+    return _latest_version('team', team_ids), teams
+
+
+async def aproject_comparison(project_id, season=None):
+    version, teams = await sync_to_async(_project_teams_version)(project_id)
+    return await acached('project', project_id, 'comparison', lambda: project_comparison_data(project_id, season),
+                         season, teams, version=version)
+
+
+async def aproject_region_counts(project_id, season=None, event_type=None, region=None):
+    version, teams = await sync_to_async(_project_teams_version)(project_id)
+    return await acached('project', project_id, 'region_counts',
+                         lambda: project_region_counts_data(project_id, season, event_type, region),
+                         season, event_type, region, teams, version=version)
+
+
+async def aproject_tactical_report(project_id, season=None):
+    version, teams = await sync_to_async(_project_teams_version)(project_id)
+    rules = await aproject_rules(project_id)
+    # Rule changes bump the project's own version
+    rules_version = await sync_to_async(_version)('project', project_id)
+    return await acached('project', project_id, 'tactical_report',
+                         lambda: project_tactical_report_data(project_id, season, rules),
+                         season, teams, rules_version, version=version)
+
+
+def precompute_match(match_id):
+    """Compute and cache every match and team payload affected by a change to ``match_id``'s events."""
+    match = Match.objects.filter(pk=match_id).first()
+    if match is None:
+        return {'match_id': match_id, 'warmed': []}
+    team_ids = [match.home_team_id, match.away_team_id]
+    match_summary(match_id, refresh=True)
+    match_heatmap(match_id, refresh=True)
+    for team_id in team_ids:
+        match_heatmap(match_id, team_id, refresh=True)
+        # Trend and tactical suggestions are derived from the cached rollups
+        team_rollups(team_id, refresh=True)
+    return {'match_id': match_id, 'warmed': ['summary', 'heatmap'] + [f"team {t}" for t in team_ids]}
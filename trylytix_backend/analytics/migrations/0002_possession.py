@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('matches', '0001_initial'),
+        ('teams', '0004_player_rugbypy_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Possession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField(help_text='Order within the match, from 0')),
+                ('first_event_id', models.BigIntegerField()),
+                ('last_event_id', models.BigIntegerField()),
+                ('max_event_id', models.BigIntegerField(help_text='Highest event id included, for incremental updates')),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('event_count', models.PositiveSmallIntegerField()),
+                ('phases', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('start_x', models.FloatField(blank=True, help_text="0-100 toward the team's attacking try line", null=True)),
+                ('end_x', models.FloatField(blank=True, null=True)),
+                ('territory', models.FloatField(blank=True, help_text='Ground gained, end_x - start_x', null=True)),
+                ('outcome', models.CharField(choices=[('try', 'Try'), ('points', 'Kick at goal'), ('kick', 'Kicked away'), ('turnover', 'Turnover'), ('touch', 'Ball in touch'), ('penalty', 'Penalty'), ('stoppage', 'Set piece restart'), ('open', 'Still in progress')], max_length=10)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='possessions', to='matches.match')),
+                ('team', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='teams.team')),
+            ],
+            options={
+                'ordering': ['match', 'sequence'],
+                'indexes': [models.Index(fields=['team', 'outcome'], name='analytics_p_team_id_eec177_idx')],
+                'constraints': [models.UniqueConstraint(fields=('match', 'sequence'), name='possession_match_sequence')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_possession'),
+        ('projects', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacticalRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('numerator', models.JSONField(help_text='Event types counted, e.g. ["tackle"]')),
+                ('denominator', models.JSONField(blank=True, default=list, help_text='Event types to divide by; empty for a count')),
+                ('operator', models.CharField(choices=[('>', '>'), ('>=', '>='), ('<', '<'), ('<=', '<=')], max_length=2)),
+                ('threshold', models.FloatField()),
+                ('message', models.CharField(max_length=255)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tactical_rules', to='projects.project')),
+            ],
+            options={
+                'ordering': ['project', 'id'],
+            },
+        ),
+    ]
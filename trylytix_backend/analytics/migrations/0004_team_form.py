@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_tacticalrule'),
+        ('matches', '0001_initial'),
+        ('teams', '0004_player_rugbypy_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamFormState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matches', models.PositiveIntegerField(default=0)),
+                ('last_match_date', models.DateField(blank=True, null=True)),
+                ('last_match_id', models.BigIntegerField(blank=True, null=True)),
+                ('window', models.JSONField(default=dict)),
+                ('ewm', models.JSONField(default=dict)),
+                ('streaks', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('team', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='form_state', to='teams.team')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TeamFormPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('values', models.JSONField()),
+                ('rolling', models.JSONField(help_text='Mean over the last WINDOW matches')),
+                ('ewm', models.JSONField(help_text='Exponentially weighted mean, span EWM_SPAN')),
+                ('streaks', models.JSONField(help_text='Matches in a row above (positive) or below (negative) the prior form')),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='matches.match')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='form_points', to='teams.team')),
+            ],
+            options={
+                'ordering': ['team', 'date', 'match'],
+                'constraints': [models.UniqueConstraint(fields=('team', 'match'), name='form_point_team_match')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_team_form'),
+        ('matches', '0002_match_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchFeatures',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('home', models.JSONField(default=dict)),
+                ('away', models.JSONField(default=dict)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('max_event_id', models.BigIntegerField(default=0, help_text='Highest event id counted, for incremental updates')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('match', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='features', to='matches.match')),
+            ],
+        ),
+    ]
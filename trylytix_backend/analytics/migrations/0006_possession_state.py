@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_match_features'),
+        ('matches', '0002_match_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PossessionState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_event_id', models.BigIntegerField(default=0, help_text='Highest event id segmented, for incremental updates')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('match', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='possession_state', to='matches.match')),
+            ],
+        ),
+    ]
@@ -1,46 +1,74 @@
-import joblib
-import os
 import pandas as pd
 import numpy as np
+from analytics import artifacts
 
-# Model paths
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'outcome_model.pkl')
-HOME_SCORE_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'home_score_model.pkl')
-AWAY_SCORE_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'away_score_model.pkl')
-FEATURES_PATH = os.path.join(os.path.dirname(__file__), '..', 'feature_columns.pkl')
+ARTIFACT_GROUP = 'match_outcome'
 
-def predict_match_outcome(features: dict, home_team: str, away_team: str):
-    try:
-        # Load models and features
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
-        if not os.path.exists(HOME_SCORE_MODEL_PATH):
-            raise FileNotFoundError(f"Home score model file not found at {HOME_SCORE_MODEL_PATH}")
-        if not os.path.exists(AWAY_SCORE_MODEL_PATH):
-            raise FileNotFoundError(f"Away score model file not found at {AWAY_SCORE_MODEL_PATH}")
-        if not os.path.exists(FEATURES_PATH):
-            raise FileNotFoundError(f"Feature columns file not found at {FEATURES_PATH}")
+def load_outcome_models():
+    """Return (classifier, home score model, away score model, feature columns) from the current version."""
+    return (
+        artifacts.load(ARTIFACT_GROUP, 'outcome_model'),
+        artifacts.load(ARTIFACT_GROUP, 'home_score_model'),
+        artifacts.load(ARTIFACT_GROUP, 'away_score_model'),
+        artifacts.load(ARTIFACT_GROUP, 'feature_columns'),
+    )
 
-        clf = joblib.load(MODEL_PATH)
-        home_score_model = joblib.load(HOME_SCORE_MODEL_PATH)
-        away_score_model = joblib.load(AWAY_SCORE_MODEL_PATH)
-        feature_columns = joblib.load(FEATURES_PATH)
+# Stats of the match_data.csv columns (``home_<stat>``/``away_<stat>``) that tagged events
+# count directly: stat -> event types counted for it
+EVENT_FEATURES = {
+    'tries': ['try'],
+    'conversion_goals': ['conversion'],
+    'penalty_goals': ['penalty_goal'],
+    'clean_breaks': ['line_break'],
+    'kicks': ['kick', 'box_kick', 'grubber_kick'],
+    'runs': ['run', 'carry'],
+    'passes': ['pass'],
+    'offload': ['offload'],
+    'tackles': ['tackle'],
+    'missed_tackles': ['missed_tackle'],
+    'rucks_total': ['ruck'],
+    'mauls_total': ['maul'],
+    'total_lineouts': ['lineout'],
+    'lineouts_won': ['lineout_win'],
+    'scrums_total': ['scrum'],
+    'scrums_won': ['scrum_win'],
+    'penalties_conceded': ['penalty'],
+    'total_free_kicks_conceded': ['free_kick'],
+    'turnovers_conceded': ['turnover'],
+    'turnover_knock_on': ['knock_on'],
+    'yellow_card': ['yellow_card'],
+    'red_cards': ['red_card'],
+}
 
-        # Prepare input row with all features set to 0
-        input_dict = {col: 0 for col in feature_columns}
+def input_frame(rows, feature_columns):
+    """Model input for ``(features, home_team, away_team)`` rows: unknown features are dropped, missing ones 0."""
+    columns = {col: i for i, col in enumerate(feature_columns)}
+    X = np.zeros((len(rows), len(feature_columns)))
+    for r, (features, home_team, away_team) in enumerate(rows):
         for key, value in features.items():
-            if key in input_dict:
-                input_dict[key] = value
-
+            if key in columns:
+                X[r, columns[key]] = value
         # Set one-hot team columns if present
-        home_col = f'home_team_{home_team}'
-        away_col = f'away_team_{away_team}'
-        if home_col in input_dict:
-            input_dict[home_col] = 1
-        if away_col in input_dict:
-            input_dict[away_col] = 1
+        for col in (f'home_team_{home_team}', f'away_team_{away_team}'):
+            if col in columns:
+                X[r, columns[col]] = 1
+    return pd.DataFrame(X, columns=feature_columns)
 
-        input_df = pd.DataFrame([input_dict], columns=feature_columns)
+def predict_fixtures(rows):
+    """Home win probabilities and predicted home and away scores (arrays) for many fixtures in one pass."""
+    clf, home_score_model, away_score_model, feature_columns = load_outcome_models()
+    input_df = input_frame(rows, feature_columns)
+    return (
+        clf.predict_proba(input_df)[:, 1],
+        home_score_model.predict(input_df),
+        away_score_model.predict(input_df),
+    )
+
+def predict_match_outcome(features: dict, home_team: str, away_team: str):
+    try:
+        # Load models and features
+        clf, home_score_model, away_score_model, feature_columns = load_outcome_models()
+        input_df = input_frame([(features, home_team, away_team)], feature_columns)
 
         # Predict win/loss
         prediction = clf.predict(input_df)[0]
@@ -0,0 +1,211 @@
+"""
+Micro-benchmarks for the model serving paths.
+
+Each benchmark covers one prediction entry point and measures:
+
+* cold: import + artifact load + first call in a fresh interpreter, with its peak RSS
+* warm: latency of single calls once the models are cached
+* batch: rows per second when the underlying models score many rows in one call
+
+``run_cold`` runs ``python -m analytics.model_benchmarks <name>`` so every model is
+measured in a fresh process, without URL checks importing the serving modules first
+and without reusing anything loaded by an earlier benchmark.
+"""
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_MATCH_FEATURES = {
+    'home_tackles': 217, 'away_tackles': 168, 'home_missed_tackles': 9, 'away_missed_tackles': 26,
+    'home_passes': 144, 'away_passes': 172, 'home_tries': 3, 'away_tries': 2,
+    'home_penalties_conceded': 9, 'away_penalties_conceded': 7, 'home_possession': 45, 'away_possession': 55,
+}
+SAMPLE_SEQUENCE = ['kick', 'lineout', 'lineout_win', 'maul', 'offload']
+
+
+def _checked(result):
+    # The prediction functions swallow exceptions and return {'error': ...}
+    if isinstance(result, dict) and 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+
+class ModelBenchmark:
+    def __init__(self, name, module, load, call, batch):
+        self.name = name
+        self.module = module
+        self.load = load
+        self.call = call
+        self.batch = batch
+
+
+def _outcome_load():
+    from analytics.ml_model_prediction import load_outcome_models
+    return load_outcome_models()
+
+
+def _outcome_call():
+    from analytics.ml_model_prediction import predict_match_outcome
+    return _checked(predict_match_outcome(SAMPLE_MATCH_FEATURES, 'Blues', 'Brumbies'))
+
+
+def _outcome_batch(n):
+    clf, home_score_model, away_score_model, feature_columns = _outcome_load()
+    X = pd.DataFrame(np.zeros((n, len(feature_columns))), columns=feature_columns)
+    for key, value in SAMPLE_MATCH_FEATURES.items():
+        if key in X:
+            X[key] = value
+    clf.predict_proba(X)
+    home_score_model.predict(X)
+    away_score_model.predict(X)
+
+
+def _try_load():
+    from analytics import artifacts, try_patterns
+    return artifacts.load(try_patterns.ARTIFACT_GROUP, 'classifier'), try_patterns.load_lstm_model()
+
+
+def _try_call():
+    from analytics.try_patterns import predict_outcome
+    return _checked(predict_outcome(SAMPLE_SEQUENCE))
+
+
+def _try_batch(n):
+    from analytics.try_patterns import maxlen
+    from events.event_types import VOCAB_SIZE
+    clf, lstm_model = _try_load()
+    X = np.random.default_rng(0).integers(1, VOCAB_SIZE, size=(n, maxlen))
+    clf.predict_proba(X)
+    lstm_model.predict(X, batch_size=min(n, 1024))
+
+
+def _player_load():
+    from analytics import artifacts, player_analysis
+    return {name: artifacts.load(player_analysis.ARTIFACT_GROUP, name)
+            for name in ('rf_model', 'gb_model', 'archetype_model', 'scaler', 'label_encoder', 'kmeans')}
+
+
+def _player_call():
+    from analytics.player_analysis import predict_player_all_models
+    return predict_player_all_models(1)
+
+
+def _player_batch(n):
+    from analytics.player_analysis import get_player_features
+    m = _player_load()
+    X = pd.DataFrame([get_player_features(0)] * n)
+    for model in ('rf_model', 'gb_model'):
+        cols = getattr(m[model], 'feature_names_in_', X.columns)
+        m[model].predict_proba(m['scaler'].transform(X.reindex(columns=cols, fill_value=0)))
+    cols = getattr(m['archetype_model'], 'feature_names_in_', X.columns)
+    m['archetype_model'].predict(m['scaler'].transform(X.reindex(columns=cols, fill_value=0)))
+    m['kmeans'].predict(X[['defensive_impact', 'attacking_threat', 'discipline', 'playmaking']])
+
+
+BENCHMARKS = {
+    b.name: b for b in [
+        ModelBenchmark('match_outcome', 'analytics.ml_model_prediction', _outcome_load, _outcome_call, _outcome_batch),
+        ModelBenchmark('try_pattern', 'analytics.try_patterns', _try_load, _try_call, _try_batch),
+        ModelBenchmark('player_profile', 'analytics.player_analysis', _player_load, _player_call, _player_batch),
+    ]
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def cold_child(name):
+    """Run inside the fresh interpreter: time import, load and first call of one benchmark."""
+    bench = BENCHMARKS[name]
+    result = {'baseline_rss_mb': peak_rss_mb()}
+    start = time.perf_counter()
+    importlib.import_module(bench.module)
+    result['import_seconds'] = time.perf_counter() - start
+    start = time.perf_counter()
+    bench.load()
+    result['load_seconds'] = time.perf_counter() - start
+    start = time.perf_counter()
+    bench.call()
+    result['first_call_seconds'] = time.perf_counter() - start
+    result['cold_total_seconds'] = result['import_seconds'] + result['load_seconds'] + result['first_call_seconds']
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_cold(name, project_dir, timeout=600):
+    proc = subprocess.run([sys.executable, '-m', 'analytics.model_benchmarks', name],
+                          cwd=project_dir, capture_output=True, text=True, timeout=timeout)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        output = (proc.stderr or proc.stdout).strip()
+        raise RuntimeError(output.splitlines()[-1] if output else f"exit status {proc.returncode}")
+    return json.loads(lines[-1])
+
+
+def run_warm(name, repeats=100):
+    bench = BENCHMARKS[name]
+    bench.call()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        bench.call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {'calls': repeats, 'mean_ms': float(np.mean(latencies)),
+            'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99)}
+
+
+def run_batch(name, sizes=(1, 32, 256, 1024), rounds=3):
+    bench = BENCHMARKS[name]
+    result = {}
+    for n in sizes:
+        bench.batch(n)
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            bench.batch(n)
+            best = min(best, time.perf_counter() - start)
+        result[str(n)] = {'seconds': best, 'rows_per_second': n / best if best else None}
+    return result
+
+
+def compare(current, baseline):
+    """Relative change (current / baseline - 1) of the headline numbers per model."""
+    headline = [
+        ('cold', 'cold_total_seconds'), ('cold', 'peak_rss_mb'), ('warm', 'p50_ms'), ('warm', 'p99_ms'),
+    ]
+    deltas = {}
+    for name, result in current['models'].items():
+        before = baseline.get('models', {}).get(name)
+        if not before:
+            continue
+        changes = {}
+        for section, field in headline:
+            new, old = result.get(section, {}).get(field), before.get(section, {}).get(field)
+            if new is not None and old:
+                changes[f"{section}.{field}"] = new / old - 1
+        for size, stats in result.get('batch', {}).items():
+            if not isinstance(stats, dict):
+                continue
+            old = before.get('batch', {}).get(size, {}).get('rows_per_second')
+            if stats.get('rows_per_second') and old:
+                changes[f"batch.{size}.rows_per_second"] = stats['rows_per_second'] / old - 1
+        deltas[name] = changes
+    return deltas
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trylytix_backend.settings')
+    import django
+    django.setup()
+    print(json.dumps(cold_child(sys.argv[1])))
@@ -1,3 +1,175 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class AnalyticsJob(models.Model):
+    """An expensive analytics or prediction call, queued here and run by ``run_analytics_worker``."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50, help_text="Handler name from analytics.jobs.JOB_HANDLERS")
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUSES, default=QUEUED)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, help_text="host:pid of the worker running the job")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last time the worker running the job was seen alive")
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+
+class Possession(models.Model):
+    """One team's spell with the ball, segmented from the match's events by ``analytics.possessions``."""
+    TRY = 'try'
+    POINTS = 'points'
+    KICK = 'kick'
+    TURNOVER = 'turnover'
+    TOUCH = 'touch'
+    PENALTY = 'penalty'
+    STOPPAGE = 'stoppage'
+    OPEN = 'open'
+    OUTCOMES = [
+        (TRY, 'Try'),
+        (POINTS, 'Kick at goal'),
+        (KICK, 'Kicked away'),
+        (TURNOVER, 'Turnover'),
+        (TOUCH, 'Ball in touch'),
+        (PENALTY, 'Penalty'),
+        (STOPPAGE, 'Set piece restart'),
+        (OPEN, 'Still in progress'),
+    ]
+
+    match = models.ForeignKey('matches.Match', on_delete=models.CASCADE, related_name='possessions')
+    team = models.ForeignKey('teams.Team', on_delete=models.SET_NULL, null=True, blank=True)
+    sequence = models.PositiveIntegerField(help_text="Order within the match, from 0")
+    # Plain ids: events_event is partitioned on Postgres, so its id alone can't be a foreign key target
+    first_event_id = models.BigIntegerField()
+    last_event_id = models.BigIntegerField()
+    max_event_id = models.BigIntegerField(help_text="Highest event id included, for incremental updates")
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+    event_count = models.PositiveSmallIntegerField()
+    phases = models.PositiveSmallIntegerField(null=True, blank=True)
+    start_x = models.FloatField(null=True, blank=True, help_text="0-100 toward the team's attacking try line")
+    end_x = models.FloatField(null=True, blank=True)
+    territory = models.FloatField(null=True, blank=True, help_text="Ground gained, end_x - start_x")
+    outcome = models.CharField(max_length=10, choices=OUTCOMES)
+
+    def __str__(self):
+        return f"Possession {self.sequence} of match {self.match_id} ({self.outcome})"
+
+    class Meta:
+        ordering = ['match', 'sequence']
+        constraints = [models.UniqueConstraint(fields=['match', 'sequence'], name='possession_match_sequence')]
+        indexes = [models.Index(fields=['team', 'outcome'])]
+
+
+class PossessionState(models.Model):
+    """
+    How far ``analytics.possessions`` has read a match's events, including the ones that
+    belong to no possession (a conversion after a try, events without a team).
+    """
+    match = models.OneToOneField('matches.Match', on_delete=models.CASCADE, related_name='possession_state')
+    max_event_id = models.BigIntegerField(default=0, help_text="Highest event id segmented, for incremental updates")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Possessions of match {self.match_id} up to event {self.max_event_id}"
+
+
+class TacticalRule(models.Model):
+    """
+    A tactical suggestion triggered by a team's event counts in a match, evaluated by
+    ``analytics.tactical_rules``: ``count(numerator)`` alone, or divided by
+    ``count(denominator)`` when that is set, compared with ``threshold``.
+    """
+    OPERATORS = [('>', '>'), ('>=', '>='), ('<', '<'), ('<=', '<=')]
+
+    project = models.ForeignKey('projects.Project', on_delete=models.CASCADE, related_name='tactical_rules')
+    name = models.CharField(max_length=100)
+    numerator = models.JSONField(help_text="Event types counted, e.g. [\"tackle\"]")
+    denominator = models.JSONField(default=list, blank=True, help_text="Event types to divide by; empty for a count")
+    operator = models.CharField(max_length=2, choices=OPERATORS)
+    threshold = models.FloatField()
+    message = models.CharField(max_length=255)
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.project_id})"
+
+    class Meta:
+        ordering = ['project', 'id']
+
+
+class TeamFormState(models.Model):
+    """
+    Running form of a team over its matches so far, in match order, maintained by
+    ``analytics.form``: the last ``WINDOW`` values, exponentially weighted averages and
+    streaks of each metric. New matches are folded in without rereading older ones.
+    """
+    team = models.OneToOneField('teams.Team', on_delete=models.CASCADE, related_name='form_state')
+    matches = models.PositiveIntegerField(default=0)
+    # Position of the last match folded in
+    last_match_date = models.DateField(null=True, blank=True)
+    last_match_id = models.BigIntegerField(null=True, blank=True)
+    window = models.JSONField(default=dict)
+    ewm = models.JSONField(default=dict)
+    streaks = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Form of team {self.team_id} after {self.matches} matches"
+
+
+class TeamFormPoint(models.Model):
+    """A team's metrics in one match and its form after it; appended by ``analytics.form``."""
+    team = models.ForeignKey('teams.Team', on_delete=models.CASCADE, related_name='form_points')
+    match = models.ForeignKey('matches.Match', on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    values = models.JSONField()
+    rolling = models.JSONField(help_text="Mean over the last WINDOW matches")
+    ewm = models.JSONField(help_text="Exponentially weighted mean, span EWM_SPAN")
+    streaks = models.JSONField(help_text="Matches in a row above (positive) or below (negative) the prior form")
+
+    def __str__(self):
+        return f"Form of team {self.team_id} in match {self.match_id}"
+
+    class Meta:
+        ordering = ['team', 'date', 'match']
+        constraints = [models.UniqueConstraint(fields=['team', 'match'], name='form_point_team_match')]
+
+
+class MatchFeatures(models.Model):
+    """
+    Per-match model inputs derived from the match's events by ``analytics.feature_store``:
+    each side's counts of the ``ml_model_prediction.EVENT_FEATURES`` stats, as in the
+    ``home_*``/``away_*`` columns of the outcome models. New events are added on top.
+    """
+    match = models.OneToOneField('matches.Match', on_delete=models.CASCADE, related_name='features')
+    home = models.JSONField(default=dict)
+    away = models.JSONField(default=dict)
+    event_count = models.PositiveIntegerField(default=0)
+    max_event_id = models.BigIntegerField(default=0, help_text="Highest event id counted, for incremental updates")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Features of match {self.match_id}"
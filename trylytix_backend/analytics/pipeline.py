@@ -0,0 +1,111 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import joblib
+
+from analytics.training import fingerprint
+
+
+class Stage:
+    """
+    One named step of a pipeline.
+
+    ``func(ctx)`` receives ``ctx['params']`` (the run options), ``ctx['inputs']`` (the
+    outputs of ``deps`` by name) and ``ctx['key']`` (this stage's cache key) and returns
+    a picklable output. ``options`` lists the params that change this stage's result.
+    Stages with ``cache=False`` run every time, for those whose effects outside the
+    cache (files they write) must happen on every run.
+    """
+
+    def __init__(self, name, func, deps=(), options=(), cache=True, description=''):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.options = tuple(options)
+        self.cache = cache
+        self.description = description
+
+
+class Pipeline:
+    """
+    Runs stages in dependency order, independent ones concurrently in a thread pool.
+
+    Each stage's output is persisted under ``cache_dir`` keyed by its fingerprint
+    (its options and the keys of its dependencies), so re-running
+    after a failure or with unchanged inputs loads finished stages instead of
+    recomputing them.
+    """
+
+    def __init__(self, stages, cache_dir, workers=4, force=(), log=print):
+        self.stages = {s.name: s for s in stages}
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.force = set(force)
+        self.log = log
+        self.timings = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def closure(self, targets):
+        """The target stages plus everything they depend on, in definition order."""
+        needed, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in self.stages:
+                raise KeyError(f"Unknown stage {name!r}; choose from {', '.join(self.stages)}")
+            if name not in needed:
+                needed.add(name)
+                todo.extend(self.stages[name].deps)
+        return [name for name in self.stages if name in needed]
+
+    def keys(self, names, params):
+        keys = {}
+        for name in names:
+            stage = self.stages[name]
+            keys[name] = fingerprint(name, {o: params.get(o) for o in stage.options}, [keys[d] for d in stage.deps])
+        return keys
+
+    def _path(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}-{key}.joblib")
+
+    def _execute(self, stage, key, inputs, params):
+        path = self._path(stage.name, key)
+        start = time.perf_counter()
+        if stage.cache and stage.name not in self.force and os.path.exists(path):
+            output, status = joblib.load(path), 'cached'
+        else:
+            output = stage.func({'params': params, 'inputs': inputs, 'key': key, 'cache_dir': self.cache_dir})
+            if stage.cache:
+                joblib.dump(output, path + '.tmp')
+                os.replace(path + '.tmp', path)
+            status = 'ran'
+        return output, status, time.perf_counter() - start
+
+    def run(self, targets, params):
+        names = self.closure(targets)
+        keys = self.keys(names, params)
+        outputs, pending, running = {}, list(names), {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                for name in [n for n in pending if all(d in outputs for d in self.stages[n].deps)]:
+                    pending.remove(name)
+                    stage = self.stages[name]
+                    inputs = {d: outputs[d] for d in stage.deps}
+                    running[pool.submit(self._execute, stage, keys[name], inputs, params)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    # Re-raises a stage failure; finished stages are already persisted for the next run
+                    outputs[name], status, seconds = future.result()
+                    self.timings[name] = (status, seconds)
+                    self.log(f"[{name}] {status} in {seconds:.2f}s")
+        return outputs
+
+    def timing_report(self):
+        lines = ["\nStage timings:"]
+        for name in self.stages:
+            if name in self.timings:
+                status, seconds = self.timings[name]
+                lines.append(f"  {name:<12} {status:<7} {seconds:8.2f}s")
+        return "\n".join(lines)
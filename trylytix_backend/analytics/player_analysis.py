@@ -1,16 +1,7 @@
-import os
-import joblib
 import pandas as pd
+from analytics import artifacts
 
-# --- Load all saved models and encoders ---
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-rf_model = joblib.load(os.path.join(BASE_DIR, '..', 'rugby_rf_model.pkl'))
-gb_model = joblib.load(os.path.join(BASE_DIR, '..','rugby_gb_model.pkl'))
-archetype_model = joblib.load(os.path.join(BASE_DIR, '..', 'rugby_archetype_rf_model.pkl'))
-scaler = joblib.load(os.path.join(BASE_DIR, '..', 'rugby_scaler.pkl'))
-label_encoder = joblib.load(os.path.join(BASE_DIR, '..', 'rugby_label_encoder.pkl'))
-kmeans = joblib.load(os.path.join(BASE_DIR, '..', 'rugby_kmeans_archetypes.pkl'))
+ARTIFACT_GROUP = 'player_profile'
 
 # --- Assume you have a function to get player features as a dict ---
 def get_player_features(player_id):
@@ -30,6 +21,14 @@ def get_player_features(player_id):
     }
 
 def predict_player_all_models(player_id):
+    # --- Load all saved models and encoders (cached until a new version is pinned) ---
+    rf_model = artifacts.load(ARTIFACT_GROUP, 'rf_model')
+    gb_model = artifacts.load(ARTIFACT_GROUP, 'gb_model')
+    archetype_model = artifacts.load(ARTIFACT_GROUP, 'archetype_model')
+    scaler = artifacts.load(ARTIFACT_GROUP, 'scaler')
+    label_encoder = artifacts.load(ARTIFACT_GROUP, 'label_encoder')
+    kmeans = artifacts.load(ARTIFACT_GROUP, 'kmeans')
+
     features = get_player_features(player_id)
     X = pd.DataFrame([features])
 
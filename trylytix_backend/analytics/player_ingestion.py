@@ -0,0 +1,124 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from importlib import import_module
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, '..', '.cache', 'player_stats')
+DEFAULT_TTL = 7 * 24 * 3600  # seconds before a cached player is fetched again
+DEFAULT_WORKERS = 8
+
+
+def read_player_ids_file(path):
+    """Read player ids from a text file (one per line or comma separated, '#' starts a comment)."""
+    ids = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            ids.extend(pid.strip().strip("'\"") for pid in line.split(','))
+    return [pid for pid in ids if pid]
+
+
+def read_player_ids_from_db():
+    """Return the rugbypy ids stored on teams.Player rows."""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trylytix_backend.settings')
+    django.setup()
+    from teams.models import Player
+
+    return list(
+        Player.objects.exclude(rugbypy_id='')
+        .order_by('rugbypy_id')
+        .values_list('rugbypy_id', flat=True)
+        .distinct()
+    )
+
+
+def resolve_fetch_fn(path=None):
+    """Return the fetch function, either rugbypy's or one given as 'module:function'."""
+    if not path:
+        from rugbypy.player import fetch_player_stats
+        return fetch_player_stats
+    module_name, _, attr = path.partition(':')
+    return getattr(import_module(module_name), attr or 'fetch_player_stats')
+
+
+def cache_path(cache_dir, player_id):
+    return os.path.join(cache_dir, f"{player_id}.parquet")
+
+
+def _to_frame(stats, player_id):
+    if stats is None:
+        return pd.DataFrame()
+    if isinstance(stats, pd.DataFrame):
+        return stats
+    if isinstance(stats, (pd.Series, dict)):
+        return pd.DataFrame([dict(stats)])
+    raise ValueError(f"Unknown stats type for player {player_id}: {type(stats)}")
+
+
+def _parquet_safe(df):
+    # rugbypy returns mixed object columns; store them as strings so pyarrow can write them
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+
+def is_fresh(path, ttl):
+    return os.path.exists(path) and (ttl is None or time.time() - os.path.getmtime(path) < ttl)
+
+
+def load_player_stats(player_ids, fetch_fn=None, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL,
+                      max_workers=DEFAULT_WORKERS, refresh=False, offline=False):
+    """
+    Return {player_id: raw stats DataFrame} for every player id.
+
+    Players with a cache entry younger than ``ttl`` are read from disk; the rest are
+    fetched concurrently through a thread pool and written back to the Parquet cache.
+    A failed fetch falls back to a stale cache entry when one exists.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    player_ids = list(dict.fromkeys(str(pid) for pid in player_ids))
+
+    if refresh:
+        stale = list(player_ids)
+    else:
+        stale = [pid for pid in player_ids if not is_fresh(cache_path(cache_dir, pid), ttl)]
+    if offline:
+        # Stale entries are still used; players that were never fetched are skipped below
+        stale = []
+
+    logger.info("Player stats: %d cached, %d to fetch", len(player_ids) - len(stale), len(stale))
+    failed = set()
+    if stale:
+        fetch_fn = fetch_fn or resolve_fetch_fn()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(fetch_fn, player_id=pid): pid for pid in stale}
+            for future in as_completed(futures):
+                pid = futures[future]
+                try:
+                    df = _to_frame(future.result(), pid)
+                except Exception as e:
+                    logger.warning("Fetching stats for player %s failed: %s", pid, e)
+                    failed.add(pid)
+                    continue
+                path = cache_path(cache_dir, pid)
+                _parquet_safe(df).to_parquet(path + '.tmp', index=False)
+                os.replace(path + '.tmp', path)
+
+    results = {}
+    for pid in player_ids:
+        path = cache_path(cache_dir, pid)
+        if not os.path.exists(path):
+            if pid not in failed:
+                logger.warning("No stats available for player %s", pid)
+            continue
+        results[pid] = pd.read_parquet(path)
+    return results
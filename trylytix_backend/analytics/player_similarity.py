@@ -0,0 +1,91 @@
+"""
+"Who plays like this player": nearest neighbours over the player profile features.
+
+``train_player_profile_model.py`` stores a ``similarity_index`` with each
+``player_profile`` version: the scaled ``ALL_FIELDS`` + composite feature vectors, the
+same rows normalised to unit length, and the rugbypy ids sorted for lookup. Cosine
+similarity to every player is then one matrix-vector product over the (memory-mapped)
+normalised rows and the top k an ``argpartition``, a few milliseconds even for tens of
+thousands of players, so no approximate index is needed.
+"""
+import numpy as np
+
+from analytics import artifacts
+from analytics.player_analysis import ARTIFACT_GROUP
+
+DEFAULT_K = 10
+MAX_K = 100
+
+
+def build_index(features, player_ids):
+    """The similarity index for scaled feature rows and the rugbypy ids they belong to."""
+    features = np.asarray(features, dtype=np.float32)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    ids = np.array([str(p) for p in player_ids])
+    order = np.argsort(ids, kind='stable')
+    return {
+        'features': features,
+        'vectors': features / np.where(norms == 0, 1, norms),
+        'player_ids': ids,
+        'order': order,
+        'sorted_ids': ids[order],
+    }
+
+
+def load_index():
+    return artifacts.load(ARTIFACT_GROUP, 'similarity_index')
+
+
+def row_of(index, player_id):
+    """Row of a rugbypy id in the index, or None."""
+    player_id = str(player_id)
+    i = np.searchsorted(index['sorted_ids'], player_id)
+    if i < len(index['sorted_ids']) and index['sorted_ids'][i] == player_id:
+        return int(index['order'][i])
+    return None
+
+
+def most_similar(index, row, k=DEFAULT_K):
+    """(rows, cosine similarities) of the ``k`` players closest to ``row``, best first, itself excluded."""
+    scores = index['vectors'] @ index['vectors'][row]
+    scores[row] = -np.inf
+    k = min(k, len(scores) - 1)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return top, scores[top]
+
+
+def similar_players(player_id, k=DEFAULT_K):
+    """Top-k similar players to a rugbypy id; None when the player isn't in the current index."""
+    index = load_index()
+    row = row_of(index, player_id)
+    if row is None:
+        return None
+    rows, scores = most_similar(index, row, k)
+    return {
+        'rugbypy_id': str(player_id),
+        'model_version': artifacts.current_version(ARTIFACT_GROUP),
+        'similar': [{'rugbypy_id': str(index['player_ids'][r]), 'similarity': round(float(s), 4)}
+                    for r, s in zip(rows.tolist(), scores.tolist())],
+    }
+
+
+def compare_players(player_id, other_id):
+    """Cosine similarity and the scaled feature values of two rugbypy ids side by side; None if either is missing."""
+    index = load_index()
+    rows = [row_of(index, player_id), row_of(index, other_id)]
+    if None in rows:
+        return None
+    doc = artifacts.manifest(ARTIFACT_GROUP) or {}
+    names = doc.get('feature_schema') or [f'feature_{i}' for i in range(index['features'].shape[1])]
+    a, b = (index['features'][r] for r in rows)
+    return {
+        'rugbypy_ids': [str(player_id), str(other_id)],
+        'model_version': artifacts.current_version(ARTIFACT_GROUP),
+        'similarity': round(float(index['vectors'][rows[0]] @ index['vectors'][rows[1]]), 4),
+        'features': [{'feature': name, 'values': [round(float(x), 4), round(float(y), 4)],
+                      'difference': round(float(x - y), 4)}
+                     for name, x, y in zip(names, a.tolist(), b.tolist())],
+    }
@@ -0,0 +1,189 @@
+"""
+Possession reconstruction.
+
+``segment`` splits a match's events, in time order, into possessions in one pass:
+a possession belongs to the team with the ball (defensive events such as tackles are
+made by the other side) and ends at a score, kick, turnover, ball in touch, penalty,
+set-piece restart or when the other team is next seen with the ball. ``update_match``
+stores them as ``Possession`` rows and, when events are added later, only re-segments
+from the last possessions the new events can affect. ``PossessionState`` records the
+highest event id read, so events that start no possession (a trailing conversion)
+don't count as new on every update.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+
+from analytics.models import Possession, PossessionState
+from events import event_types
+from events.models import Event, event_type_codes
+from matches.models import Match
+
+# Event types that end the possession they're part of, and how
+ENDS = {
+    'try': Possession.TRY,
+    'penalty_goal': Possession.POINTS,
+    'drop_goal': Possession.POINTS,
+    'penalty_missed': Possession.KICK,
+    'kick': Possession.KICK,
+    'box_kick': Possession.KICK,
+    'grubber_kick': Possession.KICK,
+    'turnover': Possession.TURNOVER,
+    'interception': Possession.TURNOVER,
+    'knock_on': Possession.TURNOVER,
+    'forward_pass': Possession.TURNOVER,
+    'in_touch': Possession.TOUCH,
+    'penalty': Possession.PENALTY,
+}
+# Restarts and set pieces start a new possession
+STARTS = {'kickoff', 'restart', 'restart_22', 'lineout', 'scrum'}
+# Say nothing about who has the ball
+NEUTRAL = {'conversion', 'conversion_missed', 'substitution', 'injury', 'timeout', 'referee_call', 'advantage',
+           'yellow_card', 'red_card', 'sin_bin', 'foul_play'}
+
+_ENDS = {event_types.code(name): outcome for name, outcome in ENDS.items()}
+_STARTS = {event_types.code(name) for name in STARTS}
+_NEUTRAL = {event_types.code(name) for name in NEUTRAL}
+_DEFENSIVE = {event_types.code(name) for name in event_types.DEFENSIVE}
+
+EVENT_FIELDS = ('id', 'team_id', 'timestamp', 'phase', 'x_coord')
+
+
+def match_events(match_id):
+    """The match's events in time order, as tuples of ``EVENT_FIELDS`` plus the event type code."""
+    return (
+        Event.objects.filter(match_id=match_id)
+        .order_by(F('timestamp').asc(nulls_last=True), 'id')
+        .values_list(*EVENT_FIELDS, event_type_codes())
+    )
+
+
+def segment(events, home_team_id, away_team_id, flip_team_id=None):
+    """
+    Possessions (dicts of ``Possession`` fields) in ``events``, which must be in time order;
+    ``flip_team_id``'s coordinates face the other way (see ``Match.coordinates``).
+    """
+    other = {home_team_id: away_team_id, away_team_id: home_team_id}
+    possessions = []
+    current = None
+
+    def close(outcome):
+        current['outcome'] = outcome
+        if current['start_x'] is not None:
+            current['territory'] = round(current['end_x'] - current['start_x'], 1)
+        possessions.append(current)
+
+    for event_id, team_id, timestamp, phase, x, code in events:
+        if code in _NEUTRAL or team_id is None:
+            attacking = None
+        elif code in _DEFENSIVE:
+            attacking = other.get(team_id)
+        else:
+            attacking = team_id
+
+        if current is not None and (code in _STARTS or (attacking is not None and attacking != current['team_id'])):
+            close(Possession.STOPPAGE if code in _STARTS else Possession.TURNOVER)
+            current = None
+        if current is None:
+            if attacking is None:
+                continue  # e.g. a conversion between possessions
+            current = {
+                'team_id': attacking, 'first_event_id': event_id, 'max_event_id': event_id, 'start_time': timestamp,
+                'event_count': 0, 'phases': None, 'start_x': None, 'end_x': None, 'territory': None,
+            }
+
+        current['last_event_id'] = event_id
+        current['max_event_id'] = max(current['max_event_id'], event_id)
+        current['end_time'] = timestamp
+        current['event_count'] += 1
+        if phase is not None:
+            current['phases'] = max(current['phases'] or 0, phase)
+        if x is not None and team_id is not None and team_id == flip_team_id:
+            x = 100 - x
+        if x is not None and attacking is not None:
+            # Coordinates run toward the acting side's try line; defenders see the pitch the other way round
+            x = x if team_id == attacking else 100 - x
+            if current['start_x'] is None:
+                current['start_x'] = x
+            current['end_x'] = x
+
+        if code in _ENDS:
+            close(_ENDS[code])
+            current = None
+
+    if current is not None:
+        close(Possession.OPEN)
+    return possessions
+
+
+def _rebuild_from(match_id, existing, watermark):
+    """
+    The last possession that stays as it is, given the events added after ``watermark``
+    (the highest event id read by the last update): None to rebuild them all, False if
+    there are no new events.
+    """
+    if watermark is None:
+        return None
+    new = Event.objects.filter(match_id=match_id, id__gt=watermark).aggregate(
+        n=Count('id'), earliest=Min('timestamp'), undated=Count('id', filter=Q(timestamp__isnull=True)))
+    if not new['n']:
+        return False
+    if new['undated'] or not existing.exists():
+        return None
+    # New events can extend or split any possession that ends after the first of them, and the one
+    # before that may have been closed only because the next team was seen with the ball
+    affected = existing.filter(
+        Q(end_time__gte=new['earliest']) | Q(end_time__isnull=True) | Q(outcome=Possession.OPEN)
+    ).aggregate(first=Min('sequence'))['first']
+    if affected is None:
+        affected = existing.aggregate(last=Max('sequence'))['last'] + 1
+    return existing.filter(sequence__lt=affected - 1, end_time__isnull=False).order_by('-sequence').first()
+
+
+def update_match(match_id, rebuild=False):
+    """Bring the match's possessions up to date with its events; returns the number of possessions written."""
+    with transaction.atomic():
+        # Serializes concurrent updates of the same match
+        match = Match.objects.select_for_update().filter(pk=match_id).first()
+        if match is None:
+            return 0
+        existing = Possession.objects.filter(match_id=match_id)
+        state = PossessionState.objects.filter(match_id=match_id).first()
+        watermark = state.max_event_id if state is not None else None
+        kept = None if rebuild else _rebuild_from(match_id, existing, watermark)
+        if kept is False:
+            return 0
+
+        events = match_events(match_id)
+        if kept is None:
+            existing.delete()
+            first_sequence = 0
+        else:
+            existing.filter(sequence__gt=kept.sequence).delete()
+            events = events.filter(Q(timestamp__gt=kept.end_time) | Q(timestamp=kept.end_time, id__gt=kept.last_event_id)
+                                   | Q(timestamp__isnull=True))
+            first_sequence = kept.sequence + 1
+
+        events = list(events)
+        possessions = segment(events, match.home_team_id, match.away_team_id,
+                              match.away_team_id if match.away_flipped() else None)
+        Possession.objects.bulk_create([
+            Possession(match_id=match_id, sequence=first_sequence + i, **p) for i, p in enumerate(possessions)
+        ])
+        # Every event read counts, including those in no possession; events before ``kept`` were read last time
+        read = max((event[0] for event in events), default=0)
+        if kept is not None:
+            read = max(read, watermark)
+        PossessionState.objects.update_or_create(match_id=match_id, defaults={'max_event_id': read})
+    return len(possessions)
+
+
+def update_matches(match_ids, rebuild=False, log=None):
+    start = time.perf_counter()
+    total = 0
+    for n, match_id in enumerate(match_ids, start=1):
+        total += update_match(match_id, rebuild=rebuild)
+        if log and n % 50 == 0:
+            log(f"  {n} matches, {total} possessions ({time.perf_counter() - start:.1f}s)")
+    return total
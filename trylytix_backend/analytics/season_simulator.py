@@ -0,0 +1,195 @@
+"""
+Monte Carlo season simulation for a project's fixtures.
+
+Played matches (those with tagged events, up to ``as_of`` if given) count with their
+scores from the events. Each remaining fixture is predicted once by the match outcome
+models (``analytics.ml_model_prediction``) from both teams' rolling averages in the
+feature store (``analytics.feature_store``), then every simulation draws its result:
+the winner from the classifier's home-win probability, the scores from normal noise
+(``score_sd``) around the regressors' scores.
+A chunk of simulations is a handful of NumPy arrays of shape (simulations, fixtures)
+and the ladder a matrix product with the fixtures' team indicators; chunks run in a
+process pool. The result is each team's distribution over ladder positions, its expected
+points and the probability of finishing in the playoff places.
+"""
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.db.models import Count
+
+from analytics import artifacts, feature_store
+from analytics.ml_model_prediction import ARTIFACT_GROUP, predict_fixtures
+from events.models import Event
+from matches.models import Match
+from teams.models import Team
+
+SCORING = {'try': 5, 'conversion': 2, 'penalty_goal': 3, 'drop_goal': 3}
+LADDER_POINTS = {'win': 4, 'draw': 2, 'losing_bonus': 1}
+LOSING_BONUS_MARGIN = 7
+DEFAULT_SIMULATIONS = 10000
+MAX_SIMULATIONS = 200000
+DEFAULT_SCORE_SD = 7.0
+DEFAULT_PLAYOFF_SPOTS = 4
+CHUNK = 2500  # simulations per task; keeps each chunk's arrays to a few MB
+
+
+def season_fixtures(project_id, season=None, as_of=None):
+    """The project's teams, played matches with their scores, and remaining fixtures, in date order."""
+    matches = Match.objects.filter(project_id=project_id)
+    if season:
+        matches = matches.filter(date__year=season)
+    matches = list(matches.order_by('date', 'id').values('id', 'date', 'home_team_id', 'away_team_id'))
+    with_events = set(Event.objects.filter(match_id__in=[m['id'] for m in matches])
+                      .order_by().values_list('match_id', flat=True).distinct())
+    played = [m for m in matches if m['id'] in with_events and (as_of is None or m['date'] <= as_of)]
+    played_ids = {m['id'] for m in played}
+    remaining = [m for m in matches if m['id'] not in played_ids and (as_of is None or m['date'] > as_of)]
+
+    points = {}
+    for row in (Event.objects.filter(match_id__in=played_ids, event_type__in=list(SCORING)).order_by()
+                .values('match_id', 'team_id', 'event_type').annotate(count=Count('id'))):
+        key = (row['match_id'], row['team_id'])
+        points[key] = points.get(key, 0) + SCORING[row['event_type']] * row['count']
+    for m in played:
+        m['home_score'] = points.get((m['id'], m['home_team_id']), 0)
+        m['away_score'] = points.get((m['id'], m['away_team_id']), 0)
+    teams = list(Team.objects.filter(project_id=project_id).order_by('id').values('id', 'name'))
+    return teams, played, remaining
+
+
+def ladder(played, team_index):
+    """Ladder points and points difference per team (arrays) from the played matches."""
+    points, diff = np.zeros(len(team_index)), np.zeros(len(team_index))
+    for m in played:
+        home, away = team_index[m['home_team_id']], team_index[m['away_team_id']]
+        home_points, away_points = result_points(np.array(m['home_score']), np.array(m['away_score']))
+        points[home] += home_points
+        points[away] += away_points
+        diff[home] += m['home_score'] - m['away_score']
+        diff[away] += m['away_score'] - m['home_score']
+    return points, diff
+
+
+def result_points(home_score, away_score):
+    """Ladder points for the home and away sides of results (arrays of scores)."""
+    margin = home_score - away_score
+    bonus = np.where(np.abs(margin) <= LOSING_BONUS_MARGIN, LADDER_POINTS['losing_bonus'], 0)
+    home = np.select([margin > 0, margin == 0], [LADDER_POINTS['win'], LADDER_POINTS['draw']], bonus)
+    away = np.select([margin < 0, margin == 0], [LADDER_POINTS['win'], LADDER_POINTS['draw']], bonus)
+    return home, away
+
+
+def simulate_chunk(inputs, simulations, seed):
+    """
+    Play the remaining fixtures ``simulations`` times; returns the count of finishes in
+    each ladder position per team (teams x positions) and the points summed over runs.
+    """
+    rng = np.random.default_rng(seed)
+    n_fixtures = len(inputs['p_home'])
+    shape = (simulations, n_fixtures)
+    home_win = rng.random(shape) < inputs['p_home']
+    home = np.maximum(np.rint(rng.normal(inputs['home_score'], inputs['score_sd'], shape)), 0)
+    away = np.maximum(np.rint(rng.normal(inputs['away_score'], inputs['score_sd'], shape)), 0)
+    # The sampled winner takes the higher score; a level draw is settled by a penalty goal
+    high, low = np.maximum(home, away), np.minimum(home, away)
+    high = np.where(high == low, high + 3, high)
+    home, away = np.where(home_win, high, low), np.where(home_win, low, high)
+
+    home_points, away_points = result_points(home, away)
+    points = inputs['points'] + home_points @ inputs['home_teams'] + away_points @ inputs['away_teams']
+    diff = inputs['diff'] + (home - away) @ inputs['home_teams'] + (away - home) @ inputs['away_teams']
+    # Points, then points difference, then a coin toss
+    key = points * 1e6 + diff + rng.random(points.shape) * 0.5
+    order = np.argsort(-key, axis=1)
+    n_teams = points.shape[1]
+    positions = np.empty_like(order)
+    np.put_along_axis(positions, order, np.arange(n_teams)[None, :].repeat(simulations, axis=0), axis=1)
+    finishes = np.bincount((np.arange(n_teams) * n_teams + positions).ravel(), minlength=n_teams * n_teams)
+    return finishes.reshape(n_teams, n_teams), points.sum(axis=0)
+
+
+def _simulate_chunk(args):
+    return simulate_chunk(*args)
+
+
+def run_simulations(inputs, simulations, seed=None, processes=1):
+    """Split the simulations into chunks, run them (in a process pool if ``processes`` > 1) and add them up."""
+    sizes = [min(CHUNK, simulations - start) for start in range(0, simulations, CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(inputs, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_simulate_chunk, tasks))
+    else:
+        results = [_simulate_chunk(task) for task in tasks]
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def check_options(simulations=DEFAULT_SIMULATIONS, score_sd=DEFAULT_SCORE_SD, playoff_spots=DEFAULT_PLAYOFF_SPOTS):
+    """Raise ValueError for options out of bounds; the view and the job both go through here."""
+    if not 1 <= simulations <= MAX_SIMULATIONS:
+        raise ValueError(f"simulations must be between 1 and {MAX_SIMULATIONS}")
+    if score_sd < 0 or playoff_spots < 1:
+        raise ValueError("score_sd must be at least 0 and playoffs at least 1")
+
+
+def simulate_season(project_id, simulations=DEFAULT_SIMULATIONS, season=None, as_of=None,
+                    score_sd=DEFAULT_SCORE_SD, playoff_spots=DEFAULT_PLAYOFF_SPOTS, seed=None, processes=1):
+    check_options(simulations, score_sd, playoff_spots)
+    teams, played, remaining = season_fixtures(project_id, season, as_of)
+    if not teams:
+        return {'error': 'Project has no teams'}
+    team_index = {team['id']: i for i, team in enumerate(teams)}
+    # Fixtures against teams from elsewhere don't count toward the ladder
+    played = [m for m in played if m['home_team_id'] in team_index and m['away_team_id'] in team_index]
+    remaining = [m for m in remaining if m['home_team_id'] in team_index and m['away_team_id'] in team_index]
+    points, diff = ladder(played, team_index)
+
+    names = {team['id']: team['name'] for team in teams}
+    feature_store.refresh([m['id'] for m in played])
+    # Form as it stood when the played matches were in; later matches' events don't count
+    before = as_of + datetime.timedelta(days=1) if as_of else datetime.date.max
+    rows = feature_store.fixture_rows(
+        [dict(m, home_team=names[m['home_team_id']], away_team=names[m['away_team_id']]) for m in remaining], before)
+    p_home, home_score, away_score = predict_fixtures(rows) if rows else (np.zeros(0),) * 3
+
+    indicator = lambda column: np.eye(len(teams))[[team_index[m[column]] for m in remaining]].reshape(-1, len(teams))
+    inputs = {
+        'p_home': np.asarray(p_home, dtype=float), 'home_score': np.asarray(home_score, dtype=float),
+        'away_score': np.asarray(away_score, dtype=float), 'score_sd': score_sd,
+        'points': points, 'diff': diff, 'home_teams': indicator('home_team_id'), 'away_teams': indicator('away_team_id'),
+    }
+    finishes, total_points = run_simulations(inputs, simulations, seed, processes)
+
+    probabilities = finishes / simulations
+    table = [{
+        'team_id': team['id'],
+        'name': team['name'],
+        'points': float(points[i]),
+        'points_difference': float(diff[i]),
+        'expected_points': round(float(total_points[i] / simulations), 2),
+        'mean_position': round(float(probabilities[i] @ np.arange(1, len(teams) + 1)), 2),
+        'positions': [round(float(p), 4) for p in probabilities[i]],
+        'playoff_probability': round(float(probabilities[i, :playoff_spots].sum()), 4),
+        'top_probability': round(float(probabilities[i, 0]), 4),
+    } for i, team in enumerate(teams)]
+    return {
+        'project_id': project_id,
+        'season': season,
+        'as_of': as_of.isoformat() if isinstance(as_of, datetime.date) else as_of,
+        'simulations': simulations,
+        'score_sd': score_sd,
+        'playoff_spots': playoff_spots,
+        'model_version': artifacts.current_version(ARTIFACT_GROUP),
+        'played': len(played),
+        'fixtures': [{
+            'match_id': m['id'], 'date': m['date'].isoformat(),
+            'home_team_id': m['home_team_id'], 'away_team_id': m['away_team_id'],
+            'home_win_probability': round(float(p), 4),
+            'predicted_scores': [round(float(h), 1), round(float(a), 1)],
+        } for m, p, h, a in zip(remaining, p_home, home_score, away_score)],
+        'ladder': sorted(table, key=lambda row: row['mean_position']),
+    }
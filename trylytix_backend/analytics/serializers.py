@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+from analytics import tactical_rules
+from analytics.models import TacticalRule
+
+
+class TacticalRuleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TacticalRule
+        fields = '__all__'
+
+    def validate(self, attrs):
+        rule = {field: attrs.get(field, getattr(self.instance, field, None)) for field in tactical_rules.RULE_FIELDS}
+        errors = tactical_rules.validate_rule(rule)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from analytics import jobs
+from analytics.match_analytics import invalidate_match, invalidate_project_rules
+from analytics.models import TacticalRule
+from events.models import Event
+from matches.models import Match
+
+
+# post_save only: a post_delete receiver on Event would stop Django from fast-deleting
+# a match's events in bulk. EventViewSet.perform_destroy invalidates single deletes, and
+# bulk inserts (upload_csv) skip signals and invalidate once themselves.
+@receiver(pre_save, sender=Event)
+def event_saving(sender, instance, raw=False, **kwargs):
+    # An edit can move the event to the other team, whose numbers and form change too
+    if instance.pk and not raw:
+        instance._previous_team_id = Event.objects.filter(pk=instance.pk).values_list('team_id', flat=True).first()
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created, **kwargs):
+    team_ids = [team_id for team_id in {instance.team_id, getattr(instance, '_previous_team_id', None)} if team_id]
+    # After commit, so a concurrent request can't re-cache the old numbers in between
+    transaction.on_commit(lambda: invalidate_match(instance.match_id, team_ids))
+    # New events extend the stored possessions; an edited one may belong anywhere in the match
+    params = {'match_id': instance.match_id} if created else {'match_id': instance.match_id, 'rebuild': True}
+    transaction.on_commit(lambda: jobs.submit_once('update_possessions', params))
+    transaction.on_commit(lambda: jobs.submit_once('update_match_features', params))
+    for team_id in team_ids:
+        form_params = {'team_id': team_id, 'match_id': instance.match_id}
+        transaction.on_commit(lambda form_params=form_params: jobs.submit_once('update_team_form', form_params))
+
+
+@receiver([post_save, post_delete], sender=Match)
+def match_changed(sender, instance, **kwargs):
+    match_id, team_ids = instance.pk, [instance.home_team_id, instance.away_team_id]
+    transaction.on_commit(lambda: invalidate_match(match_id, team_ids))
+    # A new date moves the match in its teams' form; a deleted one leaves a gap
+    for team_id in team_ids:
+        params = {'team_id': team_id, 'match_id': match_id}
+        transaction.on_commit(lambda params=params: jobs.submit_once('update_team_form', params))
+    # Its teams may have changed sides; a deleted match takes its features with it
+    if kwargs.get('created') is False:
+        params = {'match_id': match_id, 'rebuild': True}
+        transaction.on_commit(lambda: jobs.submit_once('update_match_features', params))
+
+
+@receiver([post_save, post_delete], sender=TacticalRule)
+def tactical_rule_changed(sender, instance, **kwargs):
+    project_id = instance.project_id
+    transaction.on_commit(lambda: invalidate_project_rules(project_id))
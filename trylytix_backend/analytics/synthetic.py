@@ -0,0 +1,64 @@
+import numpy as np
+
+from events.event_types import DEFENSIVE
+
+# Relative frequency of each event type in a typical match; anything not listed is rare
+EVENT_WEIGHTS = {
+    'pass': 20, 'tackle': 18, 'carry': 15, 'ruck': 12, 'run': 4, 'missed_tackle': 3.5, 'kick': 3,
+    'offload': 2, 'lineout': 2, 'lineout_win': 1.5, 'lineout_loss': 0.5, 'turnover': 1.5, 'penalty': 1.5,
+    'scrum': 1, 'scrum_win': 0.8, 'scrum_loss': 0.2, 'knock_on': 1, 'in_touch': 1, 'line_break': 1,
+    'kick_return': 1, 'box_kick': 0.8, 'maul': 0.8, 'try': 0.6, 'try_assist': 0.4, 'conversion': 0.4,
+    'conversion_missed': 0.2, 'penalty_goal': 0.3, 'penalty_missed': 0.1, 'kickoff': 0.3, 'restart_22': 0.2,
+}
+RARE_WEIGHT = 0.05
+MATCH_SECONDS = 80 * 60
+
+
+def event_type_distribution(event_types):
+    weights = np.array([EVENT_WEIGHTS.get(t, RARE_WEIGHT) for t in event_types], dtype=float)
+    return weights / weights.sum()
+
+
+def zone_for(x):
+    return np.where(x < 22, 'own 22', np.where(x < 50, 'own half', np.where(x < 78, 'opposition half', 'opposition 22')))
+
+
+def match_event_columns(rng, n_events, event_types, probabilities, mean_possession=8):
+    """
+    Column arrays for one synthetic match of ``n_events`` events.
+
+    Possession alternates between side 0 (home) and side 1 (away) in runs of roughly
+    ``mean_possession`` events. ``side`` is the side that made each event, so defensive
+    events belong to the team without the ball. x runs 0-100 toward the side's
+    attacking try line and drifts through each possession. Timestamps span 80 minutes.
+    """
+    types = np.asarray(event_types)[rng.choice(len(event_types), size=n_events, p=probabilities)]
+    starts = rng.random(n_events) < 1.0 / mean_possession
+    starts[0] = True
+    possession_id = np.cumsum(starts) - 1
+    in_possession = (possession_id + rng.integers(0, 2)) % 2
+
+    defensive = np.isin(types, list(DEFENSIVE))
+    side = np.where(defensive, 1 - in_possession, in_possession)
+
+    # Phase counter restarts with each possession
+    index = np.arange(n_events)
+    first = np.maximum.accumulate(np.where(starts, index, 0))
+    phase = index - first + 1
+
+    # Territory: each possession starts somewhere on the pitch and gains ground phase by phase
+    start_x = rng.uniform(5, 80, size=possession_id[-1] + 1)[possession_id]
+    x = np.clip(start_x + phase * rng.normal(2.5, 4, size=n_events), 0, 100)
+    x = np.where(in_possession == side, x, 100 - x)
+    y = np.clip(rng.normal(50, 22, size=n_events), 0, 100)
+
+    seconds = np.sort(rng.uniform(0, MATCH_SECONDS, size=n_events))
+    return {
+        'event_type': types,
+        'side': side,
+        'phase': phase,
+        'x': np.round(x, 1),
+        'y': np.round(y, 1),
+        'seconds': seconds,
+        'zone': zone_for(x),
+    }
@@ -0,0 +1,95 @@
+"""
+Tactical suggestions as data.
+
+A rule compares a count of event types, or a ratio of two such counts, with a threshold
+(``TacticalRule``; projects without rules of their own use ``DEFAULT_RULES``). Rules are
+evaluated for many matches at once: the matches' event counts form a matches x event
+types matrix, each rule a row of numerator and denominator weights, so every rule's
+value for every match is two matrix products. The counts come from the cached team
+rollups, so adding rules adds no queries.
+"""
+import numpy as np
+
+from analytics.models import TacticalRule
+from events import event_types
+
+OPERATORS = {'>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal}
+RULE_FIELDS = ('name', 'numerator', 'denominator', 'operator', 'threshold', 'message')
+
+DEFAULT_RULES = [
+    {'name': 'missed_tackles', 'numerator': ['missed_tackle'], 'denominator': [], 'operator': '>', 'threshold': 5,
+     'message': "Too many missed tackles — improve defensive positioning."},
+    {'name': 'tackle_success', 'numerator': ['tackle'], 'denominator': ['tackle', 'missed_tackle'],
+     'operator': '<', 'threshold': 0.6,
+     'message': "Tackle success rate below 60% — focus on contact drills."},
+    {'name': 'penalties', 'numerator': ['penalty'], 'denominator': [], 'operator': '>', 'threshold': 3,
+     'message': "High number of penalties — work on discipline in breakdown."},
+    {'name': 'pass_carry_ratio', 'numerator': ['pass'], 'denominator': ['carry'], 'operator': '<', 'threshold': 0.8,
+     'message': "Low pass-to-carry ratio — consider better ball movement."},
+]
+
+
+def validate_rule(rule):
+    """Problems with a rule's event types and operator, as a list of messages."""
+    errors = []
+    for field in ('numerator', 'denominator'):
+        types = rule.get(field) or []
+        if not isinstance(types, list):
+            errors.append(f"{field} must be a list of event types")
+            continue
+        unknown = [t for t in types if not isinstance(t, str) or t not in event_types.CODES]
+        if unknown:
+            errors.append(f"Unknown event types in {field}: {', '.join(map(str, unknown))}")
+    if not rule.get('numerator'):
+        errors.append("numerator needs at least one event type")
+    if rule.get('operator') not in OPERATORS:
+        errors.append(f"operator must be one of {', '.join(OPERATORS)}")
+    return errors
+
+
+def project_rules_data(project_id):
+    rules = list(TacticalRule.objects.filter(project_id=project_id, active=True).order_by('id').values(*RULE_FIELDS))
+    return rules or DEFAULT_RULES
+
+
+def count_matrix(rollups):
+    """Matches x event type codes matrix of the rollups' ``event_counts``; unknown types count under code 0."""
+    counts = np.zeros((len(rollups), event_types.VOCAB_SIZE))
+    for i, rollup in enumerate(rollups):
+        for name, count in rollup['event_counts'].items():
+            counts[i, event_types.CODES.get(name, event_types.UNKNOWN)] += count
+    return counts
+
+
+def _weights(rules, field):
+    weights = np.zeros((len(rules), event_types.VOCAB_SIZE))
+    for i, rule in enumerate(rules):
+        for name in rule[field]:
+            weights[i, event_types.CODES.get(name, event_types.UNKNOWN)] = 1
+    return weights
+
+
+def evaluate(rules, counts):
+    """Matches x rules matrix of whether each rule fires; ratio rules never fire on a zero denominator."""
+    if not rules or not len(counts):
+        return np.zeros((len(counts), len(rules)), dtype=bool)
+    numerators = counts @ _weights(rules, 'numerator').T
+    denominators = counts @ _weights(rules, 'denominator').T
+    is_ratio = np.array([bool(rule['denominator']) for rule in rules])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(is_ratio, numerators / denominators, numerators)
+    thresholds = np.array([rule['threshold'] for rule in rules], dtype=float)
+    fired = np.zeros(values.shape, dtype=bool)
+    for operator, compare in OPERATORS.items():
+        columns = np.array([rule['operator'] == operator for rule in rules])
+        if columns.any():
+            fired[:, columns] = compare(values[:, columns], thresholds[columns])
+    # A count over a zero count is inf (or nan over 0/0), which would compare as a value
+    return fired & (~is_ratio | (denominators > 0))
+
+
+def match_suggestions(rules, rollups):
+    """The messages of the rules each rollup's match triggers."""
+    fired = evaluate(rules, count_matrix(rollups))
+    messages = [rule['message'] for rule in rules]
+    return [[messages[j] for j in np.flatnonzero(row)] for row in fired]
@@ -1,3 +1,512 @@
-from django.test import TestCase
+import datetime
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import joblib
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from analytics import artifacts, feature_store, form, jobs, possessions, season_simulator, signals, tactical_rules
+from analytics.models import AnalyticsJob, MatchFeatures, Possession, PossessionState, TeamFormPoint, TeamFormState
+from events import event_types
+from events.models import Event
+from matches.models import Match
+from projects.models import Project
+from teams.models import Team
+
+KICKOFF = datetime.datetime(2025, 3, 1, 15, 0, tzinfo=datetime.timezone.utc)
+
+
+def create_match(date=datetime.date(2025, 3, 1), teams=None, **fields):
+    if teams is None:
+        project = Project.objects.create(name='League')
+        teams = [Team.objects.create(name=name, project=project) for name in ('Home', 'Away')]
+    home, away = teams
+    return Match.objects.create(project=home.project, home_team=home, away_team=away, date=date, **fields)
+
+
+def add_events(match, events, start=0):
+    """Events from ``(team, event_type)`` or ``(team, event_type, x)`` tuples, ten seconds apart from ``start``."""
+    return [Event.objects.create(
+        match=match, team=team, event_type=event_type, x_coord=x[0] if x else None, y_coord=50 if x else None,
+        timestamp=KICKOFF + datetime.timedelta(seconds=10 * (start + i)),
+    ) for i, (team, event_type, *x) in enumerate(events)]
+
+
+def rule(numerator, denominator, operator, threshold):
+    return {'name': 'rule', 'numerator': numerator, 'denominator': denominator, 'operator': operator,
+            'threshold': threshold, 'message': 'fired'}
+
+
+def fires(rules, event_counts):
+    """Whether each rule fires for one match's event counts."""
+    return tactical_rules.evaluate(rules, tactical_rules.count_matrix([{'event_counts': event_counts}]))[0].tolist()
+
+
+class EvaluateTests(SimpleTestCase):
+    def test_ratio_over_zero_count_does_not_fire(self):
+        # 5 / 0 is inf, which is greater than any threshold
+        self.assertEqual(fires([rule(['penalty'], ['try'], '>', 2)], {'penalty': 5}), [False])
+        self.assertEqual(fires([rule(['penalty'], ['try'], '<', 2)], {}), [False])
+
+    def test_ratio_over_nonzero_count(self):
+        self.assertEqual(fires([rule(['penalty'], ['try'], '>', 2)], {'penalty': 5, 'try': 2}), [True])
+        self.assertEqual(fires([rule(['penalty'], ['try'], '>', 2)], {'penalty': 4, 'try': 2}), [False])
+
+    def test_count_rule_fires_on_zero(self):
+        self.assertEqual(fires([rule(['try'], [], '<', 1)], {}), [True])
+
+    def test_default_rules(self):
+        names = [r['name'] for r in tactical_rules.DEFAULT_RULES]
+
+        def fired(event_counts):
+            return {name for name, f in zip(names, fires(tactical_rules.DEFAULT_RULES, event_counts)) if f}
+
+        self.assertEqual(fired({}), set())
+        self.assertEqual(fired({'missed_tackle': 5, 'tackle': 20, 'penalty': 3}), set())
+        self.assertEqual(fired({'missed_tackle': 6, 'tackle': 20}), {'missed_tackles'})
+        self.assertEqual(fired({'tackle': 5, 'missed_tackle': 4}), {'tackle_success'})
+        self.assertEqual(fired({'penalty': 4}), {'penalties'})
+        self.assertEqual(fired({'pass': 7, 'carry': 10}), {'pass_carry_ratio'})
+        self.assertEqual(fired({'pass': 8, 'carry': 10, 'tackle': 6, 'missed_tackle': 4}), set())
+
+    def test_unknown_event_types(self):
+        # Rollups read events of types outside the vocabulary back as 'unknown'
+        counts = {'unknown': 12, 'penalty': 4, 'tackle': 10}
+        self.assertEqual(fires(tactical_rules.DEFAULT_RULES, counts), [False, False, True, False])
+
+    def test_match_suggestions(self):
+        rollups = [{'event_counts': {'penalty': 4}}, {'event_counts': {'tackle': 10}}]
+        messages = tactical_rules.match_suggestions(tactical_rules.DEFAULT_RULES, rollups)
+        self.assertEqual(messages, [[tactical_rules.DEFAULT_RULES[2]['message']], []])
+
+
+class TacticalRuleViewSetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('coach', password='pw'))
+
+    def test_project_must_be_an_id(self):
+        response = self.client.get('/api/tactical-rules/', {'project': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('project', response.json())
+
+    def test_project_filter(self):
+        response = self.client.get('/api/tactical-rules/', {'project': '1'})
+        self.assertEqual(response.status_code, 200)
+
+
+class RequeueStaleTests(TestCase):
+    def running_job(self, **fields):
+        return AnalyticsJob.objects.create(kind='simulate_season', status=AnalyticsJob.RUNNING, attempts=1, **fields)
+
+    def test_long_job_with_live_worker_stays_running(self):
+        started = timezone.now() - datetime.timedelta(hours=2)
+        alive = self.running_job(started_at=started, heartbeat_at=timezone.now())
+        dead = self.running_job(started_at=started, heartbeat_at=started)
+        legacy = self.running_job(started_at=started)
+        self.assertEqual(jobs.requeue_stale(), (2, 0))
+        statuses = dict(AnalyticsJob.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[alive.pk], AnalyticsJob.RUNNING)
+        self.assertEqual(statuses[dead.pk], AnalyticsJob.QUEUED)
+        self.assertEqual(statuses[legacy.pk], AnalyticsJob.QUEUED)
+
+    def test_heartbeat(self):
+        job = self.running_job(started_at=timezone.now() - datetime.timedelta(hours=2), heartbeat_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(jobs.heartbeat([job.pk]), 1)
+        self.assertEqual(jobs.requeue_stale(), (0, 0))
+
+
+class ArtifactStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        for name, value in (('ARTIFACTS_DIR', os.path.join(self.root, 'artifacts')), ('PROJECT_DIR', self.root)):
+            patcher = mock.patch.object(artifacts, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(artifacts._loaded.clear)
+        # Versions are named by the second they were saved in; give each save its own
+        times = (datetime.datetime(2026, 1, 1, 12, 0, s, tzinfo=datetime.timezone.utc) for s in range(60))
+        patcher = mock.patch.object(artifacts, 'datetime', **{'now.side_effect': lambda tz=None: next(times)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_save_and_load(self):
+        version = artifacts.save_version('player_profile', objects={'scaler': {'mean': 1}},
+                                         metadata={'metrics': {'accuracy': 0.9}})
+        self.assertEqual(artifacts.current_version('player_profile'), version)
+        self.assertEqual(artifacts.list_versions('player_profile'), [version])
+        doc = artifacts.manifest('player_profile')
+        self.assertEqual(doc['metrics'], {'accuracy': 0.9})
+        self.assertEqual(set(doc['artifacts']), {'scaler'})
+        self.assertEqual(artifacts.load('player_profile', 'scaler'), {'mean': 1})
+        self.assertEqual(artifacts.verify('player_profile'), [])
+
+    def test_verify_detects_changed_files(self):
+        artifacts.save_version('player_profile', objects={'scaler': {'mean': 1}})
+        joblib.dump({'mean': 2}, artifacts.artifact_path('player_profile', 'scaler'))
+        self.assertEqual(artifacts.verify('player_profile'), ['scaler'])
+
+    def test_pin_and_rollback(self):
+        first = artifacts.save_version('player_profile', objects={'scaler': 1})
+        second = artifacts.save_version('player_profile', objects={'scaler': 2})
+        third = artifacts.save_version('player_profile', objects={'scaler': 3}, activate=False)
+        self.assertEqual(artifacts.list_versions('player_profile'), [first, second, third])
+        self.assertEqual(artifacts.current_version('player_profile'), second)
+        self.assertEqual(artifacts.load('player_profile', 'scaler'), 2)
+
+        self.assertEqual(artifacts.pin('player_profile', third), third)
+        self.assertEqual(artifacts.load('player_profile', 'scaler'), 3)
+        self.assertEqual(artifacts.rollback('player_profile'), second)
+        self.assertEqual(artifacts.rollback('player_profile'), first)
+        self.assertEqual(artifacts.load('player_profile', 'scaler'), 1)
+        with self.assertRaises(artifacts.ArtifactError):
+            artifacts.rollback('player_profile')
+        with self.assertRaises(artifacts.ArtifactError):
+            artifacts.pin('player_profile', 'no-such-version')
+        self.assertEqual(artifacts.current_version('player_profile'), first)
+
+    def test_current_pointer(self):
+        version = artifacts.save_version('player_profile', objects={'scaler': 1})
+        with open(os.path.join(artifacts.ARTIFACTS_DIR, 'player_profile', 'CURRENT')) as f:
+            self.assertEqual(f.read(), version + '\n')
+        # Other groups and files left by an interrupted save don't count as versions
+        os.makedirs(os.path.join(artifacts.ARTIFACTS_DIR, 'player_profile', '.staging-abc'))
+        self.assertEqual(artifacts.list_versions('player_profile'), [version])
+        self.assertIsNone(artifacts.current_version('match_outcome'))
+
+    def test_legacy_fallback(self):
+        joblib.dump({'legacy': True}, os.path.join(self.root, 'rugby_scaler.pkl'))
+        self.assertIsNone(artifacts.current_version('player_profile'))
+        self.assertIsNone(artifacts.manifest('player_profile'))
+        self.assertEqual(artifacts.artifact_path('player_profile', 'scaler'), os.path.join(self.root, 'rugby_scaler.pkl'))
+        self.assertEqual(artifacts.load('player_profile', 'scaler'), {'legacy': True})
+        with self.assertRaises(FileNotFoundError):
+            artifacts.load('player_profile', 'rf_model')
+        with self.assertRaises(artifacts.ArtifactError):
+            artifacts.artifact_path('expected_try', 'model')
+
+        # The first stored version takes over from the legacy files
+        artifacts.save_version('player_profile', objects={'scaler': {'legacy': False}})
+        self.assertEqual(artifacts.load('player_profile', 'scaler'), {'legacy': False})
+
+
+class SegmentTests(SimpleTestCase):
+    HOME, AWAY = 1, 2
+
+    def segment(self, events, flip_team_id=None):
+        rows = [(i, team, KICKOFF + datetime.timedelta(seconds=i), None, x, event_types.code(name))
+                for i, (team, name, x) in enumerate(events, start=1)]
+        return possessions.segment(rows, self.HOME, self.AWAY, flip_team_id)
+
+    def test_possessions(self):
+        found = self.segment([
+            (self.AWAY, 'kickoff', None),
+            (self.AWAY, 'carry', 30),
+            (self.HOME, 'tackle', 65),  # made by the defence, so still the away team's ball
+            (self.AWAY, 'kick', 40),
+            (self.HOME, 'carry', 40),
+            (self.HOME, 'pass', 50),
+            (self.HOME, 'try', 100),
+            (self.HOME, 'conversion', None),  # between possessions
+            (self.AWAY, 'kickoff', None),
+            (self.AWAY, 'carry', 20),
+            (self.HOME, 'carry', 60),
+        ])
+        self.assertEqual(
+            [(p['team_id'], p['outcome'], p['first_event_id'], p['last_event_id'], p['event_count']) for p in found],
+            [(self.AWAY, Possession.KICK, 1, 4, 4), (self.HOME, Possession.TRY, 5, 7, 3),
+             (self.AWAY, Possession.TURNOVER, 9, 10, 2), (self.HOME, Possession.OPEN, 11, 11, 1)])
+        # The tackle at the defender's 65 is the attacker's 35
+        self.assertEqual([p['territory'] for p in found], [10.0, 60.0, 0, 0])
+
+    def test_flipped_team(self):
+        found = self.segment([(self.AWAY, 'carry', 70), (self.AWAY, 'carry', 60), (self.AWAY, 'in_touch', 55)],
+                             flip_team_id=self.AWAY)
+        self.assertEqual([(p['outcome'], p['start_x'], p['end_x'], p['territory']) for p in found],
+                         [(Possession.TOUCH, 30, 45, 15.0)])
+
+    def test_restart_ends_possession(self):
+        found = self.segment([(self.HOME, 'carry', None), (self.HOME, 'scrum', None), (self.HOME, 'carry', None)])
+        self.assertEqual([(p['outcome'], p['event_count']) for p in found], [(Possession.STOPPAGE, 1), (Possession.OPEN, 2)])
+
+
+class UpdatePossessionsTests(TestCase):
+    def setUp(self):
+        self.match = create_match()
+        self.home, self.away = self.match.home_team, self.match.away_team
+
+    def stored(self):
+        return list(Possession.objects.filter(match=self.match).order_by('sequence').values_list(
+            'sequence', 'team_id', 'outcome', 'first_event_id', 'last_event_id', 'event_count', 'territory'))
+
+    def assert_matches_rebuild(self):
+        incremental = self.stored()
+        possessions.update_match(self.match.pk, rebuild=True)
+        self.assertEqual(incremental, self.stored())
+
+    def test_incremental_from_last_kept_possession(self):
+        add_events(self.match, [
+            (self.home, 'kickoff', 50), (self.home, 'carry', 30), (self.home, 'kick', 45),
+            (self.away, 'carry', 40), (self.away, 'try', 100), (self.away, 'conversion'),
+            (self.home, 'kickoff', 50), (self.home, 'carry', 35),
+        ])
+        self.assertEqual(possessions.update_match(self.match.pk), 3)
+        first = Possession.objects.get(match=self.match, sequence=0)
+
+        # Extends the open possession and adds a turnover after it
+        add_events(self.match, [(self.home, 'pass', 40), (self.away, 'interception', 60), (self.away, 'carry', 70)],
+                   start=8)
+        self.assertEqual(possessions.update_match(self.match.pk), 3)
+        # Possessions before the ones the new events can affect are kept as they were
+        self.assertEqual(Possession.objects.get(match=self.match, sequence=0).pk, first.pk)
+        self.assert_matches_rebuild()
+
+    def test_event_between_earlier_events(self):
+        add_events(self.match, [(self.home, 'carry', 30), (self.home, 'kick', 45), (self.away, 'carry', 40),
+                                (self.away, 'knock_on', 45), (self.home, 'carry', 55)])
+        possessions.update_match(self.match.pk)
+        # Dated between the kick and the away carry
+        Event.objects.create(match=self.match, team=self.away, event_type='turnover', x_coord=50, y_coord=50,
+                             timestamp=KICKOFF + datetime.timedelta(seconds=15))
+        possessions.update_match(self.match.pk)
+        self.assert_matches_rebuild()
+
+    def test_trailing_events_outside_possessions(self):
+        add_events(self.match, [(self.home, 'carry', 30), (self.home, 'try', 100)])
+        self.assertEqual(possessions.update_match(self.match.pk), 1)
+        conversion, = add_events(self.match, [(self.home, 'conversion')], start=2)
+        # Read once (re-segmenting the try's possession), then not new any more
+        self.assertEqual([possessions.update_match(self.match.pk) for _ in range(3)], [1, 0, 0])
+        self.assertEqual(PossessionState.objects.get(match=self.match).max_event_id, conversion.pk)
+        self.assertEqual(len(self.stored()), 1)
+
+    def test_rebuild_after_edit(self):
+        carry, kick = add_events(self.match, [(self.home, 'carry', 30), (self.home, 'kick', 45)])
+        possessions.update_match(self.match.pk)
+        kick.event_type = 'pass'
+        kick.save()
+        # An edit isn't a new event; edits queue a rebuild
+        self.assertEqual(possessions.update_match(self.match.pk), 0)
+        self.assertEqual(possessions.update_match(self.match.pk, rebuild=True), 1)
+        self.assertEqual([p[2] for p in self.stored()], [Possession.OPEN])
+
+
+class TeamFormTests(TestCase):
+    # Per match: (tackles, missed tackles, tries)
+    STATS = [(5, 1, 2), (8, 4, 0), (3, 0, 1), (9, 1, 3)]
+
+    def setUp(self):
+        self.first = create_match(datetime.date(2025, 3, 1))
+        self.team, self.opponent = self.first.home_team, self.first.away_team
+        self.matches = [self.first] + [
+            create_match(datetime.date(2025, 3, 1 + 7 * i), teams=[self.team, self.opponent]) for i in range(1, 4)]
+        for match, stats in zip(self.matches, self.STATS):
+            self.add_stats(match, *stats)
+
+    def add_stats(self, match, tackles, missed, tries):
+        add_events(match, [(self.team, 'tackle')] * tackles + [(self.team, 'missed_tackle')] * missed
+                   + [(self.team, 'try')] * tries)
+
+    def snapshot(self):
+        state = TeamFormState.objects.get(team=self.team)
+        points = list(TeamFormPoint.objects.filter(team=self.team).order_by('date', 'match_id').values_list(
+            'match_id', 'date', 'values', 'rolling', 'ewm', 'streaks'))
+        return state.matches, state.last_match_date, state.last_match_id, state.window, state.ewm, state.streaks, points
+
+    def assert_matches_rebuild(self):
+        incremental = self.snapshot()
+        form.rebuild_team(self.team.pk)
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_fold(self):
+        state = {'window': {}, 'ewm': {}, 'streaks': {}}
+        for value in (1.0, 3.0, 2.0):
+            form.fold(state, {metric: value for metric in form.METRICS})
+        self.assertEqual(state['window']['tries'], [1.0, 3.0, 2.0])
+        # 1 -> 1 + (3 - 1) / 3 -> 1.6667 + (2 - 1.6667) / 3
+        self.assertEqual(state['ewm']['tries'], 1.7778)
+        self.assertEqual(state['streaks']['tries'], 2)
+        self.assertEqual(form.rolling(state)['tries'], 2.0)
+
+    def test_incremental_matches_rebuild(self):
+        self.assertEqual(form.update_team(self.team.pk), 4)
+        self.assertEqual(form.update_team(self.team.pk), 0)
+        fifth = create_match(datetime.date(2025, 4, 5), teams=[self.team, self.opponent])
+        self.add_stats(fifth, 4, 4, 0)
+        self.assertEqual(form.update_team(self.team.pk), 1)
+        self.assertEqual(TeamFormPoint.objects.filter(team=self.team).count(), 5)
+        self.assert_matches_rebuild()
+
+    def test_edited_match_rewinds(self):
+        form.update_team(self.team.pk)
+        add_events(self.matches[1], [(self.team, 'try')] * 4, start=50)
+        # Redoes the edited match and the ones after it
+        self.assertEqual(form.match_changed(self.team.pk, self.matches[1].pk), 3)
+        self.assertEqual(TeamFormPoint.objects.get(team=self.team, match=self.matches[1]).values['tries'], 4.0)
+        self.assert_matches_rebuild()
+
+    def test_rescheduled_match_moves(self):
+        form.update_team(self.team.pk)
+        self.first.date = datetime.date(2025, 4, 12)
+        self.first.save()
+        self.assertEqual(form.match_changed(self.team.pk, self.first.pk), 4)
+        order = [p['match_id'] for p in form.team_form_data(self.team.pk)['form']]
+        self.assertEqual(order, [m.pk for m in self.matches[1:]] + [self.first.pk])
+        self.assert_matches_rebuild()
+
+    def test_deleted_match(self):
+        form.update_team(self.team.pk)
+        self.matches[2].delete()
+        form.match_changed(self.team.pk, self.matches[2].pk)
+        self.assertEqual(TeamFormState.objects.get(team=self.team).matches, 3)
+        self.assert_matches_rebuild()
+
+    def test_event_moved_to_other_team(self):
+        event = Event.objects.filter(match=self.first, team=self.team).first()
+        AnalyticsJob.objects.all().delete()
+        with mock.patch.object(signals, 'invalidate_match') as invalidate, \
+                self.captureOnCommitCallbacks(execute=True):
+            event.team = self.opponent
+            event.save()
+        self.assertEqual(sorted(invalidate.call_args.args[1]), [self.team.pk, self.opponent.pk])
+        queued = AnalyticsJob.objects.filter(kind='update_team_form').values_list('params', flat=True)
+        self.assertEqual(sorted(p['team_id'] for p in queued), [self.team.pk, self.opponent.pk])
+
+
+class SeasonSimulatorTests(TestCase):
+    def setUp(self):
+        project = Project.objects.create(name='League')
+        self.a, self.b, self.c = (Team.objects.create(name=name, project=project) for name in 'ABC')
+        self.project = project
+        # Played: A 12-5 B (a losing bonus for B), B 3-15 C
+        played = create_match(datetime.date(2025, 3, 1), teams=[self.a, self.b])
+        add_events(played, [(self.a, 'try'), (self.a, 'conversion'), (self.b, 'try'), (self.a, 'try')])
+        played = create_match(datetime.date(2025, 3, 8), teams=[self.b, self.c])
+        add_events(played, [(self.b, 'penalty_goal')] + [(self.c, 'try')] * 3)
+        # To play: C v A, A v B
+        self.remaining = [create_match(datetime.date(2025, 3, 15), teams=[self.c, self.a]),
+                          create_match(datetime.date(2025, 3, 22), teams=[self.a, self.b])]
+
+    def simulate(self, p_home=(1.0, 0.0), **options):
+        # C beat A 20-10 and B beat A 30-10 (with score_sd=0)
+        predictions = (np.array(p_home), np.array([20.0, 10.0]), np.array([10.0, 30.0]))
+        with mock.patch.object(season_simulator, 'predict_fixtures', return_value=predictions):
+            return season_simulator.simulate_season(self.project.pk, **options)
+
+    def test_result_points(self):
+        home, away = season_simulator.result_points(np.array([20, 12, 10, 15, 30]), np.array([10, 5, 10, 22, 37]))
+        # Win 4, draw 2, losing by 7 or less 1
+        self.assertEqual(home.tolist(), [4, 4, 2, 1, 1])
+        self.assertEqual(away.tolist(), [0, 1, 2, 4, 4])
+        self.assertEqual(season_simulator.result_points(np.array(30), np.array(22))[1], 0)
+
+    def test_ladder(self):
+        teams, played, remaining = season_simulator.season_fixtures(self.project.pk)
+        self.assertEqual([m['id'] for m in remaining], [m.pk for m in self.remaining])
+        self.assertEqual([(m['home_score'], m['away_score']) for m in played], [(12, 5), (3, 15)])
+        points, diff = season_simulator.ladder(played, {team['id']: i for i, team in enumerate(teams)})
+        self.assertEqual(points.tolist(), [4, 1, 4])
+        self.assertEqual(diff.tolist(), [7, -19, 12])
+
+    def test_deterministic_season(self):
+        result = self.simulate(simulations=50, score_sd=0, seed=1)
+        ladder = {row['name']: row for row in result['ladder']}
+        self.assertEqual([row['name'] for row in result['ladder']], ['C', 'B', 'A'])
+        self.assertEqual({name: row['expected_points'] for name, row in ladder.items()}, {'A': 4, 'B': 5, 'C': 8})
+        self.assertEqual(ladder['C']['positions'], [1, 0, 0])
+        self.assertEqual(ladder['A']['playoff_probability'], 1)
+        self.assertEqual(result['played'], 2)
+
+    def test_seeded(self):
+        options = {'p_home': (0.5, 0.5), 'simulations': 3000, 'score_sd': 7, 'seed': 42}
+        self.assertEqual(self.simulate(**options)['ladder'], self.simulate(**options)['ladder'])
+        self.assertNotEqual(self.simulate(**options)['ladder'], self.simulate(**dict(options, seed=43))['ladder'])
+        for row in self.simulate(**options)['ladder']:
+            self.assertAlmostEqual(sum(row['positions']), 1, places=3)
+
+    def test_chunks_add_up_whatever_the_processes(self):
+        inputs = {
+            'p_home': np.array([0.5]), 'home_score': np.array([20.0]), 'away_score': np.array([18.0]), 'score_sd': 7.0,
+            'points': np.zeros(2), 'diff': np.zeros(2), 'home_teams': np.eye(2)[[0]], 'away_teams': np.eye(2)[[1]],
+        }
+        simulations = season_simulator.CHUNK * 2 + 10
+        serial = season_simulator.run_simulations(inputs, simulations, seed=7, processes=1)
+        pooled = season_simulator.run_simulations(inputs, simulations, seed=7, processes=2)
+        self.assertEqual(serial[0].tolist(), pooled[0].tolist())
+        self.assertEqual(serial[0].sum(), simulations * 2)
+
+    def test_check_options(self):
+        for options, message in [
+            ({'simulations': 0}, 'simulations must be between 1 and'),
+            ({'simulations': season_simulator.MAX_SIMULATIONS + 1}, 'simulations must be between 1 and'),
+            ({'score_sd': -1}, 'score_sd must be at least 0'),
+            ({'playoff_spots': 0}, 'playoffs at least 1'),
+        ]:
+            with self.subTest(**options), self.assertRaisesMessage(ValueError, message):
+                self.simulate(**options)
+        season_simulator.check_options(season_simulator.MAX_SIMULATIONS, 0, 1)
+
+
+class FeatureStoreTests(TestCase):
+    def setUp(self):
+        self.match = create_match()
+        self.home, self.away = self.match.home_team, self.match.away_team
+
+    def features(self, match=None):
+        f = MatchFeatures.objects.get(match=match or self.match)
+        return f.home, f.away, f.event_count, f.max_event_id
+
+    def test_update_match_agrees_with_refresh(self):
+        add_events(self.match, [(self.home, 'try'), (self.home, 'carry'), (self.away, 'kick'), (self.away, 'tackle')])
+        self.assertEqual(feature_store.update_match(self.match.pk), 4)
+        add_events(self.match, [(self.home, 'run'), (self.away, 'box_kick'), (self.away, 'try'), (None, 'try')], start=4)
+        self.assertEqual(feature_store.update_match(self.match.pk), 4)
+        self.assertEqual(feature_store.update_match(self.match.pk), 0)
+        incremental = self.features()
+        self.assertEqual((incremental[0]['tries'], incremental[0]['runs'], incremental[1]['kicks']), (1, 2, 2))
+
+        self.assertEqual(feature_store.refresh([self.match.pk], rebuild=True), 1)
+        self.assertEqual(self.features(), incremental)
+
+    def test_staleness(self):
+        events = add_events(self.match, [(self.home, 'try'), (self.away, 'try')])
+        empty = create_match(teams=[self.home, self.away])
+        self.assertEqual(feature_store.refresh([self.match.pk, empty.pk]), 2)
+        self.assertEqual(self.features(empty)[2:], (0, 0))
+        # Up to date: same event count and highest id
+        self.assertEqual(feature_store.refresh([self.match.pk, empty.pk]), 0)
+
+        add_events(self.match, [(self.home, 'try')], start=2)
+        self.assertEqual(feature_store.refresh([self.match.pk, empty.pk]), 1)
+        self.assertEqual(self.features()[0]['tries'], 2)
+        # A deleted event changes the count even when the highest id stays
+        events[0].delete()
+        self.assertEqual(feature_store.refresh([self.match.pk]), 1)
+        self.assertEqual(self.features()[0]['tries'], 1)
+
+    def test_fixture_rows_use_matches_before(self):
+        for day, tries in ((1, 1), (8, 3), (15, 5)):
+            match = create_match(datetime.date(2025, 3, day), teams=[self.home, self.away])
+            add_events(match, [(self.home, 'try')] * tries + [(self.away, 'kick')])
+        self.match.delete()
+        feature_store.refresh(Match.objects.values_list('pk', flat=True))
+        fixture = {'home_team_id': self.home.pk, 'away_team_id': self.away.pk, 'home_team': 'Home', 'away_team': 'Away',
+                   'date': datetime.date(2025, 3, 15)}
+
+        (features, home, away), = feature_store.fixture_rows([fixture], before=datetime.date(2025, 3, 8))
+        self.assertEqual((home, away), ('Home', 'Away'))
+        self.assertEqual((features['home_tries'], features['away_kicks']), (1, 1))
+        # Without ``before``, each fixture's own date; the match on that date doesn't count
+        (features, _, _), = feature_store.fixture_rows([fixture])
+        self.assertEqual(features['home_tries'], 2)
+        (features, _, _), = feature_store.fixture_rows([fixture], before=datetime.date(2025, 3, 16), window=2)
+        self.assertEqual(features['home_tries'], 4)
+        self.assertEqual(feature_store.fixture_rows([fixture], before=datetime.date(2025, 3, 1))[0][0], {})
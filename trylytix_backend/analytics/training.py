@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone, is_classifier
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterGrid, ParameterSampler, check_cv
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FEATURE_CACHE_DIR = os.path.join(BASE_DIR, '..', '.cache', 'features')
+
+
+def fingerprint(*parts):
+    """Stable short hash of the inputs a feature matrix was built from."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return fingerprint(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def cached_feature_matrix(name, key, build_fn, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Return build_fn()'s result, cached on disk under ``name`` and ``key``.
+
+    Every model in a training run reads the same matrix, and joblib memory-maps
+    large arrays into the worker processes instead of copying them per task.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{name}-{key}.joblib")
+    if os.path.exists(path):
+        logger.info("Using cached feature matrix %s", path)
+        return joblib.load(path)
+    data = build_fn()
+    joblib.dump(data, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return data
+
+
+def load_search_config(path):
+    """
+    Read a hyperparameter search config, keyed by model name:
+
+        {"rf": {"param_grid": {"n_estimators": [100, 300], "max_depth": [null, 8]}},
+         "gb": {"param_distributions": {"learning_rate": [0.05, 0.1]}, "n_iter": 5}}
+    """
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _candidates(search, random_state=42):
+    if not search:
+        return [{}]
+    if 'param_distributions' in search:
+        return list(ParameterSampler(search['param_distributions'], n_iter=search.get('n_iter', 10),
+                                     random_state=random_state))
+    return list(ParameterGrid(search.get('param_grid', {})))
+
+
+def _take(data, idx):
+    return data.iloc[idx] if hasattr(data, 'iloc') else data[idx]
+
+
+def _fit_and_score(estimator, params, X, y, train, test, scoring):
+    est = clone(estimator).set_params(**params)
+    start = time.perf_counter()
+    est.fit(_take(X, train), _take(y, train))
+    fit_time = time.perf_counter() - start
+    score = get_scorer(scoring)(est, _take(X, test), _take(y, test))
+    return score, fit_time
+
+
+def _refit(estimator, params, X, y):
+    est = clone(estimator).set_params(**params)
+    start = time.perf_counter()
+    est.fit(X, y)
+    return est, time.perf_counter() - start
+
+
+def train_models(specs, X, targets, cv=5, search=None, n_jobs=-1):
+    """
+    Fit several independent models on one shared feature matrix.
+
+    ``specs`` is a list of dicts with ``name``, ``estimator``, ``target`` (a key of
+    ``targets``) and ``scoring``. Every (model, candidate params, CV fold) fit runs as
+    one task in a single joblib process pool, then the best candidate of each model is
+    refit on all rows, again in parallel. Returns ``(models, report)`` where ``report``
+    holds CV metrics, chosen params and timings.
+    """
+    search = search or {}
+    wall_start = time.perf_counter()
+
+    tasks, task_keys, grids = [], [], {}
+    for spec in specs:
+        y = targets[spec['target']]
+        splitter = check_cv(cv, y, classifier=is_classifier(spec['estimator']))
+        folds = list(splitter.split(X, y))
+        grids[spec['name']] = _candidates(search.get(spec['name']))
+        for c, params in enumerate(grids[spec['name']]):
+            for train, test in folds:
+                tasks.append(delayed(_fit_and_score)(spec['estimator'], params, X, y, train, test, spec['scoring']))
+                task_keys.append((spec['name'], c))
+
+    cv_start = time.perf_counter()
+    results = Parallel(n_jobs=n_jobs)(tasks)
+    cv_wall = time.perf_counter() - cv_start
+
+    scores, fit_times = {}, {}
+    for key, (score, fit_time) in zip(task_keys, results):
+        scores.setdefault(key, []).append(score)
+        fit_times.setdefault(key[0], []).append(fit_time)
+
+    best = {}
+    for spec in specs:
+        name = spec['name']
+        means = [np.mean(scores[(name, c)]) for c in range(len(grids[name]))]
+        c = int(np.nanargmax(means)) if not np.all(np.isnan(means)) else 0
+        best[name] = (c, grids[name][c])
+
+    refit_start = time.perf_counter()
+    refits = Parallel(n_jobs=n_jobs)(
+        delayed(_refit)(spec['estimator'], best[spec['name']][1], X, targets[spec['target']]) for spec in specs
+    )
+    refit_wall = time.perf_counter() - refit_start
+
+    models, report = {}, {'models': {}}
+    for spec, (est, refit_time) in zip(specs, refits):
+        name = spec['name']
+        c, params = best[name]
+        models[name] = est
+        report['models'][name] = {
+            'scoring': spec['scoring'],
+            'cv_mean': float(np.mean(scores[(name, c)])),
+            'cv_std': float(np.std(scores[(name, c)])),
+            'best_params': params,
+            'candidates': len(grids[name]),
+            'timing': {
+                'cv_fit_seconds_total': float(np.sum(fit_times[name])),
+                'refit_seconds': refit_time,
+            },
+        }
+    report['timing'] = {
+        'cv_wall_seconds': cv_wall,
+        'refit_wall_seconds': refit_wall,
+        'total_wall_seconds': time.perf_counter() - wall_start,
+        'tasks': len(tasks),
+        'n_jobs': n_jobs,
+    }
+    return models, report
+
+
+def write_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    logger.info("Training report written to %s", path)
@@ -1,42 +1,35 @@
-import joblib
 import os
 import pandas as pd
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras.preprocessing.sequence import pad_sequences
+from analytics import artifacts
+from events import event_types
 
-# Model paths (adjust if necessary)
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'try_pattern_model.pkl')
-LSTM_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'try_lstm_model.h5')
+ARTIFACT_GROUP = 'try_pattern'
+_lstm_models = {}
 
-# Event type mapping (must match what you used for training)
-EVENT_TYPE_LIST = [
-    "try", "kick", "penalty", "kickoff", "pass", "carry", "run", "tackle", "missed_tackle", "ruck",
-    "maul", "lineout", "lineout_win", "lineout_loss", "scrum", "scrum_win", "scrum_loss", "kick_return",
-    "box_kick", "grubber_kick", "free_kick", "drop_goal", "conversion", "conversion_missed",
-    "penalty_goal", "penalty_missed", "turnover", "knock_on", "forward_pass", "interception",
-    "high_tackle", "offside", "not_releasing", "holding_on", "in_touch", "restart", "injury",
-    "yellow_card", "red_card", "sin_bin", "substitution", "try_assist", "line_break",
-    "defensive_line_break", "advantage", "offload", "foul_play", "referee_call", "timeout",
-    "restart_22"
-]
-EVENT_TYPE2IDX = {e: i+1 for i, e in enumerate(EVENT_TYPE_LIST)}
 maxlen = 10  # Must match what you used for training
 
 def encode_event_seq(seq):
-    """Encode event strings to integer list using EVENT_TYPE2IDX."""
-    return [EVENT_TYPE2IDX.get(ev, 0) for ev in seq]
+    """Encode event names to their stored codes (0 for unknown), the models' input ids."""
+    return event_types.encode(seq).tolist()
+
+def load_lstm_model():
+    """Load the current LSTM once per process (keyed by path, so a new version is picked up)."""
+    path = artifacts.artifact_path(ARTIFACT_GROUP, 'lstm')
+    if path not in _lstm_models:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"LSTM model file not found at {path}")
+        _lstm_models.clear()
+        _lstm_models[path] = tf.keras.models.load_model(path)
+    return _lstm_models[path]
 
 def predict_outcome(test_sequence):
     try:
         # Load models
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
-        if not os.path.exists(LSTM_MODEL_PATH):
-            raise FileNotFoundError(f"LSTM model file not found at {LSTM_MODEL_PATH}")
-
-        clf = joblib.load(MODEL_PATH)
-        lstm_model = tf.keras.models.load_model(LSTM_MODEL_PATH)
+        clf = artifacts.load(ARTIFACT_GROUP, 'classifier')
+        lstm_model = load_lstm_model()
 
         # Encode and pad sequence
         encoded = encode_event_seq(test_sequence)
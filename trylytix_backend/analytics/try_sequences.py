@@ -0,0 +1,89 @@
+import json
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from events import event_types
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SEQUENCE_DIR = os.path.join(BASE_DIR, '..', '.cache', 'try_sequences')
+
+
+def build_match_sequences(match_df, maxlen):
+    """
+    Sliding windows of ``maxlen`` event codes (``event_code`` column) per team in one match.
+
+    Each window is labelled 1 if the team's next event is a try, else 0.
+    """
+    sequences, labels = [], []
+    match_df = match_df.sort_values('timestamp')
+    for _, team_df in match_df.groupby('team_name', sort=False, observed=True):
+        codes = team_df['event_code'].to_numpy(dtype=np.int16)
+        if len(codes) <= maxlen:
+            continue
+        sequences.append(sliding_window_view(codes[:-1], maxlen))
+        labels.append(codes[maxlen:] == event_types.TRY)
+    if not sequences:
+        return np.empty((0, maxlen), dtype=np.int16), np.empty(0, dtype=np.int8)
+    return np.concatenate(sequences), np.concatenate(labels).astype(np.int8)
+
+
+class SequenceStore:
+    """
+    On-disk training set for the try-pattern models, one ``.npz`` chunk per match.
+
+    ``state.json`` holds the watermarks (highest Event id and latest ``updated_at``
+    already encoded) and the settings the chunks were built with, so a run can tell
+    which matches changed and whether the existing chunks are still compatible.
+    """
+
+    def __init__(self, path=SEQUENCE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def _state_path(self):
+        return os.path.join(self.path, 'state.json')
+
+    def load_state(self):
+        try:
+            with open(self._state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_state(self, state):
+        with open(self._state_path + '.tmp', 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(self._state_path + '.tmp', self._state_path)
+
+    def is_compatible(self, settings):
+        state = self.load_state()
+        return bool(state) and all(state.get(k) == v for k, v in settings.items())
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            os.remove(os.path.join(self.path, name))
+
+    def write_match(self, match_id, X, y):
+        path = os.path.join(self.path, f"match_{match_id}.npz")
+        np.savez(path + '.tmp.npz', X=X, y=y)
+        os.replace(path + '.tmp.npz', path)
+
+    def match_ids(self):
+        return sorted(
+            int(n[len('match_'):-len('.npz')]) for n in os.listdir(self.path)
+            if n.startswith('match_') and n.endswith('.npz') and '.tmp' not in n
+        )
+
+    def load(self, match_ids=None):
+        """Concatenate the chunks of ``match_ids`` (default: every stored match)."""
+        Xs, ys = [], []
+        for match_id in self.match_ids() if match_ids is None else sorted(match_ids):
+            with np.load(os.path.join(self.path, f"match_{match_id}.npz")) as chunk:
+                Xs.append(chunk['X'])
+                ys.append(chunk['y'])
+        if not Xs:
+            return np.empty((0, 0), dtype=np.int16), np.empty(0, dtype=np.int8)
+        return np.concatenate(Xs), np.concatenate(ys)
@@ -1,6 +1,11 @@
-from django.urls import path
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
 from .views import export_match_events, match_heatmap, player_advanced_stats, player_stats, predict_outcome, team_stats, team_tactical_suggestions, team_trend_stats, player_ml_profile
-from .views import match_summary
+from .views import TacticalRuleViewSet, match_expected_try, player_compare, player_expected_try, player_similar, project_region_counts, team_form
+from .views import match_possessions, match_prediction, match_summary, project_season_simulation, project_tactical_report, project_team_comparison, submit_job, job_status
+
+router = DefaultRouter()
+router.register(r'tactical-rules', TacticalRuleViewSet, basename='tacticalrule')
 
 urlpatterns = [
     path('players/<int:player_id>/stats/', player_stats),
@@ -9,8 +14,22 @@ urlpatterns = [
     path('matches/<int:match_id>/heatmap/', match_heatmap),
     path('players/<int:player_id>/advanced-stats/', player_advanced_stats),
     path('teams/<int:team_id>/trend/', team_trend_stats),
+    path('teams/<int:team_id>/form/', team_form),
     path('teams/<int:team_id>/tactical-suggestions/', team_tactical_suggestions),
+    path('projects/<int:project_id>/team-comparison/', project_team_comparison),
+    path('projects/<int:project_id>/tactical-report/', project_tactical_report),
+    path('projects/<int:project_id>/region-counts/', project_region_counts),
+    path('projects/<int:project_id>/season-simulation/', project_season_simulation),
     path('matches/<int:match_id>/events-export/', export_match_events),
+    path('matches/<int:match_id>/possessions/', match_possessions),
+    path('matches/<int:match_id>/expected-try/', match_expected_try),
+    path('players/<int:player_id>/expected-try/', player_expected_try),
     path('predict-outcome/', predict_outcome),
+    path('matches/<int:match_id>/prediction/', match_prediction),
     path('players/<int:player_id>/deep-analysis/', player_ml_profile),
+    path('players/<int:player_id>/similar/', player_similar),
+    path('players/<int:player_id>/compare/<int:other_id>/', player_compare),
+    path('jobs/', submit_job),
+    path('jobs/<int:job_id>/', job_status),
+    path('', include(router.urls)),
 ]
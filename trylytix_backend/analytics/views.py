@@ -1,218 +1,165 @@
-from rest_framework.decorators import api_view
+import datetime
+
+from adrf.decorators import api_view
+from asgiref.sync import sync_to_async
+from rest_framework import viewsets
+from rest_framework.decorators import permission_classes
+from rest_framework.exceptions import NotAuthenticated, ValidationError
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Count
+from django.db.models import Avg, Count, Q, Sum
+from events import event_types, spatial
 from events.models import Event
 from teams.models import Player, Team
 from matches.models import Match
-from analytics.ml_model_prediction import predict_match_outcome
+from projects.models import Project
+from analytics.ml_model_prediction import ARTIFACT_GROUP as OUTCOME_ARTIFACTS, predict_fixtures, predict_match_outcome
 from analytics.player_analysis import deep_rf_analysis
+from analytics.instrumentation import timed
+from analytics import artifacts, expected_try, feature_store, form, jobs, match_analytics, player_similarity, season_simulator, tactical_rules
+from analytics.db_routing import replica_reads
+from analytics.models import AnalyticsJob, Possession, TacticalRule
+from analytics.serializers import TacticalRuleSerializer
+
+# Read-only analytics are async views (adrf's api_view keeps DRF's authentication, content
+# negotiation and rendering): under ASGI (SERVER_MODE=asgi, see gunicorn.conf.py) a request
+# waiting on the database doesn't hold a worker thread or process. Their queries go to the
+# read replica when one is configured (see analytics/db_routing.py).
 
 @api_view(['GET'])
-def player_stats(request, player_id):
-    stats = (
-        Event.objects.filter(player_id=player_id)
-        .values('event_type')
-        .annotate(count=Count('id'))
-    )
+@replica_reads
+async def player_stats(request, player_id):
+    stats = Event.objects.filter(player_id=player_id).order_by().values('event_type').annotate(count=Count('id'))
     return Response({
         "player_id": player_id,
-        "event_counts": stats
+        "event_counts": [row async for row in stats]
     })
 
 @api_view(['GET'])
-def team_stats(request, team_id):
-    stats = (
-        Event.objects.filter(team_id=team_id)
-        .values('event_type')
-        .annotate(count=Count('id'))
-    )
+@replica_reads
+async def team_stats(request, team_id):
+    stats = Event.objects.filter(team_id=team_id).order_by().values('event_type').annotate(count=Count('id'))
     return Response({
         "team_id": team_id,
-        "event_counts": stats
+        "event_counts": [row async for row in stats]
     })
 
 @api_view(['GET'])
-def match_summary(request, match_id):
-    try:
-        match = Match.objects.get(pk=match_id)
-    except Match.DoesNotExist:
+@replica_reads
+async def match_summary(request, match_id):
+    data = await match_analytics.amatch_summary(match_id)
+    if data is None:
         return Response({'error': 'Match not found'}, status=404)
-
-    events = Event.objects.filter(match=match)
-
-    # Per team breakdown
-    team_stats = (
-        events.values('team__name', 'event_type')
-        .annotate(count=Count('id'))
-    )
-
-    # Top players by involvement
-    top_players = (
-        events.values('player__full_name')
-        .annotate(total=Count('id'))
-        .order_by('-total')[:5]
-    )
-
-    return Response({
-        'match_id': match_id,
-        'home_team': match.home_team.name,
-        'away_team': match.away_team.name,
-        'team_stats': team_stats,
-        'top_players': top_players
-    })
+    return Response(data)
 
 @api_view(['GET'])
-def match_heatmap(request, match_id):
+@replica_reads
+async def match_heatmap(request, match_id):
     team_id = request.query_params.get('team')
     player_id = request.query_params.get('player')
-
-    filters = {'match_id': match_id}
-    if team_id:
-        filters['team_id'] = team_id
-    if player_id:
-        filters['player_id'] = player_id
-
-    coords = Event.objects.filter(**filters).values(
-        'x_coord',
-        'y_coord',
-        'event_type',
-        'timestamp',
-        'location_zone',
-        'description',
-        'player_id'
-    )
-
-    return Response({
-        'match_id': match_id,
-        'points': list(coords)
-    })
+    region = request.query_params.get('region')
+    if region and region not in spatial.REGIONS:
+        return Response({"error": f"region must be one of {', '.join(spatial.REGIONS)}"}, status=400)
+    return Response(await match_analytics.amatch_heatmap(match_id, team_id, player_id, region))
 
 @api_view(['GET'])
-def player_advanced_stats(request, player_id):
-    events = Event.objects.filter(player_id=player_id)
-
-    total = events.count()
-    stats = events.values('event_type').annotate(count=Count('id'))
-
-    tackles = events.filter(event_type='tackle').count()
-    missed = events.filter(event_type='missed_tackle').count()
-    try_assists = events.filter(event_type='try_assist').count()
-    carries = events.filter(event_type='carry').count()
-    passes = events.filter(event_type='pass').count()
+@replica_reads
+async def player_advanced_stats(request, player_id):
+    events = Event.objects.filter(player_id=player_id).order_by()
+
+    counts = await events.aaggregate(
+        total=Count('id'),
+        tackles=Count('id', filter=Q(event_type='tackle')),
+        missed=Count('id', filter=Q(event_type='missed_tackle')),
+        try_assists=Count('id', filter=Q(event_type='try_assist')),
+        carries=Count('id', filter=Q(event_type='carry')),
+        passes=Count('id', filter=Q(event_type='pass')),
+    )
+    stats = [row async for row in events.values('event_type').annotate(count=Count('id'))]
+    tackles, missed = counts['tackles'], counts['missed']
 
     return Response({
         "player_id": player_id,
-        "total_events": total,
+        "total_events": counts['total'],
         "tackles": tackles,
         "missed_tackles": missed,
-        "tackle_success_rate": f"{round((tackles / (tackles + missed) * 100), 1) if (tackles + missed) > 0 else 'N/A'}%",
-        "passes": passes,
-        "carries": carries,
-        "try_assists": try_assists,
-        "event_breakdown": list(stats),
+        "tackle_success_rate": match_analytics.success_rate(tackles, missed),
+        "passes": counts['passes'],
+        "carries": counts['carries'],
+        "try_assists": counts['try_assists'],
+        "event_breakdown": stats,
     })
 
-from matches.models import Match
-
 @api_view(['GET'])
-def team_trend_stats(request, team_id):
-    matches = Match.objects.filter(
-        home_team_id=team_id
-    ) | Match.objects.filter(
-        away_team_id=team_id
-    )
-
-    trend = []
-
-    for match in matches:
-        events = Event.objects.filter(match=match, team_id=team_id)
-        tackles = events.filter(event_type='tackle').count()
-        missed = events.filter(event_type='missed_tackle').count()
-        tries = events.filter(event_type='try').count()
-        passes = events.filter(event_type='pass').count()
-        penalties = events.filter(event_type='penalty').count()
-
-        opponent = match.away_team if match.home_team_id == team_id else match.home_team
-
-        trend.append({
-            "match_id": match.id,
-            "date": match.date,
-            "opponent": opponent.name,
-            "tackles": tackles,
-            "missed_tackles": missed,
-            "success_rate": f"{round((tackles / (tackles + missed) * 100), 1) if (tackles + missed) > 0 else 'N/A'}%",
-            "tries": tries,
-            "passes": passes,
-            "penalties": penalties
-        })
-
-    return Response({
-        "team_id": team_id,
-        "trend": trend
-    })
+@replica_reads
+async def team_trend_stats(request, team_id):
+    rollups = await match_analytics.ateam_rollups(team_id)
+    return Response(match_analytics.team_trend_data(team_id, rollups))
 
 @api_view(['GET'])
-def team_tactical_suggestions(request, team_id):
-    suggestions = []
+@replica_reads
+async def team_form(request, team_id):
+    if not await Team.objects.filter(pk=team_id).aexists():
+        return Response({"error": "Team not found"}, status=404)
+    return Response(await sync_to_async(form.team_form_data)(team_id))
 
-    matches = Match.objects.filter(
-        home_team_id=team_id
-    ) | Match.objects.filter(
-        away_team_id=team_id
-    )
+@api_view(['GET'])
+@replica_reads
+async def team_tactical_suggestions(request, team_id):
+    season = request.query_params.get('season')
+    if season is not None and not season.isdigit():
+        return Response({"error": "season must be a year"}, status=400)
+    rollups = await match_analytics.ateam_rollups(team_id)
+    project_id = await Team.objects.filter(pk=team_id).values_list('project_id', flat=True).afirst()
+    rules = await match_analytics.aproject_rules(project_id) if project_id else tactical_rules.DEFAULT_RULES
+    return Response(match_analytics.team_suggestions_data(team_id, rollups, rules, int(season) if season else None))
 
-    for match in matches:
-        events = Event.objects.filter(match=match, team_id=team_id)
-        tackles = events.filter(event_type='tackle').count()
-        missed = events.filter(event_type='missed_tackle').count()
-        passes = events.filter(event_type='pass').count()
-        carries = events.filter(event_type='carry').count()
-        penalties = events.filter(event_type='penalty').count()
-
-        match_suggestions = []
-
-        # Rule 1
-        if missed > 5:
-            match_suggestions.append("Too many missed tackles — improve defensive positioning.")
-
-        # Rule 2
-        if tackles + missed > 0:
-            success_rate = tackles / (tackles + missed)
-            if success_rate < 0.6:
-                match_suggestions.append("Tackle success rate below 60% — focus on contact drills.")
-
-        # Rule 3
-        if penalties > 3:
-            match_suggestions.append("High number of penalties — work on discipline in breakdown.")
-
-        # Rule 4
-        if carries > 0 and passes / carries < 0.8:
-            match_suggestions.append("Low pass-to-carry ratio — consider better ball movement.")
-
-        if match_suggestions:
-            suggestions.append({
-                "match_id": match.id,
-                "opponent": match.away_team.name if match.home_team_id == team_id else match.home_team.name,
-                "date": match.date,
-                "recommendations": match_suggestions
-            })
+@api_view(['GET'])
+@replica_reads
+async def project_team_comparison(request, project_id):
+    season = request.query_params.get('season')
+    if season is not None and not season.isdigit():
+        return Response({"error": "season must be a year"}, status=400)
+    data = await match_analytics.aproject_comparison(project_id, int(season) if season else None)
+    if data is None:
+        return Response({"error": "Project not found or has no teams"}, status=404)
+    return Response(data)
 
-    return Response({
-        "team_id": team_id,
-        "tactical_suggestions": suggestions
-    })
+@api_view(['GET'])
+@replica_reads
+async def project_region_counts(request, project_id):
+    season = request.query_params.get('season')
+    if season is not None and not season.isdigit():
+        return Response({"error": "season must be a year"}, status=400)
+    event_type = request.query_params.get('event_type')
+    if event_type and event_type not in event_types.CODES:
+        return Response({"error": f"Unknown event type {event_type!r}"}, status=400)
+    region = request.query_params.get('region')
+    if region and region not in spatial.REGIONS:
+        return Response({"error": f"region must be one of {', '.join(spatial.REGIONS)}"}, status=400)
+    return Response(await match_analytics.aproject_region_counts(
+        project_id, int(season) if season else None, event_type or None, region or None))
 
 @api_view(['GET'])
-def export_match_events(request, match_id):
-    from events.models import Event
-    from matches.models import Match
+@replica_reads
+async def project_tactical_report(request, project_id):
+    season = request.query_params.get('season')
+    if season is not None and not season.isdigit():
+        return Response({"error": "season must be a year"}, status=400)
+    data = await match_analytics.aproject_tactical_report(project_id, int(season) if season else None)
+    if data is None:
+        return Response({"error": "Project not found or has no teams"}, status=404)
+    return Response(data)
 
+@api_view(['GET'])
+@replica_reads
+async def export_match_events(request, match_id):
     try:
-        match = Match.objects.get(id=match_id)
+        match = await Match.objects.select_related('home_team', 'away_team').aget(id=match_id)
     except Match.DoesNotExist:
         return Response({"error": "Match not found"}, status=404)
 
-    events = Event.objects.filter(match=match).values(
+    events = Event.objects.for_match(match).values(
         'event_type',
         'timestamp',
         'x_coord',
@@ -230,22 +177,246 @@ def export_match_events(request, match_id):
         "home_team": match.home_team.name,
         "away_team": match.away_team.name,
         "date": match.date,
-        "events": list(events)
+        "events": [row async for row in events]
+    })
+
+@api_view(['GET'])
+@replica_reads
+async def match_possessions(request, match_id):
+    if not await Match.objects.filter(id=match_id).aexists():
+        return Response({"error": "Match not found"}, status=404)
+
+    possessions = Possession.objects.filter(match_id=match_id).values(
+        'sequence', 'team_id', 'start_time', 'end_time', 'event_count', 'phases',
+        'start_x', 'end_x', 'territory', 'outcome',
+    )
+    teams = Possession.objects.filter(match_id=match_id).order_by().values('team_id').annotate(
+        possessions=Count('id'),
+        events=Sum('event_count'),
+        territory_gained=Sum('territory'),
+        avg_territory=Avg('territory'),
+        avg_phases=Avg('phases'),
+        tries=Count('id', filter=Q(outcome=Possession.TRY)),
+        turnovers=Count('id', filter=Q(outcome=Possession.TURNOVER)),
+    )
+
+    return Response({
+        "match_id": match_id,
+        "teams": [row async for row in teams],
+        "possessions": [row async for row in possessions],
     })
 
+@api_view(['GET'])
+@replica_reads
+async def match_expected_try(request, match_id):
+    if not await Match.objects.filter(id=match_id).aexists():
+        return Response({"error": "Match not found"}, status=404)
+    try:
+        return Response(await sync_to_async(expected_try.match_value_data)(match_id))
+    except artifacts.ArtifactError as e:
+        return Response({"error": f"Expected-try model not trained: {e}"}, status=503)
+
+@api_view(['GET'])
+@replica_reads
+async def player_expected_try(request, player_id):
+    season = request.query_params.get('season')
+    if season is not None and not season.isdigit():
+        return Response({"error": "season must be a year"}, status=400)
+    if not await Player.objects.filter(pk=player_id).aexists():
+        return Response({"error": "Player not found"}, status=404)
+    try:
+        return Response(await sync_to_async(expected_try.player_value_data)(player_id, int(season) if season else None))
+    except artifacts.ArtifactError as e:
+        return Response({"error": f"Expected-try model not trained: {e}"}, status=503)
+
+async def _rugbypy_id(player_id):
+    """(rugbypy id, error response) of a player, for the profile-model endpoints."""
+    rugbypy_id = await Player.objects.filter(pk=player_id).values_list('rugbypy_id', flat=True).afirst()
+    if rugbypy_id is None:
+        return None, Response({"error": "Player not found"}, status=404)
+    if not rugbypy_id:
+        return None, Response({"error": "Player has no rugbypy id"}, status=404)
+    return rugbypy_id, None
+
+async def _with_players(rugbypy_ids):
+    """Our player id and name for each rugbypy id we know."""
+    rows = Player.objects.filter(rugbypy_id__in=rugbypy_ids).values('rugbypy_id', 'id', 'full_name')
+    return {row['rugbypy_id']: {'player_id': row['id'], 'full_name': row['full_name']} async for row in rows}
+
+@api_view(['GET'])
+@replica_reads
+async def player_similar(request, player_id):
+    k = request.query_params.get('k', str(player_similarity.DEFAULT_K))
+    if not k.isdigit() or not 1 <= int(k) <= player_similarity.MAX_K:
+        return Response({"error": f"k must be between 1 and {player_similarity.MAX_K}"}, status=400)
+    rugbypy_id, error = await _rugbypy_id(player_id)
+    if error:
+        return error
+    try:
+        data = await sync_to_async(player_similarity.similar_players)(rugbypy_id, int(k))
+    except artifacts.ArtifactError as e:
+        return Response({"error": f"Player profile model has no similarity index: {e}"}, status=503)
+    if data is None:
+        return Response({"error": "Player is not in the profile model"}, status=404)
+    known = await _with_players([row['rugbypy_id'] for row in data['similar']])
+    data['player_id'] = player_id
+    data['similar'] = [{**row, **known.get(row['rugbypy_id'], {'player_id': None})} for row in data['similar']]
+    return Response(data)
+
+@api_view(['GET'])
+@replica_reads
+async def player_compare(request, player_id, other_id):
+    ids = []
+    for pk in (player_id, other_id):
+        rugbypy_id, error = await _rugbypy_id(pk)
+        if error:
+            return error
+        ids.append(rugbypy_id)
+    try:
+        data = await sync_to_async(player_similarity.compare_players)(*ids)
+    except artifacts.ArtifactError as e:
+        return Response({"error": f"Player profile model has no similarity index: {e}"}, status=503)
+    if data is None:
+        return Response({"error": "Player is not in the profile model"}, status=404)
+    return Response({'player_ids': [player_id, other_id], **data})
+
+def wants_async(request):
+    return request.query_params.get('async', '').lower() in ('1', 'true', 'yes')
+
+def job_response(job):
+    return Response(jobs.job_payload(job), status=202, headers={'Location': f"/api/jobs/{job.pk}/"})
+
+def queue_job(request, kind, params):
+    # Only the submitter can fetch a job's result, so background runs need a signed-in user
+    if not request.user.is_authenticated:
+        raise NotAuthenticated("Sign in to run this in the background")
+    return job_response(jobs.submit(kind, params, request.user))
+
 @api_view(['POST'])
 def predict_outcome(request):
-    required = ['tackles', 'missed_tackles', 'passes', 'tries', 'penalties']
-    for r in required:
-        if r not in request.data:
-            return Response({"error": f"{r} is required"}, status=400)
+    try:
+        params = jobs.predict_outcome_params(request.data)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
 
-    prediction = predict_match_outcome(request.data)
+    if wants_async(request):
+        return queue_job(request, 'predict_outcome', params)
+
+    features = {k: v for k, v in params.items() if k not in ('home_team', 'away_team')}
+    with timed('inference'):
+        prediction = predict_match_outcome(features, params.get('home_team', ''), params.get('away_team', ''))
     return Response(prediction)
 
 @api_view(['GET'])
+@replica_reads
 def player_ml_profile(request, player_id):
-    data = deep_rf_analysis(player_id)
+    params = jobs.player_ml_profile_params({'player_id': player_id})
+    if wants_async(request):
+        return queue_job(request, 'player_ml_profile', params)
+
+    with timed('inference'):
+        data = deep_rf_analysis(params['player_id'])
     return Response(data)
 
+@api_view(['GET'])
+@replica_reads
+def match_prediction(request, match_id):
+    """Pre-match prediction from both teams' rolling averages over their matches before this one."""
+    match = Match.objects.filter(pk=match_id).select_related('home_team', 'away_team').first()
+    if match is None:
+        return Response({"error": "Match not found"}, status=404)
+    fixture = {'home_team_id': match.home_team_id, 'away_team_id': match.away_team_id,
+               'home_team': match.home_team.name, 'away_team': match.away_team.name}
+    (features, _, _), = feature_store.fixture_rows([fixture], before=match.date)
+    try:
+        with timed('inference'):
+            (p_home,), (home_score,), (away_score,) = predict_fixtures([(features, match.home_team.name, match.away_team.name)])
+    except (artifacts.ArtifactError, FileNotFoundError) as e:
+        return Response({"error": f"Match outcome model unavailable: {e}"}, status=503)
+    return Response({
+        "match_id": match_id,
+        "model_version": artifacts.current_version(OUTCOME_ARTIFACTS),
+        "window": feature_store.WINDOW,
+        "home_win_probability": round(float(p_home), 4),
+        "predicted_scores": {
+            "home_team": match.home_team.name,
+            "home_score": round(float(home_score)),
+            "away_team": match.away_team.name,
+            "away_score": round(float(away_score)),
+        },
+        "features": features,
+    })
+
+@api_view(['GET'])
+@replica_reads
+def project_season_simulation(request, project_id):
+    # e.g. ?simulations=20000&season=2025&as_of=2025-04-01&score_sd=7&playoffs=6
+    if not Project.objects.filter(pk=project_id).exists():
+        return Response({"error": "Project not found"}, status=404)
+    params = request.query_params
+    try:
+        options = {
+            'simulations': int(params.get('simulations', season_simulator.DEFAULT_SIMULATIONS)),
+            'season': int(params['season']) if params.get('season') else None,
+            'as_of': params.get('as_of') or None,
+            'score_sd': float(params.get('score_sd', season_simulator.DEFAULT_SCORE_SD)),
+            'playoff_spots': int(params.get('playoffs', season_simulator.DEFAULT_PLAYOFF_SPOTS)),
+            'seed': int(params['seed']) if params.get('seed') else None,
+        }
+        as_of = datetime.date.fromisoformat(options['as_of']) if options['as_of'] else None
+        season_simulator.check_options(options['simulations'], options['score_sd'], options['playoff_spots'])
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    if wants_async(request):
+        return queue_job(request, 'simulate_season', {'project_id': project_id, **options})
 
+    try:
+        with timed('inference'):
+            result = season_simulator.simulate_season(project_id, **dict(options, as_of=as_of))
+    except (artifacts.ArtifactError, FileNotFoundError) as e:
+        return Response({"error": f"Match outcome model unavailable: {e}"}, status=503)
+    if 'error' in result:
+        return Response(result, status=400)
+    return Response(result)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def submit_job(request):
+    kind = request.data.get('kind')
+    if kind not in jobs.PUBLIC_JOB_KINDS:
+        return Response({"error": f"kind must be one of {', '.join(jobs.PUBLIC_JOB_KINDS)}"}, status=400)
+    params = request.data.get('params', {})
+    if not isinstance(params, dict):
+        return Response({"error": "params must be an object"}, status=400)
+    try:
+        params = jobs.PUBLIC_JOB_KINDS[kind](params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return job_response(jobs.submit(kind, params, request.user))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_status(request, job_id):
+    job = AnalyticsJob.objects.filter(pk=job_id).first()
+    # Users see the jobs they submitted; the ones the app queued itself (no owner) are for staff
+    visible = job is not None and (
+        job.created_by_id == request.user.pk if job.created_by_id else request.user.is_staff)
+    if not visible:
+        return Response({'error': 'Job not found'}, status=404)
+    return Response(jobs.job_payload(job))
+
+
+class TacticalRuleViewSet(viewsets.ModelViewSet):
+    """A project's tactical suggestion rules; ``?project=<id>`` lists one project's."""
+    serializer_class = TacticalRuleSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        rules = TacticalRule.objects.all()
+        project = self.request.query_params.get('project')
+        if not project:
+            return rules
+        if not project.isdigit():
+            raise ValidationError({'project': "project must be a project id"})
+        return rules.filter(project_id=int(project))
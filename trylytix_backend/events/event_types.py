@@ -0,0 +1,94 @@
+"""
+The rugby event-type vocabulary, shared by storage, the API and the ML encoders.
+
+``Event.event_type`` is stored as a small integer code: the 1-based position of the
+type in ``EVENT_TYPES``. Code 0 is reserved for padding and unknown types, which is
+also what the try-pattern sequence models expect, so stored codes feed the encoders
+as they are. The order is part of the stored data and of trained models: only ever
+append new types.
+"""
+import numpy as np
+
+EVENT_TYPES = [
+    ("try", "Try"),
+    ("kick", "Kick"),
+    ("penalty", "Penalty"),
+    ("kickoff", "Kick-off"),
+    ("pass", "Pass"),
+    ("carry", "Carry"),
+    ("run", "Run"),
+    ("tackle", "Tackle"),
+    ("missed_tackle", "Missed Tackle"),
+    ("ruck", "Ruck"),
+    ("maul", "Maul"),
+    ("lineout", "Lineout"),
+    ("lineout_win", "Lineout Win"),
+    ("lineout_loss", "Lineout Loss"),
+    ("scrum", "Scrum"),
+    ("scrum_win", "Scrum Win"),
+    ("scrum_loss", "Scrum Loss"),
+    ("kick_return", "Kick Return"),
+    ("box_kick", "Box Kick"),
+    ("grubber_kick", "Grubber Kick"),
+    ("free_kick", "Free Kick"),
+    ("drop_goal", "Drop Goal"),
+    ("conversion", "Conversion"),
+    ("conversion_missed", "Conversion Missed"),
+    ("penalty_goal", "Penalty Goal"),
+    ("penalty_missed", "Penalty Missed"),
+    ("turnover", "Turnover"),
+    ("knock_on", "Knock-on"),
+    ("forward_pass", "Forward Pass"),
+    ("interception", "Interception"),
+    ("high_tackle", "High Tackle"),
+    ("offside", "Offside"),
+    ("not_releasing", "Not Releasing"),
+    ("holding_on", "Holding On"),
+    ("in_touch", "Ball in Touch"),
+    ("restart", "Restart"),
+    ("injury", "Injury"),
+    ("yellow_card", "Yellow Card"),
+    ("red_card", "Red Card"),
+    ("sin_bin", "Sin Bin"),
+    ("substitution", "Substitution"),
+    ("try_assist", "Try Assist"),
+    ("line_break", "Line Break"),
+    ("defensive_line_break", "Defensive Line Break"),
+    ("advantage", "Advantage"),
+    ("offload", "Offload"),
+    ("foul_play", "Foul Play"),
+    ("referee_call", "Referee Call"),
+    ("timeout", "Timeout"),
+    ("restart_22", "22m Restart"),
+]
+NAMES = [name for name, _ in EVENT_TYPES]
+CODES = {name: code for code, name in enumerate(NAMES, start=1)}
+UNKNOWN = 0
+UNKNOWN_NAME = 'unknown'
+VOCAB_SIZE = len(NAMES) + 1  # codes 0..len(NAMES)
+
+TRY = CODES['try']
+# Made by the side without the ball
+DEFENSIVE = {'tackle', 'missed_tackle', 'high_tackle', 'interception', 'defensive_line_break', 'offside',
+             'not_releasing', 'holding_on'}
+
+_NAMES_BY_CODE = np.array([UNKNOWN_NAME] + NAMES, dtype=object)
+
+
+def code(name):
+    """The code of ``name``; raises KeyError for types not in the vocabulary."""
+    return CODES[name]
+
+
+def name(code):
+    return _NAMES_BY_CODE[code] if 0 <= code < VOCAB_SIZE else UNKNOWN_NAME
+
+
+def encode(names):
+    """Codes (int16 array) for a sequence of names, 0 for unknown ones."""
+    return np.fromiter((CODES.get(n, UNKNOWN) for n in names), dtype=np.int16)
+
+
+def decode(codes):
+    """Names (object array) for an array of codes."""
+    return _NAMES_BY_CODE[np.asarray(codes, dtype=np.intp)]
@@ -0,0 +1,49 @@
+from django.core import exceptions
+from django.db import models
+from django.utils.functional import cached_property
+
+from events import event_types
+
+
+class EventTypeField(models.SmallIntegerField):
+    """
+    Event type names in Python, ``event_types`` codes in the database.
+
+    Filters, ``values()`` and model instances all use names (``filter(event_type='tackle')``);
+    only the column holds the 2-byte code. Integer codes are accepted wherever a name is.
+    """
+    description = "Rugby event type stored as a small integer"
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('choices', event_types.EVENT_TYPES)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get('choices') == event_types.EVENT_TYPES:
+            del kwargs['choices']
+        return name, path, args, kwargs
+
+    @cached_property
+    def validators(self):
+        # Without SmallIntegerField's range validators, which would compare names with numbers
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else event_types.name(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        try:
+            return event_types.name(int(value))
+        except (TypeError, ValueError):
+            raise exceptions.ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return event_types.code(str(value))
+        except KeyError:
+            raise ValueError(f"Field '{self.name}' expected an event type, got {value!r}") from None
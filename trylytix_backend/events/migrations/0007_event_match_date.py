@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:02
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_match_dates(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Match = apps.get_model('matches', 'Match')
+    Event.objects.update(match_date=Subquery(Match.objects.filter(pk=OuterRef('match_id')).values('date')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_alter_event_options_event_phase_and_more'),
+        ('matches', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='match_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(copy_match_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='event',
+            name='match_date',
+            field=models.DateField(editable=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:05
+
+from django.db import migrations
+
+from events.partitioning import partition_events_table, unpartition_events_table
+
+
+def partition(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        partition_events_table(schema_editor.connection)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        unpartition_events_table(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_event_match_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
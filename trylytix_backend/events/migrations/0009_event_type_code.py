@@ -0,0 +1,59 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:10
+
+import events.fields
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+from events import event_types
+
+
+def encode_event_types(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    # One pass over the table; types outside the vocabulary become 0 (unknown)
+    Event.objects.update(event_type_code=Case(
+        *[When(event_type=name, then=Value(code)) for name, code in event_types.CODES.items()],
+        default=Value(event_types.UNKNOWN),
+    ))
+
+
+def decode_event_types(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Event.objects.update(event_type=Case(
+        *[When(event_type_code=code, then=Value(name)) for name, code in event_types.CODES.items()],
+        default=Value(event_types.UNKNOWN_NAME),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_partition_event_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='event_type_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='event_type',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.RunPython(encode_event_types, decode_event_types),
+        migrations.RemoveField(
+            model_name='event',
+            name='event_type',
+        ),
+        migrations.RenameField(
+            model_name='event',
+            old_name='event_type_code',
+            new_name='event_type',
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='event_type',
+            field=events.fields.EventTypeField(),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:03
+
+from django.db import migrations, models
+
+from events import spatial
+
+
+def locate_events(apps, schema_editor):
+    # Every match so far has coordinates facing the acting team's attack, so nothing needs turning round
+    Event = apps.get_model('events', 'Event')
+    Event.objects.update(grid_cell=spatial.grid_cell_expression(), zone=spatial.zone_expression())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_event_type_code'),
+        ('matches', '0002_match_coordinates'),
+        ('teams', '0004_player_rugbypy_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='grid_cell',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='zone',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(locate_events, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['zone', 'event_type'], name='event_zone_type'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['grid_cell', 'event_type'], name='event_cell_type'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_event_grid_cell_zone'),
+        ('matches', '0002_match_coordinates'),
+        ('teams', '0004_player_rugbypy_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['updated_at'], name='event_updated_at'),
+        ),
+    ]
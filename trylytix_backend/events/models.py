@@ -1,65 +1,40 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, F
+from events import event_types, spatial
+from events.fields import EventTypeField
 from matches.models import Match
 from teams.models import Player, Team
 
+
+class EventQuerySet(models.QuerySet):
+    # Filtering on match_date as well lets Postgres skip the other seasons' partitions
+
+    def for_match(self, match):
+        return self.filter(match_id=match.pk, match_date=match.date)
+
+    def in_season(self, year):
+        return self.filter(match_date__year=year)
+
+    def in_region(self, region):
+        """Events in a named pitch region of ``events.spatial.REGIONS``, e.g. 'opposition_22'."""
+        return self.filter(zone__in=spatial.REGIONS[region])
+
+    def in_cells(self, cells):
+        return self.filter(grid_cell__in=cells)
+
+
+def event_type_codes(field='event_type'):
+    """The stored integer codes rather than names, e.g. ``values(event_code=event_type_codes())``."""
+    return ExpressionWrapper(F(field), output_field=models.SmallIntegerField())
+
+
 class Event(models.Model):
-    EVENT_TYPES = [
-        ("try", "Try"),
-        ("kick", "Kick"),
-        ("penalty", "Penalty"),
-        ("kickoff", "Kick-off"),
-        ("pass", "Pass"),
-        ("carry", "Carry"),
-        ("run", "Run"),
-        ("tackle", "Tackle"),
-        ("missed_tackle", "Missed Tackle"),
-        ("ruck", "Ruck"),
-        ("maul", "Maul"),
-        ("lineout", "Lineout"),
-        ("lineout_win", "Lineout Win"),
-        ("lineout_loss", "Lineout Loss"),
-        ("scrum", "Scrum"),
-        ("scrum_win", "Scrum Win"),
-        ("scrum_loss", "Scrum Loss"),
-        ("kick_return", "Kick Return"),
-        ("box_kick", "Box Kick"),
-        ("grubber_kick", "Grubber Kick"),
-        ("free_kick", "Free Kick"),
-        ("drop_goal", "Drop Goal"),
-        ("conversion", "Conversion"),
-        ("conversion_missed", "Conversion Missed"),
-        ("penalty_goal", "Penalty Goal"),
-        ("penalty_missed", "Penalty Missed"),
-        ("turnover", "Turnover"),
-        ("knock_on", "Knock-on"),
-        ("forward_pass", "Forward Pass"),
-        ("interception", "Interception"),
-        ("high_tackle", "High Tackle"),
-        ("offside", "Offside"),
-        ("not_releasing", "Not Releasing"),
-        ("holding_on", "Holding On"),
-        ("in_touch", "Ball in Touch"),
-        ("restart", "Restart"),
-        ("injury", "Injury"),
-        ("yellow_card", "Yellow Card"),
-        ("red_card", "Red Card"),
-        ("sin_bin", "Sin Bin"),
-        ("substitution", "Substitution"),
-        ("try_assist", "Try Assist"),
-        ("line_break", "Line Break"),
-        ("defensive_line_break", "Defensive Line Break"),
-        ("advantage", "Advantage"),
-        ("offload", "Offload"),
-        ("foul_play", "Foul Play"),
-        ("referee_call", "Referee Call"),
-        ("timeout", "Timeout"),
-        ("restart_22", "22m Restart"),
-    ]
+    EVENT_TYPES = event_types.EVENT_TYPES
 
     match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='events')
     player = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True)
     team = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True)
-    event_type = models.CharField(max_length=50, choices=EVENT_TYPES)
+    event_type = EventTypeField()
     is_opponent_event = models.BooleanField(default=False)
     timestamp = models.DateTimeField(null=True, blank=True)
     x_coord = models.FloatField(null=True, blank=True, help_text="X coordinate, e.g., 0-100 along field length")
@@ -67,9 +42,28 @@ class Event(models.Model):
     location_zone = models.CharField(max_length=50, blank=True, help_text="Named zone, e.g., '22', 'left wing', etc.")
     phase = models.PositiveIntegerField(null=True, blank=True, help_text="Phase of play leading up to event")
     description = models.TextField(blank=True)
+    # Copy of match.date: on Postgres the table is partitioned by it (see events/partitioning.py)
+    match_date = models.DateField(editable=False)
+    # Where on the pitch, facing the team's attacking try line (see events/spatial.py)
+    grid_cell = models.SmallIntegerField(null=True, blank=True, editable=False)
+    zone = models.SmallIntegerField(null=True, blank=True, editable=False)
+    # Lets caches keyed on the events notice edits, not just inserts and deletes
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EventQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.event_type} by {self.player} at {self.timestamp}"
 
+    def save(self, *args, **kwargs):
+        self.match_date = self.match.date
+        spatial.assign([self], self.match.away_team_id if self.match.away_flipped() else None)
+        super().save(*args, **kwargs)
+
     class Meta:
-        ordering = ['timestamp']
\ No newline at end of file
+        ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['zone', 'event_type'], name='event_zone_type'),
+            models.Index(fields=['grid_cell', 'event_type'], name='event_cell_type'),
+            models.Index(fields=['updated_at'], name='event_updated_at'),
+        ]
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Postgres range partitioning of ``events_event`` by season (calendar year of ``match_date``).
+
+Each season lives in its own partition (``events_event_y2025``), plus a default partition
+for dates no season partition covers yet. Queries that filter on ``match_date``, e.g.
+``Event.objects.in_season(2025)`` or ``.for_match(match)``, only scan the matching
+partitions; a season's rows and indexes stay small as the table grows. Partitioning is
+invisible to the ORM: the primary key becomes ``(id, match_date)`` in the database, while
+``id`` stays unique through its sequence.
+
+Migration ``events.0008`` converts the table; ``manage.py create_event_partitions`` adds
+partitions for upcoming seasons. Other databases (SQLite in development) keep a plain table.
+"""
+import datetime
+
+TABLE = 'events_event'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def partition_name(year):
+    return f'{TABLE}_y{year}'
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partitions(connection):
+    """Names of the partitions of ``events_event``, with their row estimates."""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.relname, c.reltuples::bigint
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            ORDER BY c.relname
+        """, [TABLE])
+        return cursor.fetchall()
+
+
+def _season_bounds(year):
+    return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+
+
+def create_partition(connection, year):
+    """Create the partition for season ``year``, moving any of its rows out of the default partition.
+
+    Returns False if it already existed.
+    """
+    name = partition_name(year)
+    start, end = _season_bounds(year)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+        if cursor.fetchone()[0]:
+            return False
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE match_date >= %s AND match_date < %s)",
+                       [start, end])
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)", [start, end])
+            return True
+        # The default partition can't hold rows of a new partition's range: detach it while they move.
+        # Foreign key checks run immediately, as ALTER TABLE refuses pending (deferred) ones.
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)", [start, end])
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE match_date >= %s AND match_date < %s RETURNING *
+            )
+            INSERT INTO {TABLE} SELECT * FROM moved
+        """, [start, end])
+        cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+    return True
+
+
+def _constraints_and_indexes(cursor, table):
+    """DDL to recreate ``table``'s indexes and foreign keys (everything but the primary key)."""
+    cursor.execute("""
+        SELECT indexdef FROM pg_indexes
+        WHERE tablename = %s AND indexname NOT IN (
+            SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'
+        )
+    """, [table, table])
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype = 'f'
+    """, [table])
+    foreign_keys = cursor.fetchall()
+    return indexes, foreign_keys
+
+
+def _rebuild_table(connection, partition_by, years=()):
+    """Recreate ``events_event`` (partitioned or not) with the same columns, data, indexes and keys."""
+    old = f'{TABLE}_old'
+    with connection.cursor() as cursor:
+        indexes, foreign_keys = _constraints_and_indexes(cursor, TABLE)
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {old}")
+        cursor.execute(f"""
+            CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS)
+            {partition_by}
+        """)
+        if partition_by:
+            cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+        for year in years:
+            start, end = _season_bounds(year)
+            cursor.execute(f"CREATE TABLE {partition_name(year)} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)",
+                           [start, end])
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {old}")
+        cursor.execute(f"DROP TABLE {old}")
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f"SELECT setval(%s, COALESCE(MAX(id), 0) + 1, false) FROM {TABLE}", [sequence])
+        if sequence.split('.')[-1] != f'{TABLE}_id_seq':
+            cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {TABLE}_id_seq")
+        # A primary (or unique) key on a partitioned table has to include the partition key
+        primary_key = '(id, match_date)' if partition_by else '(id)'
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY {primary_key}")
+        for sql in indexes:
+            # Indexes of a partitioned table are listed as ON ONLY; recreated, they cascade to the partitions
+            cursor.execute(sql.replace(' ON ONLY ', ' ON '))
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+
+
+def partition_events_table(connection):
+    """Convert ``events_event`` into a table partitioned by season, one partition per season with matches."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT EXTRACT(YEAR FROM date)::int FROM matches_match ORDER BY 1")
+        years = [row[0] for row in cursor.fetchall()]
+    _rebuild_table(connection, 'PARTITION BY RANGE (match_date)', years)
+
+
+def unpartition_events_table(connection):
+    _rebuild_table(connection, '')
@@ -1,7 +1,20 @@
 from rest_framework import serializers
+from . import event_types
 from .models import Event
 
+
+class EventTypeChoiceField(serializers.ChoiceField):
+    """Event type by name, as before the integer storage; integer codes are accepted too."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, int) or (isinstance(data, str) and data.isdigit()):
+            data = event_types.name(int(data))
+        return super().to_internal_value(data)
+
+
 class EventSerializer(serializers.ModelSerializer):
+    event_type = EventTypeChoiceField(choices=event_types.EVENT_TYPES)
+
     class Meta:
         model = Event
         fields = '__all__'
@@ -0,0 +1,125 @@
+"""
+Pitch grid cells and zones for events.
+
+Coordinates are normalised so x runs 0-100 toward the acting team's attacking try line and
+y 0-100 across the pitch from its left. Matches recorded the other way (``Match.coordinates``
+is ``home``: everything toward the home team's attacking line) have their away team's
+events turned round. Each event then gets
+
+- ``grid_cell``: a cell of an ``X_CELLS`` x ``Y_CELLS`` grid, ``x_cell * Y_CELLS + y_cell``,
+- ``zone``: a length band (between the 22s and halfway) crossed with a channel (the wings
+  and the middle), ``band * len(CHANNELS) + channel``,
+
+both stored and indexed with the event, so region queries are plain integer filters
+(``Event.objects.in_region('opposition_22')``). The values are computed in NumPy when
+events are written and in SQL (``grid_cell_expression``, ``zone_expression``) when a
+whole table or match is updated; both round the same way.
+"""
+import numpy as np
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast, Floor, Greatest, Least, Now
+from django.db.models.lookups import GreaterThanOrEqual
+
+X_CELLS = 10
+Y_CELLS = 5
+# Length bands, by their lower bound on the normalised x
+BANDS = [('own_22', 0), ('own_half', 22), ('opposition_half', 50), ('opposition_22', 78)]
+# Channels across the pitch, by their lower bound on y
+CHANNELS = [('left', 0), ('middle', 20), ('right', 80)]
+
+ZONES = [f'{band}_{channel}' for band, _ in BANDS for channel, _ in CHANNELS]
+ZONE_IDS = {name: i for i, name in enumerate(ZONES)}
+# Named regions as the zones they cover: a band, a channel or a single zone
+REGIONS = {
+    **{band: [b * len(CHANNELS) + c for c in range(len(CHANNELS))] for b, (band, _) in enumerate(BANDS)},
+    **{channel: [b * len(CHANNELS) + c for b in range(len(BANDS))] for c, (channel, _) in enumerate(CHANNELS)},
+    'own_territory': [b * len(CHANNELS) + c for b in (0, 1) for c in range(len(CHANNELS))],
+    'opposition_territory': [b * len(CHANNELS) + c for b in (2, 3) for c in range(len(CHANNELS))],
+    **{name: [i] for name, i in ZONE_IDS.items()},
+}
+
+
+def normalize(x, y, flip):
+    """Coordinates toward the acting team's try line; ``flip`` marks events recorded the other way."""
+    x, y, flip = (np.asarray(a, dtype=float) for a in (x, y, flip))
+    return np.where(flip, 100 - x, x), np.where(flip, 100 - y, y)
+
+
+def locate(x, y):
+    """Grid cells and zones (int arrays, -1 where a coordinate is missing) of normalised coordinates."""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    missing = np.isnan(x) | np.isnan(y)
+    x, y = np.nan_to_num(x), np.nan_to_num(y)
+    x_cell = np.clip(np.floor(x / (100 / X_CELLS)), 0, X_CELLS - 1)
+    y_cell = np.clip(np.floor(y / (100 / Y_CELLS)), 0, Y_CELLS - 1)
+    band = sum((x >= bound).astype(int) for _, bound in BANDS[1:])
+    channel = sum((y >= bound).astype(int) for _, bound in CHANNELS[1:])
+    cells = np.where(missing, -1, x_cell * Y_CELLS + y_cell).astype(int)
+    zones = np.where(missing, -1, band * len(CHANNELS) + channel).astype(int)
+    return cells, zones
+
+
+def _coordinate(value):
+    return np.nan if value is None or value == '' else float(value)
+
+
+def assign(events, flip_team_id=None):
+    """Set ``grid_cell`` and ``zone`` on Event instances; ``flip_team_id``'s events are turned round."""
+    if not events:
+        return
+    x = [_coordinate(e.x_coord) for e in events]
+    y = [_coordinate(e.y_coord) for e in events]
+    flip = [flip_team_id is not None and str(e.team_id) == str(flip_team_id) for e in events]
+    cells, zones = locate(*normalize(x, y, flip))
+    for event, cell, zone in zip(events, cells.tolist(), zones.tolist()):
+        event.grid_cell = None if cell < 0 else cell
+        event.zone = None if zone < 0 else zone
+
+
+def _normalized(flip):
+    x, y = Cast(F('x_coord'), FloatField()), Cast(F('y_coord'), FloatField())
+    if flip:
+        return Value(100.0) - x, Value(100.0) - y
+    return x, y
+
+
+def _cell(value, cells):
+    return Least(Greatest(Cast(Floor(value / Value(100 / cells)), IntegerField()), Value(0)), Value(cells - 1))
+
+
+def _steps(value, bounds):
+    """How many of ``bounds`` the value is at or above."""
+    return sum(Case(When(GreaterThanOrEqual(value, Value(float(bound))), then=Value(1)), default=Value(0))
+               for bound in bounds)
+
+
+def _spatial_case(value):
+    return Case(
+        When(x_coord__isnull=True, then=Value(None)),
+        When(y_coord__isnull=True, then=Value(None)),
+        default=value,
+        output_field=IntegerField(),
+    )
+
+
+def grid_cell_expression(flip=False):
+    """SQL for ``grid_cell`` from an event's coordinates (NULL where one is missing)."""
+    x, y = _normalized(flip)
+    return _spatial_case(_cell(x, X_CELLS) * Value(Y_CELLS) + _cell(y, Y_CELLS))
+
+
+def zone_expression(flip=False):
+    """SQL for ``zone`` from an event's coordinates (NULL where one is missing)."""
+    x, y = _normalized(flip)
+    band = _steps(x, [bound for _, bound in BANDS[1:]])
+    channel = _steps(y, [bound for _, bound in CHANNELS[1:]])
+    return _spatial_case(band * Value(len(CHANNELS)) + channel)
+
+
+def relocate_match_events(match):
+    """Recompute ``grid_cell`` and ``zone`` of a match's events, e.g. after its ``coordinates`` changed."""
+    # update() skips auto_now; the try pipeline's fingerprint reads updated_at
+    match.events.update(grid_cell=grid_cell_expression(), zone=zone_expression(), updated_at=Now())
+    if match.away_flipped():
+        match.events.filter(team_id=match.away_team_id).update(
+            grid_cell=grid_cell_expression(flip=True), zone=zone_expression(flip=True), updated_at=Now())
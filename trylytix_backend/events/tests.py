@@ -1,3 +1,147 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from events import event_types, spatial
+from events.fields import EventTypeField
+from events.models import Event, event_type_codes
+from matches.models import Match
+from projects.models import Project
+from teams.models import Team
+
+
+def create_match(date=datetime.date(2025, 3, 1), **fields):
+    project = Project.objects.create(name='League')
+    home = Team.objects.create(name='Home', project=project)
+    away = Team.objects.create(name='Away', project=project)
+    return Match.objects.create(project=project, home_team=home, away_team=away, date=date, **fields)
+
+
+class EventTypeFieldTests(SimpleTestCase):
+    field = Event._meta.get_field('event_type')
+
+    def test_prep_value(self):
+        self.assertEqual(self.field.get_prep_value('tackle'), event_types.CODES['tackle'])
+        self.assertEqual(self.field.get_prep_value(event_types.TRY), event_types.TRY)
+        self.assertIsNone(self.field.get_prep_value(None))
+
+    def test_from_db_value(self):
+        for name, code in event_types.CODES.items():
+            self.assertEqual(self.field.from_db_value(code, None, connection), name)
+            self.assertEqual(self.field.from_db_value(self.field.get_prep_value(name), None, connection), name)
+        self.assertEqual(self.field.from_db_value(event_types.UNKNOWN, None, connection), event_types.UNKNOWN_NAME)
+        self.assertIsNone(self.field.from_db_value(None, None, connection))
+
+    def test_unknown_name(self):
+        with self.assertRaisesMessage(ValueError, "expected an event type, got 'haka'"):
+            self.field.get_prep_value('haka')
+        with self.assertRaises(ValueError):
+            Event.objects.filter(event_type='haka')
+
+    def test_deconstruct_omits_vocabulary(self):
+        _, path, _, kwargs = EventTypeField().deconstruct()
+        self.assertEqual(path, 'events.fields.EventTypeField')
+        self.assertNotIn('choices', kwargs)
+
+
+class EventTypeStorageTests(TestCase):
+    def test_round_trip(self):
+        match = create_match()
+        event = Event.objects.create(match=match, team=match.home_team, event_type='line_break')
+        self.assertEqual(Event.objects.get(pk=event.pk).event_type, 'line_break')
+        self.assertEqual(Event.objects.values_list(event_type_codes(), flat=True).get(pk=event.pk),
+                         event_types.CODES['line_break'])
+        # Names and codes filter alike
+        self.assertTrue(Event.objects.filter(event_type='line_break').exists())
+        self.assertTrue(Event.objects.filter(event_type=event_types.CODES['line_break']).exists())
+        self.assertFalse(Event.objects.filter(event_type__in=['try', 'tackle']).exists())
+
+
+class EventTypeMigrationTests(TransactionTestCase):
+    before = [('events', '0008_partition_event_table')]
+    after = [('events', '0009_event_type_code')]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def applied_apps(self):
+        """Historical models as the database has them: each app at its last applied migration."""
+        self.executor.loader.build_graph()
+        applied = self.executor.loader.applied_migrations
+        nodes = [max(n for n in applied if n[0] == app) for app in {app for app, _ in applied}]
+        return self.executor.loader.project_state(nodes).apps
+
+    def test_names_to_codes(self):
+        apps = self.applied_apps()
+        project = apps.get_model('projects', 'Project').objects.create(name='League')
+        Team = apps.get_model('teams', 'Team')
+        home, away = (Team.objects.create(name=name, project=project) for name in ('Home', 'Away'))
+        match = apps.get_model('matches', 'Match').objects.create(
+            project=project, home_team=home, away_team=away, date=datetime.date(2025, 3, 1))
+        Event = apps.get_model('events', 'Event')
+        for event_type in ('try', 'restart_22', 'haka', ''):
+            Event.objects.create(match=match, event_type=event_type, match_date=match.date)
+
+        self.executor.migrate(self.after)
+        Event = self.applied_apps().get_model('events', 'Event')
+        self.assertEqual(
+            list(Event.objects.order_by('id').values_list(event_type_codes(), flat=True)),
+            [event_types.CODES['try'], event_types.CODES['restart_22'], event_types.UNKNOWN, event_types.UNKNOWN])
+        # Types outside the vocabulary read back as 'unknown'
+        self.assertEqual(list(Event.objects.order_by('id').values_list('event_type', flat=True)),
+                         ['try', 'restart_22', event_types.UNKNOWN_NAME, event_types.UNKNOWN_NAME])
+
+
+class SpatialTests(TestCase):
+    # Band and channel boundaries, either side of them, the pitch edges and out of play
+    XS = [0, 9.99, 10, 21.99, 22, 49.99, 50, 77.99, 78, 99.99, 100, 104.5, -3]
+    YS = [0, 19.99, 20, 50, 79.99, 80, 100, 101]
+
+    def test_locate(self):
+        cells, zones = spatial.locate([0, 100, 22, 50, 78, float('nan')], [0, 100, 20, 50, 80, 50])
+        self.assertEqual(cells.tolist(), [0, 49, 11, 27, 39, -1])
+        self.assertEqual(zones.tolist(), [0, 11, 4, 7, 11, -1])
+        self.assertEqual(spatial.ZONES[4], 'own_half_middle')
+
+    def test_numpy_and_sql_agree(self):
+        # Recorded toward the home team's try line, so the away team's events are turned round
+        match = create_match(coordinates=Match.HOME)
+        for team in (match.home_team, match.away_team):
+            Event.objects.bulk_create([
+                Event(match=match, team=team, event_type='carry', x_coord=x, y_coord=y, match_date=match.date)
+                for x in self.XS for y in self.YS
+            ] + [Event(match=match, team=team, event_type='carry', x_coord=None, y_coord=50, match_date=match.date)])
+        # bulk_create skips save(); fill in grid_cell and zone with the NumPy code
+        events = list(Event.objects.filter(match=match))
+        spatial.assign(events, match.away_team_id)
+        Event.objects.bulk_update(events, ['grid_cell', 'zone'])
+
+        for team, flip in ((match.home_team, False), (match.away_team, True)):
+            rows = Event.objects.filter(match=match, team=team).annotate(
+                sql_cell=spatial.grid_cell_expression(flip), sql_zone=spatial.zone_expression(flip)
+            ).values_list('x_coord', 'y_coord', 'grid_cell', 'sql_cell', 'zone', 'sql_zone')
+            for x, y, cell, sql_cell, zone, sql_zone in rows:
+                with self.subTest(x=x, y=y, flip=flip):
+                    self.assertEqual((cell, zone), (sql_cell, sql_zone))
+        self.assertEqual(Event.objects.filter(match=match, x_coord__isnull=True, grid_cell__isnull=True).count(), 2)
+
+    def test_relocate_when_coordinates_change(self):
+        match = create_match()
+        home = Event.objects.create(match=match, team=match.home_team, event_type='carry', x_coord=10, y_coord=10)
+        away = Event.objects.create(match=match, team=match.away_team, event_type='carry', x_coord=10, y_coord=10)
+        self.assertEqual((away.grid_cell, away.zone), (home.grid_cell, home.zone))
+
+        match.coordinates = Match.HOME
+        match.save()
+        home.refresh_from_db()
+        away.refresh_from_db()
+        self.assertEqual((home.grid_cell, home.zone), (5, spatial.ZONE_IDS['own_22_left']))
+        # The away team's (10, 10) is its (90, 90)
+        self.assertEqual((away.grid_cell, away.zone), (49, spatial.ZONE_IDS['opposition_22_right']))
@@ -1,41 +1,95 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.db import transaction
+from analytics import jobs
+from analytics.match_analytics import invalidate_match
+from matches.models import Match
+from . import event_types, spatial
 from .models import Event
 from .serializers import EventSerializer
 import csv
 import io
+import logging
+
+logger = logging.getLogger(__name__)
 
 class EventViewSet(viewsets.ModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
+    def get_queryset(self):
+        # e.g. ?event_type=line_break&region=opposition_22&season=2025
+        events = super().get_queryset()
+        params = self.request.query_params
+        for field in ('match', 'team', 'player'):
+            if params.get(field):
+                events = events.filter(**{f'{field}_id': params[field]})
+        if params.get('event_type'):
+            if params['event_type'] not in event_types.CODES:
+                raise ValidationError({'event_type': f"Unknown event type {params['event_type']!r}"})
+            events = events.filter(event_type=params['event_type'])
+        if params.get('region'):
+            if params['region'] not in spatial.REGIONS:
+                raise ValidationError({'region': f"Choose from {', '.join(spatial.REGIONS)}"})
+            events = events.in_region(params['region'])
+        if params.get('season'):
+            if not params['season'].isdigit():
+                raise ValidationError({'season': "season must be a year"})
+            events = events.in_season(int(params['season']))
+        return events
+
+    def perform_destroy(self, instance):
+        match_id, team_id = instance.match_id, instance.team_id
+        instance.delete()
+        invalidate_match(match_id, [team_id])
+        jobs.submit_once('update_possessions', {'match_id': match_id, 'rebuild': True})
+        jobs.submit_once('update_match_features', {'match_id': match_id, 'rebuild': True})
+        if team_id:
+            jobs.submit_once('update_team_form', {'team_id': team_id, 'match_id': match_id})
 
     @action(detail=False, methods=['post'], url_path='upload-csv')
     def upload_csv(self, request):
         file = request.FILES.get('file')
         match_id = request.data.get('match_id')
-        print(f"Received file: {file}, match_id: {match_id}")
+        logger.debug("Received file: %s, match_id: %s", file, match_id)
         if not file or not match_id:
             return Response({'error': 'file and match_id required'}, status=400)
 
+        # Events carry their match's date (the partition key) and pitch location; bulk_create bypasses Event.save()
+        match = Match.objects.filter(pk=match_id).first()
+        if match is None:
+            return Response({'error': 'Match not found'}, status=404)
+
         decoded = file.read().decode('utf-8')
-        reader = csv.DictReader(io.StringIO(decoded))
+        rows = list(csv.DictReader(io.StringIO(decoded)))
+        unknown = {row.get('event_type') for row in rows} - set(event_types.CODES)
+        if unknown:
+            return Response({'error': f"unknown event types: {', '.join(sorted(map(str, unknown)))}"}, status=400)
 
-        events_created = 0
-        for row in reader:
-            Event.objects.create(
+        events = [
+            Event(
                 match_id=match_id,
+                match_date=match.date,
                 event_type=row.get('event_type'),
-                timestamp=row.get('timestamp'),
-                x_coord=row.get('x'),
-                y_coord=row.get('y'),
+                timestamp=row.get('timestamp') or None,
+                x_coord=row.get('x') or None,
+                y_coord=row.get('y') or None,
                 location_zone=row.get('zone', ''),
                 description=row.get('description', ''),
-                player_id=row.get('player_id', ''),
-                team_id=row.get('team_id', ''),
-                phase=row.get('phase', ''),
+                player_id=row.get('player_id') or None,
+                team_id=row.get('team_id') or None,
+                phase=row.get('phase') or None,
                 is_opponent_event=row.get('is_opponent_event', 'false').lower() == 'true'
             )
-            events_created += 1
+            for row in rows
+        ]
+        spatial.assign(events, match.away_team_id if match.away_flipped() else None)
+        with transaction.atomic():
+            Event.objects.bulk_create(events, batch_size=1000)
+
+        # bulk_create skips signals: drop stale analytics once, then warm them in the background
+        invalidate_match(match_id, {e.team_id for e in events})
+        job = jobs.submit_once('precompute_match', {'match_id': int(match_id)})
 
-        return Response({'message': f'{events_created} events uploaded'})
+        return Response({'message': f'{len(events)} events uploaded', 'precompute_job': job.pk})
@@ -0,0 +1,21 @@
+"""
+Gunicorn settings for both serving modes (used by the Procfile).
+
+SERVER_MODE=wsgi (default) runs sync workers on trylytix_backend.wsgi. SERVER_MODE=asgi
+runs uvicorn workers on trylytix_backend.asgi, where the async analytics views serve
+many concurrent requests per process.
+"""
+import os
+
+mode = os.environ.get('SERVER_MODE', 'wsgi')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 180))
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+if mode == 'asgi':
+    wsgi_app = 'trylytix_backend.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'trylytix_backend.wsgi:application'
+    worker_class = 'sync'
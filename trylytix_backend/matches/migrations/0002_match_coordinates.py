@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='coordinates',
+            field=models.CharField(choices=[('attacking', "x toward the acting team's try line"), ('home', "x toward the home team's try line")], default='attacking', help_text="Direction the events' x and y were recorded in", max_length=10),
+        ),
+    ]
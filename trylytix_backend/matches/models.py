@@ -1,13 +1,42 @@
 from django.db import models
+from django.db.models.functions import Now
+from events import spatial
 from projects.models import Project
 from teams.models import Team
 
 class Match(models.Model):
+    ATTACKING = 'attacking'
+    HOME = 'home'
+    COORDINATES = [
+        (ATTACKING, "x toward the acting team's try line"),
+        (HOME, "x toward the home team's try line"),
+    ]
+
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='matches')
     home_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='home_matches')
     away_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='away_matches')
     date = models.DateField()
     venue = models.CharField(max_length=100, blank=True)
+    coordinates = models.CharField(max_length=10, choices=COORDINATES, default=ATTACKING,
+                                   help_text="Direction the events' x and y were recorded in")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        match = super().from_db(db, field_names, values)
+        match._loaded_coordinates = match.__dict__.get('coordinates')
+        return match
+
+    def away_flipped(self):
+        """Whether the away team's coordinates need turning round to face its own attacking try line."""
+        return self.coordinates == self.HOME
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Events carry a copy of the date, their partition key; update() skips auto_now, so it's set here
+        self.events.exclude(match_date=self.date).update(match_date=self.date, updated_at=Now())
+        if getattr(self, '_loaded_coordinates', self.ATTACKING) != self.coordinates:
+            spatial.relocate_match_events(self)
+            self._loaded_coordinates = self.coordinates
 
     def __str__(self):
         return f"{self.home_team} vs {self.away_team} - {self.date}"
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0003_team_main_team'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='rugbypy_id',
+            field=models.CharField(blank=True, help_text='Player id used by rugbypy.fetch_player_stats', max_length=20),
+        ),
+    ]
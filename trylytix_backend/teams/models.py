@@ -17,6 +17,7 @@ class Player(models.Model):
     position = models.CharField(max_length=50)
     jersey_number = models.IntegerField()
     age = models.IntegerField()
+    rugbypy_id = models.CharField(max_length=20, blank=True, help_text="Player id used by rugbypy.fetch_player_stats")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -1,51 +1,131 @@
+import argparse
+import logging
+import os
 import pandas as pd
 import xgboost as xgb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, accuracy_score, classification_report
-import joblib
-
-# 1. Load data
-df = pd.read_csv("match_data.csv")
-
-# 2. Feature engineering
-df['home_win'] = (df['winner'] == df['home_team']).astype(int)
-df['home_score'] = ((df['home_conversion_goals'] * 2) + (df['home_tries'] * 5) + (df['home_penalty_goals'] * 3)).astype(int)
-df['away_score'] = ((df['away_conversion_goals'] * 2) + (df['away_tries'] * 5) + (df['away_penalty_goals'] * 3)).astype(int)
-df = pd.get_dummies(df, columns=['home_team', 'away_team'])
-
-# 3. Select features (exclude scores and winner/home_win for regression/classification)
-features = [col for col in df.columns if col not in ['winner', 'home_win', 'date', 'round', 'home_score', 'away_score']]
-X = df[features]
-y_win = df['home_win']
-y_home = df['home_score']
-y_away = df['away_score']
-
-# 4. Split data (same split for all targets)
-X_train, X_test, y_win_train, y_win_test, y_home_train, y_home_test, y_away_train, y_away_test = train_test_split(
-    X, y_win, y_home, y_away, test_size=0.2, random_state=42
+from analytics import artifacts
+from analytics.training import (
+    cached_feature_matrix, file_fingerprint, fingerprint, load_search_config, train_models, write_report,
 )
 
-# 5. Train models
-home_win_clf = xgb.XGBClassifier(use_label_encoder=False, eval_metric='logloss')
-home_score_reg = xgb.XGBRegressor()
-away_score_reg = xgb.XGBRegressor()
-
-home_win_clf.fit(X_train, y_win_train)
-home_score_reg.fit(X_train, y_home_train)
-away_score_reg.fit(X_train, y_away_train)
-
-# 6. Predict and evaluate
-y_win_pred = home_win_clf.predict(X_test)
-y_home_pred = home_score_reg.predict(X_test)
-y_away_pred = away_score_reg.predict(X_test)
-
-print("Home Win Accuracy:", accuracy_score(y_win_test, y_win_pred))
-print(classification_report(y_win_test, y_win_pred))
-print("Home Score MAE:", mean_absolute_error(y_home_test, y_home_pred))
-print("Away Score MAE:", mean_absolute_error(y_away_test, y_away_pred))
-
-# 7. Save models
-joblib.dump(home_win_clf, 'outcome_model.pkl')
-joblib.dump(home_score_reg, 'home_score_model.pkl')
-joblib.dump(away_score_reg, 'away_score_model.pkl')
-joblib.dump(list(X.columns), 'feature_columns.pkl')
\ No newline at end of file
+# Bumped when build_feature_matrix's output changes, so cached matrices are rebuilt
+MATCH_FEATURE_SCHEMA = 1
+
+def read_match_features_from_db(project=None):
+    """
+    A key that changes with the feature store's matches, and a function loading them as a
+    match_data.csv-style frame (only called when the matrix isn't cached).
+    """
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trylytix_backend.settings')
+    django.setup()
+    from django.db.models import Count, Max
+    from analytics import feature_store
+    from analytics.models import MatchFeatures
+    from matches.models import Match
+
+    matches = Match.objects.filter(project_id=project) if project else Match.objects.all()
+    feature_store.refresh(matches.order_by('id').values_list('id', flat=True))
+    state = MatchFeatures.objects.filter(match__in=matches).aggregate(rows=Count('id'), updated=Max('updated_at'))
+    return fingerprint('feature_store', project, state), lambda: feature_store.training_frame(matches)
+
+def build_feature_matrix(df):
+    # 1. Load data
+    df = df.copy()
+
+    # 2. Feature engineering
+    df['home_win'] = (df['winner'] == df['home_team']).astype(int)
+    df['home_score'] = ((df['home_conversion_goals'] * 2) + (df['home_tries'] * 5) + (df['home_penalty_goals'] * 3)).astype(int)
+    df['away_score'] = ((df['away_conversion_goals'] * 2) + (df['away_tries'] * 5) + (df['away_penalty_goals'] * 3)).astype(int)
+    df = pd.get_dummies(df, columns=['home_team', 'away_team'])
+
+    # 3. Select features (exclude scores and winner/home_win for regression/classification)
+    features = [col for col in df.columns if col not in ['winner', 'home_win', 'date', 'round', 'home_score', 'away_score']]
+    X = df[features]
+
+    # 4. Split data (same split for all targets)
+    X_train, X_test, y_win_train, y_win_test, y_home_train, y_home_test, y_away_train, y_away_test = train_test_split(
+        X, df['home_win'], df['home_score'], df['away_score'], test_size=0.2, random_state=42
+    )
+    return {
+        'columns': list(X.columns),
+        'data_range': {'rows': len(df), 'first_date': str(df['date'].min()), 'last_date': str(df['date'].max())},
+        'X_train': X_train, 'X_test': X_test,
+        'train': {'home_win': y_win_train, 'home_score': y_home_train, 'away_score': y_away_train},
+        'test': {'home_win': y_win_test, 'home_score': y_home_test, 'away_score': y_away_test},
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the match outcome and score models")
+    parser.add_argument('--data', default='match_data.csv', help='Match stats CSV')
+    parser.add_argument('--from-db', action='store_true', help='Train on the match features computed from our events')
+    parser.add_argument('--project', type=int, help="With --from-db, only this project's matches")
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Processes used for model fits and CV folds')
+    parser.add_argument('--cv', type=int, default=5, help='Cross-validation folds')
+    parser.add_argument('--search-config', default=None, help='JSON hyperparameter search config keyed by model name')
+    parser.add_argument('--report', default='outcome_training_report.json', help='Where to write metrics and timings')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.from_db:
+        key, load = read_match_features_from_db(args.project)
+    else:
+        key, load = file_fingerprint(args.data), lambda: pd.read_csv(args.data)
+    fm = cached_feature_matrix('match_outcome', fingerprint(MATCH_FEATURE_SCHEMA, key), lambda: build_feature_matrix(load()))
+
+    # 5. Train models (one process per model/fold; keep each XGBoost single-threaded to avoid oversubscription)
+    specs = [
+        {'name': 'home_win', 'target': 'home_win', 'scoring': 'accuracy',
+         'estimator': xgb.XGBClassifier(use_label_encoder=False, eval_metric='logloss', n_jobs=1)},
+        {'name': 'home_score', 'target': 'home_score', 'scoring': 'neg_mean_absolute_error',
+         'estimator': xgb.XGBRegressor(n_jobs=1)},
+        {'name': 'away_score', 'target': 'away_score', 'scoring': 'neg_mean_absolute_error',
+         'estimator': xgb.XGBRegressor(n_jobs=1)},
+    ]
+    models, report = train_models(specs, fm['X_train'], fm['train'], cv=args.cv,
+                                  search=load_search_config(args.search_config), n_jobs=args.n_jobs)
+    home_win_clf, home_score_reg, away_score_reg = models['home_win'], models['home_score'], models['away_score']
+
+    # 6. Predict and evaluate
+    X_test, test = fm['X_test'], fm['test']
+    y_win_pred = home_win_clf.predict(X_test)
+    y_home_pred = home_score_reg.predict(X_test)
+    y_away_pred = away_score_reg.predict(X_test)
+
+    report['holdout'] = {
+        'home_win_accuracy': accuracy_score(test['home_win'], y_win_pred),
+        'home_score_mae': mean_absolute_error(test['home_score'], y_home_pred),
+        'away_score_mae': mean_absolute_error(test['away_score'], y_away_pred),
+    }
+    print("Home Win Accuracy:", report['holdout']['home_win_accuracy'])
+    print(classification_report(test['home_win'], y_win_pred))
+    print("Home Score MAE:", report['holdout']['home_score_mae'])
+    print("Away Score MAE:", report['holdout']['away_score_mae'])
+    print(f"Training wall time: {report['timing']['total_wall_seconds']:.1f}s over {report['timing']['tasks']} fits")
+    write_report(report, args.report)
+
+    # 7. Save models as a new version of the match_outcome artifacts
+    version = artifacts.save_version(
+        'match_outcome',
+        objects={
+            'outcome_model': home_win_clf,
+            'home_score_model': home_score_reg,
+            'away_score_model': away_score_reg,
+            'feature_columns': fm['columns'],
+        },
+        metadata={
+            'feature_schema': fm['columns'],
+            'data_range': fm['data_range'],
+            'metrics': {'holdout': report['holdout'], 'cv': {k: v['cv_mean'] for k, v in report['models'].items()}},
+            'params': {k: v['best_params'] for k, v in report['models'].items()},
+        },
+    )
+    print(f"Saved match_outcome artifacts as version {version}")
+
+if __name__ == '__main__':
+    main()
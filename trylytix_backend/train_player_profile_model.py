@@ -1,11 +1,19 @@
+import argparse
+import logging
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split, cross_val_score
-import joblib
-from rugbypy.player import fetch_player_stats
+from analytics import artifacts, frames
+from analytics.player_similarity import build_index
+from analytics.player_ingestion import (
+    DEFAULT_CACHE_DIR, DEFAULT_TTL, DEFAULT_WORKERS,
+    cache_path, load_player_stats, read_player_ids_file, read_player_ids_from_db, resolve_fetch_fn,
+)
+from analytics.training import (
+    cached_feature_matrix, file_fingerprint, fingerprint, load_search_config, train_models, write_report,
+)
 
 # --- CONFIGURATION ---
 
@@ -48,6 +56,17 @@ ALL_FIELDS = [
 COMPOSITE_FEATURES = [
     'defensive_impact', 'attacking_threat', 'discipline', 'playmaking'
 ]
+# Bumped when build_feature_matrix's output changes, so cached matrices are rebuilt
+FEATURE_MATRIX_SCHEMA = 3
+# Dtypes of the feature matrix frame (see analytics/frames.py): float32 stats, int32 composites
+PROFILE_SCHEMA = {
+    **dict.fromkeys(ALL_FIELDS, 'float32'),
+    'position': 'int16',
+    **dict.fromkeys(COMPOSITE_FEATURES, 'int32'),
+    'player_id': 'string[pyarrow]',
+    'label': 'category',
+    'archetype': 'int8',
+}
 
 # --- FEATURE EXTRACTION ---
 
@@ -97,9 +116,8 @@ def make_human_readable_labels(row):
         insights.append("Well-rounded")
     return ", ".join(insights)
 
-data = []
-for pid in PLAYER_IDS:
-    stats = fetch_player_stats(player_id=pid)
+def aggregate_player_stats(stats):
+    """Collapse a player's raw per-match stats into one feature dict."""
     if isinstance(stats, pd.DataFrame):
         agg = {}
         for field in ALL_FIELDS:
@@ -110,78 +128,151 @@ for pid in PLAYER_IDS:
                     agg[field] = stats[field].fillna("").astype(str).iloc[0]
             else:
                 agg[field] = 0
-        features = extract_all_features(agg)
+        return extract_all_features(agg)
     elif isinstance(stats, (pd.Series, dict)):
-        features = extract_all_features(stats)
-    else:
-        raise ValueError(f"Unknown stats type for player {pid}: {type(stats)}")
-    label_cols = get_label_columns(features)
-    row = [features[field] for field in ALL_FIELDS] + [label_cols[k] for k in COMPOSITE_FEATURES]
-    data.append(row)
-
-df = pd.DataFrame(data, columns=ALL_FIELDS + COMPOSITE_FEATURES)
-
-# --- CATEGORICAL ENCODING ---
-
-if 'position' in df:
-    df['position'] = LabelEncoder().fit_transform(df['position'].astype(str))
-
-# --- HUMAN READABLE LABELS ---
-
-df['label'] = df.apply(make_human_readable_labels, axis=1)
-
-# --- ML DATA PREP ---
+        return extract_all_features(stats)
+    raise ValueError(f"Unknown stats type: {type(stats)}")
 
-X = df[ALL_FIELDS + COMPOSITE_FEATURES]
-y = df['label']
+def build_feature_matrix(raw_stats):
+    """Aggregate, label, scale and cluster the raw player stats into the training matrix."""
+    data = []
+    for pid, stats in raw_stats.items():
+        features = aggregate_player_stats(stats)
+        label_cols = get_label_columns(features)
+        row = [features[field] for field in ALL_FIELDS] + [label_cols[k] for k in COMPOSITE_FEATURES]
+        data.append(row)
 
-# --- SCALE NUMERIC FEATURES ---
+    df = pd.DataFrame(data, columns=ALL_FIELDS + COMPOSITE_FEATURES)
+    df['player_id'] = [str(pid) for pid in raw_stats]
 
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+    # --- CATEGORICAL ENCODING ---
 
-# --- CLUSTERING FOR ARCHETYPES ---
+    if 'position' in df:
+        df['position'] = LabelEncoder().fit_transform(df['position'].astype(str))
+    frames.apply_schema(df, PROFILE_SCHEMA)
 
-n_clusters = 4
-kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-df['archetype'] = kmeans.fit_predict(df[COMPOSITE_FEATURES])
+    # --- HUMAN READABLE LABELS ---
 
-# --- ENCODE LABELS ---
+    df['label'] = df.apply(make_human_readable_labels, axis=1)
 
-le_label = LabelEncoder()
-y_encoded = le_label.fit_transform(y)
+    # --- SCALE NUMERIC FEATURES ---
 
-# --- MODELS ---
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(df[ALL_FIELDS + COMPOSITE_FEATURES])
 
-# 1. Random Forest for label prediction (multi-class)
-rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
-rf_model.fit(X_scaled, y_encoded)
+    # --- CLUSTERING FOR ARCHETYPES ---
 
-# 2. Gradient Boosting as alternative
-gb_model = GradientBoostingClassifier(n_estimators=100, random_state=42)
-gb_model.fit(X_scaled, y_encoded)
+    n_clusters = 4
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+    df['archetype'] = kmeans.fit_predict(df[COMPOSITE_FEATURES])
 
-# 3. Archetype classifier (predict cluster/archetype)
-archetype_model = RandomForestClassifier(n_estimators=100, random_state=42)
-archetype_model.fit(X_scaled, df['archetype'])
+    # --- ENCODE LABELS ---
 
-# --- EVALUATE (OPTIONAL) ---
+    le_label = LabelEncoder()
+    y_encoded = le_label.fit_transform(df['label'])
+    frames.apply_schema(df, PROFILE_SCHEMA)
 
-print("RF Accuracy (cross-val):", cross_val_score(rf_model, X_scaled, y_encoded, cv=5).mean())
-print("GB Accuracy (cross-val):", cross_val_score(gb_model, X_scaled, y_encoded, cv=5).mean())
-print("Archetype Clusters:", df['archetype'].value_counts())
-
-# --- SAVE ARTIFACTS ---
-
-joblib.dump(rf_model, 'rugby_rf_model.pkl')
-joblib.dump(gb_model, 'rugby_gb_model.pkl')
-joblib.dump(archetype_model, 'rugby_archetype_rf_model.pkl')
-joblib.dump(scaler, 'rugby_scaler.pkl')
-joblib.dump(le_label, 'rugby_label_encoder.pkl')
-joblib.dump(kmeans, 'rugby_kmeans_archetypes.pkl')
-df.to_csv('rugby_players_full_dataset.csv', index=False)
+    return {
+        'df': df,
+        'X_scaled': X_scaled,
+        'y_encoded': y_encoded,
+        'scaler': scaler,
+        'label_encoder': le_label,
+        'kmeans': kmeans,
+    }
 
-print("✅ All models, encoders, and dataset saved.")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the player profile models from rugbypy stats")
+    parser.add_argument('--players-file', help='File with rugbypy player ids (one per line or comma separated)')
+    parser.add_argument('--from-db', action='store_true', help='Use the rugbypy ids stored on teams.Player')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Directory for cached per-player Parquet stats')
+    parser.add_argument('--ttl-hours', type=float, default=DEFAULT_TTL / 3600, help='Re-fetch cached players older than this')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent rugbypy fetches')
+    parser.add_argument('--refresh', action='store_true', help='Ignore the cache and re-fetch every player')
+    parser.add_argument('--offline', action='store_true', help='Only use cached stats, never call rugbypy')
+    parser.add_argument('--fetch-fn', default=None, help="Fetch function as 'module:function' (e.g. a local stub)")
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Processes used for model fits and CV folds')
+    parser.add_argument('--cv', type=int, default=5, help='Cross-validation folds')
+    parser.add_argument('--search-config', default=None, help='JSON hyperparameter search config keyed by model name')
+    parser.add_argument('--report', default='player_profile_training_report.json', help='Where to write metrics and timings')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.players_file:
+        player_ids = read_player_ids_file(args.players_file)
+    elif args.from_db:
+        player_ids = read_player_ids_from_db()
+    else:
+        player_ids = PLAYER_IDS
+
+    raw_stats = load_player_stats(
+        player_ids,
+        fetch_fn=None if args.offline else resolve_fetch_fn(args.fetch_fn),
+        cache_dir=args.cache_dir,
+        ttl=args.ttl_hours * 3600,
+        max_workers=args.workers,
+        refresh=args.refresh,
+        offline=args.offline,
+    )
+
+    key = fingerprint(FEATURE_MATRIX_SCHEMA, sorted(raw_stats),
+                      [file_fingerprint(cache_path(args.cache_dir, pid)) for pid in sorted(raw_stats)])
+    fm = cached_feature_matrix('player_profile', key, lambda: build_feature_matrix(raw_stats))
+    df = fm['df']
+
+    # --- MODELS ---
+
+    specs = [
+        # 1. Random Forest for label prediction (multi-class)
+        {'name': 'rf', 'target': 'label', 'scoring': 'accuracy',
+         'estimator': RandomForestClassifier(n_estimators=100, random_state=42)},
+        # 2. Gradient Boosting as alternative
+        {'name': 'gb', 'target': 'label', 'scoring': 'accuracy',
+         'estimator': GradientBoostingClassifier(n_estimators=100, random_state=42)},
+        # 3. Archetype classifier (predict cluster/archetype)
+        {'name': 'archetype', 'target': 'archetype', 'scoring': 'accuracy',
+         'estimator': RandomForestClassifier(n_estimators=100, random_state=42)},
+    ]
+    targets = {'label': fm['y_encoded'], 'archetype': df['archetype'].to_numpy()}
+    models, report = train_models(specs, fm['X_scaled'], targets, cv=args.cv,
+                                  search=load_search_config(args.search_config), n_jobs=args.n_jobs)
+    report['data'] = {'players': len(df), 'feature_key': key}
+
+    # --- EVALUATE ---
+
+    print("RF Accuracy (cross-val):", report['models']['rf']['cv_mean'])
+    print("GB Accuracy (cross-val):", report['models']['gb']['cv_mean'])
+    print("Archetype Clusters:", df['archetype'].value_counts())
+    print(f"Training wall time: {report['timing']['total_wall_seconds']:.1f}s over {report['timing']['tasks']} fits")
+    write_report(report, args.report)
+
+    # --- SAVE ARTIFACTS ---
+
+    version = artifacts.save_version(
+        'player_profile',
+        objects={
+            'rf_model': models['rf'],
+            'gb_model': models['gb'],
+            'archetype_model': models['archetype'],
+            'scaler': fm['scaler'],
+            'label_encoder': fm['label_encoder'],
+            'kmeans': fm['kmeans'],
+            # Scaled feature vectors for "who plays like this player" (analytics.player_similarity)
+            'similarity_index': build_index(fm['X_scaled'], df['player_id']),
+        },
+        metadata={
+            'feature_schema': ALL_FIELDS + COMPOSITE_FEATURES,
+            'data_range': {'players': len(df), 'player_ids': sorted(raw_stats)},
+            'metrics': {k: v['cv_mean'] for k, v in report['models'].items()},
+            'params': {k: v['best_params'] for k, v in report['models'].items()},
+        },
+    )
+    df.to_csv('rugby_players_full_dataset.csv', index=False)
+
+    print(f"✅ All models, encoders, and dataset saved (player_profile version {version}).")
 
 # --- SAMPLE USAGE ---
 
@@ -196,3 +287,6 @@ print("✅ All models, encoders, and dataset saved.")
 # 2. Player stats
 # 3. Attacking patterns strenghts/weaknesses
 # 4. Defensive patterns strengths/weaknesses
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'analytics.instrumentation.RequestMetricsMiddleware',
+    'analytics.db_routing.PrimaryAfterWriteMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,6 +61,35 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request instrumentation (see analytics/instrumentation.py), scraped from /metrics/
+ANALYTICS_METRICS = {
+    'WINDOW': 1000,
+    'N_PLUS_ONE_THRESHOLD': 20,
+    'SLOW_REQUEST_MS': 1000,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+}
+
+# Shared by web and worker processes: precomputed analytics written by the worker are read by
+# the views. Point CACHE_BACKEND/CACHE_LOCATION at e.g. Redis when running on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / '.cache' / 'django')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+ANALYTICS_CACHE_TIMEOUT = 24 * 3600
+
+# Background analytics jobs (see analytics/jobs.py), run by `manage.py run_analytics_worker`
+ANALYTICS_JOBS = {
+    'PROCESSES': int(os.environ.get('ANALYTICS_WORKER_PROCESSES', 2)),
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 3,
+    'HEARTBEAT_SECONDS': 60,
+    'STALE_AFTER_SECONDS': 900,
+    'SIMULATION_PROCESSES': int(os.environ.get('ANALYTICS_SIMULATION_PROCESSES', 2)),
+}
+
 CORS_ALLOW_ALL_ORIGINS = True  # or CORS_ALLOWED_ORIGINS = [your frontend]
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_HEADERS = [
@@ -101,17 +133,61 @@ WSGI_APPLICATION = 'trylytix_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DB_* environment variables point the app at another database, e.g. a local
+# Postgres or DB_ENGINE=django.db.backends.sqlite3 DB_NAME=bench.sqlite3 for benchmarks.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'trylytix',
-        'USER': 'admin_thevin',
-        'PASSWORD': 'Th3vIn_DP',
-        'HOST': 'trylytix-db.c5a2k8mwi8ks.ap-southeast-2.rds.amazonaws.com',
-        'PORT': '5432',
+        'ENGINE': os.environ.get('DB_ENGINE', 'django.db.backends.postgresql'),
+        'NAME': os.environ.get('DB_NAME', 'trylytix'),
+        'USER': os.environ.get('DB_USER', 'admin_thevin'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'Th3vIn_DP'),
+        'HOST': os.environ.get('DB_HOST', 'trylytix-db.c5a2k8mwi8ks.ap-southeast-2.rds.amazonaws.com'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Reuse connections across requests instead of opening a new TLS session to RDS each time;
+        # health checks drop a connection that went away between requests.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# DB_POOL=1 switches to an in-process psycopg connection pool per worker (Postgres with
+# psycopg 3 only). Prefer it under ASGI, where persistent connections aren't reused.
+# CONN_HEALTH_CHECKS above makes the pool check connections on checkout, so one dropped by
+# RDS is replaced instead of failing a request.
+if os.environ.get('DB_POOL', '').lower() in ('1', 'true', 'yes'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # pooling replaces persistent connections
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 600)),
+        },
+    }
+
+# DB_REPLICA_HOST / DB_REPLICA_NAME add a read replica that analytics views read from (see
+# analytics/db_routing.py); other settings default to the primary's. Locally, pointing
+# DB_REPLICA_NAME at the primary's database gives a stand-in that exercises the routing.
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    primary = DATABASES['default']
+    DATABASES['replica'] = {
+        **primary,
+        'NAME': os.environ.get('DB_REPLICA_NAME', primary['NAME']),
+        'USER': os.environ.get('DB_REPLICA_USER', primary['USER']),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', primary['PASSWORD']),
+        'HOST': os.environ.get('DB_REPLICA_HOST', primary['HOST']),
+        'PORT': os.environ.get('DB_REPLICA_PORT', primary['PORT']),
+        'OPTIONS': dict(primary.get('OPTIONS', {})),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['analytics.db_routing.AnalyticsReplicaRouter']
+ANALYTICS_REPLICA = {
+    'ALIAS': 'replica',
+    'MAX_LAG_SECONDS': float(os.environ.get('DB_REPLICA_MAX_LAG', 30)),
+    'LAG_CHECK_INTERVAL': 5,
+    'STICKY_SECONDS': 10,
+}
 
 
 # Password validation
@@ -6,10 +6,12 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 from django.http import JsonResponse
+from analytics.instrumentation import metrics_view
 
 urlpatterns = [
     path('', lambda request: HttpResponse("OK")),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/', include('projects.urls')),